@@ -0,0 +1,646 @@
+# Microbenchmarks do script de fechamento e benchmarks com o corpus sintético de faturas
+# Uso: python benchmark_fechamento.py [--somente NOME ...] [--motoristas N] [--paginas N]
+#                                     [--salvar resultados.json] [--comparar resultados.json]
+import argparse
+import difflib
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+import unicodedata
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import script_fechamento
+from corpus_sintetico import PRENOMES, SOBRENOMES, entregas_para_paginas, gerar_corpus, gerar_fatura
+from script_fechamento import EstadoExtracao, IndiceNomes, RegistrosMotorista, _iterar_paginas, calcular_fechamento, calcular_fechamentos, encontrar_nome_aproximado, escrever_fechamento, extrair_dados_pdf, montar_diarios_info, normalize, regex_data, regex_valor
+
+PASTA_PDFS = "pdfs"
+REPETICOES = 5
+MOTORISTAS_PLANILHA = 5000
+NOMES_BUSCADOS = 200
+LINHAS_PLANILHA_VEICULOS = 50000
+MOTORISTAS_FECHAMENTO = 300
+DIAS_FECHAMENTO = 31
+# Tamanhos do corpus sintético: páginas por PDF na medição de escala e corpus da execução completa
+PAGINAS_ESCALA = (2, 8, 32)
+BACKENDS_ESCALA = ("pdfplumber", "auto")
+MOTORISTAS_CORPUS = 20
+PAGINAS_CORPUS = 4
+# Aumento (fração) de tempo ou de memória em relação a um resultado salvo que conta como regressão
+TOLERANCIA_REGRESSAO = 0.25
+
+# Normalização de texto original (um caractere por vez)
+def _normalize_legado(texto):
+    nfkd = unicodedata.normalize("NFKD", texto)
+    return u"".join([c for c in nfkd if not unicodedata.combining(c)]).lower()
+
+class EstadoExtracaoLegado(EstadoExtracao):
+    # Cópia do processar_linha anterior ao classificador de linhas, usada como referência
+    def processar_linha(self, linha):
+        linha_limpa = linha.strip()
+        if not linha_limpa:
+            return
+
+        low = _normalize_legado(linha_limpa)
+
+        # Identifica nome do motorista
+        if not self.nome_motorista and "motorista:" in low:
+            parts = linha.split(":")
+            if len(parts) > 1:
+                self.nome_motorista = parts[-1].strip().upper()
+                logging.info(f"  Motorista identificado: {self.nome_motorista}")
+                return
+
+        # Detecta seções de forma mais robusta
+        # Detecta início de "Remunerações Diárias"
+        if "remuneracoes diarias" in low or "remunerações diárias" in low:
+            self.remuneracoes_section = True
+            self.acrescimos_section = False
+            return
+
+        # Detecta seções de acréscimos
+        if any(keyword in low for keyword in ['acrescimo', 'acréscimo', 'remuneracao adicional', 'valores adicionais']):
+            self.acrescimos_section = True
+            self.remuneracoes_section = False
+            return
+
+        # Se estiver na seção de remunerações, busca data + 30,00 (bônus)
+        if self.remuneracoes_section:
+            if regex_data.search(linha) and "30,00" in linha:
+                m_data = regex_data.search(linha)
+                try:
+                    data = datetime.strptime(m_data.group(), "%d/%m/%Y").date()
+                    self.bonus_pago_dates.add(data)
+                    logging.info(f"    Bônus encontrado: Data {data}")
+                except ValueError:
+                    logging.warning(f"    Data inválida encontrada no bônus: {linha}")
+                except Exception as e:
+                    logging.warning(f"    Erro ao processar bônus: {e} na linha: {linha}")
+
+            # Sai da seção se encontrar linha vazia ou indicador de fim
+            if low.strip() == "" or "coletas/entregas" in low:
+                self.remuneracoes_section = False
+            return
+
+        # Processamento de acréscimos na seção específica
+        if self.acrescimos_section:
+            if regex_data.search(linha) and regex_valor.search(linha):
+                m_data = regex_data.search(linha)
+                m_val = regex_valor.search(linha)
+
+                try:
+                    data = datetime.strptime(m_data.group(), "%d/%m/%Y").date()
+                    valor_str = m_val.group(1).replace(".", "").replace(",", ".")
+                    valor_float = float(valor_str)
+                    self.acrescimos_texto_pendentes.append((data, valor_float, valor_str, False))
+
+                except ValueError:
+                    logging.warning(f"    Valor ou data inválida no acréscimo: {linha}")
+                except Exception as e:
+                    logging.warning(f"    Erro ao processar acréscimo no texto: {e} na linha: {linha}")
+
+            # Sai da seção se encontrar indicador de fim
+            if any(fim in low for fim in ['total', 'resumo', 'coletas/entregas', 'entregas']):
+                self.acrescimos_section = False
+            return
+
+        # Processamento geral de entregas/insucessos e acréscimos avulsos
+        if regex_data.search(linha):
+            m_data = regex_data.search(linha)
+            try:
+                data = datetime.strptime(m_data.group(), "%d/%m/%Y").date()
+            except ValueError:
+                logging.warning(f"    Data inválida encontrada: {linha}")
+                return
+            except Exception as e:
+                logging.warning(f"    Erro ao processar data: {e} na linha: {linha}")
+                return
+
+            # Entregas/Insucessos: procura sim/nao
+            if "sim" in low or "nao" in low:
+                status = "Sim" if "sim" in low else "Não"
+                if status == "Sim":
+                    self.entregas_por_dia[data]["entregues"] += 1
+                else:
+                    self.entregas_por_dia[data]["insucessos"] += 1
+                logging.info(f"    Entrega registrada: Data {data}, Status {status}")
+
+            # Acréscimos avulsos (fora das seções específicas)
+            elif regex_valor.search(linha):
+                m_val = regex_valor.search(linha)
+                try:
+                    valor_str = m_val.group(1).replace(".", "").replace(",", ".")
+                    valor_float = float(valor_str)
+
+                    # Filtra valores muito pequenos que podem ser ruído (ex: < R$ 1,00)
+                    if valor_float >= 1.0:
+                        self.acrescimos_texto_pendentes.append((data, valor_float, valor_str, True))
+
+                except ValueError:
+                    logging.warning(f"    Valor inválido no acréscimo avulso: {linha}")
+                except Exception as e:
+                    logging.warning(f"    Erro ao processar acréscimo avulso: {e} na linha: {linha}")
+
+
+
+# Lê o texto de todas as páginas dos PDFs de exemplo (pdfium, sem tabelas)
+def carregar_paginas(pasta):
+    paginas = []
+    for arquivo in sorted(os.listdir(pasta)):
+        if arquivo.lower().endswith(".pdf"):
+            textos = [texto for texto, _ in _iterar_paginas(os.path.join(pasta, arquivo), backend="pdfium")]
+            paginas.append(textos)
+    return paginas
+
+# Processa as linhas de todos os PDFs com a classe informada e devolve linhas por segundo
+def medir_linhas(classe, paginas, repeticoes=REPETICOES):
+    total_linhas = sum(texto.count("\n") + 1 for textos in paginas for texto in textos) * repeticoes
+    resultados = []
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        resultados = []
+        for textos in paginas:
+            estado = classe()
+            for texto in textos:
+                estado.processar_pagina(texto, [])
+            resultados.append(estado.finalizar())
+    duracao = time.perf_counter() - inicio
+    return total_linhas / duracao, resultados
+
+def benchmark_classificador_linhas():
+    paginas = carregar_paginas(PASTA_PDFS)
+    linhas_s_legado, resultado_legado = medir_linhas(EstadoExtracaoLegado, paginas)
+    linhas_s_novo, resultado_novo = medir_linhas(EstadoExtracao, paginas)
+    if resultado_legado != resultado_novo:
+        raise AssertionError("O classificador de linhas gerou dados diferentes da versão anterior")
+    print(f"Classificador de linhas: antes {linhas_s_legado:,.0f} linhas/s, depois {linhas_s_novo:,.0f} linhas/s "
+          f"({linhas_s_novo / linhas_s_legado:.1f}x)")
+
+# Busca nome aproximado como era feita antes do índice (normaliza e compara a planilha inteira)
+def encontrar_nome_aproximado_legado(nome_pdf, diarios_info):
+    nome_pdf_normalizado = normalize(nome_pdf)
+    nomes_planilha_normalizados = {normalize(nome): nome for nome in diarios_info.keys()}
+    matches = difflib.get_close_matches(nome_pdf_normalizado, list(nomes_planilha_normalizados.keys()), n=1, cutoff=0.5)
+    if matches:
+        return nomes_planilha_normalizados[matches[0]]
+    else:
+        return None
+
+# Planilha sintética de motoristas e nomes de PDF com pequenas diferenças (letra trocada, sobrenome a menos)
+def gerar_nomes(semente=42):
+    aleatorio = random.Random(semente)
+    diarios_info = {}
+    while len(diarios_info) < MOTORISTAS_PLANILHA:
+        nome = " ".join([aleatorio.choice(PRENOMES)] + aleatorio.sample(SOBRENOMES, aleatorio.randint(2, 3)))
+        diarios_info[nome] = {"diaria": 100.0, "tipo": "CARRO"}
+
+    buscados = []
+    for nome in aleatorio.sample(list(diarios_info), NOMES_BUSCADOS):
+        variacao = aleatorio.randint(0, 2)
+        if variacao == 1:
+            posicao = aleatorio.randrange(len(nome))
+            nome = nome[:posicao] + "X" + nome[posicao + 1:]
+        elif variacao == 2:
+            nome = nome.rsplit(" ", 1)[0]
+        buscados.append(nome)
+    return diarios_info, buscados
+
+def benchmark_busca_nomes():
+    diarios_info, buscados = gerar_nomes()
+
+    inicio = time.perf_counter()
+    resultado_legado = [encontrar_nome_aproximado_legado(nome, diarios_info) for nome in buscados]
+    duracao_legado = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    indice = IndiceNomes(diarios_info)
+    duracao_indice = time.perf_counter() - inicio
+    resultado_novo = [indice.buscar(nome) for nome in buscados]
+    duracao_novo = time.perf_counter() - inicio
+
+    iguais = sum(1 for a, b in zip(resultado_legado, resultado_novo) if a == b)
+    print(f"Busca de nomes ({MOTORISTAS_PLANILHA} motoristas, {NOMES_BUSCADOS} buscas): "
+          f"antes {duracao_legado * 1000 / NOMES_BUSCADOS:.1f} ms/busca, depois {duracao_novo * 1000 / NOMES_BUSCADOS:.2f} ms/busca "
+          f"(índice montado em {duracao_indice * 1000:.0f} ms); mesmo resultado em {iguais}/{NOMES_BUSCADOS}")
+
+# Leitura linha a linha da planilha de veículos, como era feita antes (sem os exit(1))
+def montar_diarios_info_legado(df_veiculos, origem):
+    df_veiculos.columns = df_veiculos.columns.str.strip().str.lower()
+    required_cols_name = ["nome do motorista", "motorista", "nome"]
+    required_cols_diaria = ["diária combinada", "diaria combinada", "diaria"]
+    tipo_colunas = [col for col in df_veiculos.columns if "tipo" in col]
+    coluna_tipo = tipo_colunas[0] if tipo_colunas else None
+
+    diarios_info = {}
+    for idx, linha in df_veiculos.iterrows():
+        nome = None
+        for col_n in required_cols_name:
+            if col_n in df_veiculos.columns:
+                nome = linha.get(col_n)
+                break
+
+        if pd.isna(nome) or str(nome).strip() == "":
+            logging.warning(f"Aviso: Nome de motorista inválido ou vazio na linha {idx + 2} da planilha {origem}. Pulando esta linha.")
+            continue
+        nome_str = str(nome).strip().upper()
+
+        diaria_valor = 0
+        for col_d in required_cols_diaria:
+            if col_d in df_veiculos.columns:
+                diaria_valor = linha.get(col_d, 0) or 0
+                break
+
+        if not isinstance(diaria_valor, (int, float)) or diaria_valor < 0:
+            logging.warning(f"Aviso: Valor de diária inválido ({diaria_valor}) para o motorista {nome_str} na linha {idx + 2} da planilha {origem}. Usando 0.")
+            diaria_valor = 0
+
+        tipo_valor = linha.get(coluna_tipo) if coluna_tipo else None
+        if pd.isna(tipo_valor) or str(tipo_valor).strip() == "":
+            logging.warning(f"Aviso: Tipo de veículo inválido ou vazio para o motorista {nome_str} na linha {idx + 2} da planilha {origem}. Usando \"N/A\".")
+            tipo_valor = "N/A"
+
+        diarios_info[nome_str] = {"diaria": diaria_valor, "tipo": tipo_valor}
+    return diarios_info
+
+# Planilha sintética de veículos com alguns nomes, diárias e tipos inválidos
+def gerar_planilha_veiculos(linhas=LINHAS_PLANILHA_VEICULOS, semente=42):
+    aleatorio = np.random.default_rng(semente)
+    nomes = np.array([f"MOTORISTA {i:06d}" for i in range(linhas)], dtype=object)
+    nomes[aleatorio.random(linhas) < 0.01] = None
+    diarias = aleatorio.choice([150.0, 180.0, 200.0, 250.0, -10.0, np.nan], size=linhas, p=[0.3, 0.3, 0.2, 0.17, 0.01, 0.02])
+    tipos = aleatorio.choice(np.array(["MOTO", "PASSEIO", "UTILITARIOS", "", None], dtype=object), size=linhas, p=[0.3, 0.4, 0.28, 0.01, 0.01])
+    return pd.DataFrame({"Nome do Motorista": nomes, "Diária Combinada": diarias, "Tipo de Veículo": tipos})
+
+def benchmark_planilha_veiculos():
+    df_veiculos = gerar_planilha_veiculos()
+    # Os avisos linha a linha da versão antiga dominariam o tempo medido
+    logging.disable(logging.WARNING)
+    try:
+        inicio = time.perf_counter()
+        resultado_legado = montar_diarios_info_legado(df_veiculos.copy(), "sintetica.xlsx")
+        duracao_legado = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        resultado_novo = montar_diarios_info(df_veiculos.copy(), "sintetica.xlsx")
+        duracao_novo = time.perf_counter() - inicio
+    finally:
+        logging.disable(logging.NOTSET)
+
+    # A versão antiga mantinha NaN em diárias vazias; o fechamento tratava como 0
+    for info in resultado_legado.values():
+        if info["diaria"] != info["diaria"]:
+            info["diaria"] = 0
+    if resultado_legado != resultado_novo:
+        raise AssertionError("A leitura vetorizada da planilha gerou dados diferentes da versão anterior")
+    print(f"Planilha de veículos ({LINHAS_PLANILHA_VEICULOS} linhas): antes {duracao_legado:.2f} s, depois {duracao_novo:.3f} s "
+          f"({duracao_legado / duracao_novo:.0f}x)")
+
+# Gravação do fechamento como era feita antes (Workbook normal, fórmulas e destaque aplicados depois)
+def escrever_fechamento_legado(caminho_saida, fechamentos):
+    from openpyxl import Workbook
+    from openpyxl.styles import PatternFill
+
+    # Cria um novo workbook
+    book = Workbook()
+    # Remove a aba padrão 'Sheet' se ela existir
+    if 'Sheet' in book.sheetnames:
+        book.remove(book['Sheet'])
+    
+    for motorista, df_novo in fechamentos:
+        sheet_name = motorista[:31] # Limita o nome da aba para 31 caracteres
+    
+        # Adiciona a nova aba
+        ws = book.create_sheet(sheet_name)
+    
+        # Escreve o cabeçalho
+        ws.append(df_novo.columns.tolist())
+    
+        # Escreve os dados
+        for r_idx, row in df_novo.iterrows():
+            ws.append(row.tolist())
+    
+        # Adicionar fórmulas Excel nas colunas calculadas
+        # Identifica as posições de todas as colunas necessárias
+        colunas = df_novo.columns.tolist()
+        col_valor_entregas = None
+        col_descontos = None
+        col_acrescimo_calculado = None
+        col_acrescimo_pago = None
+        col_recebido = None
+        col_total_dia = None
+        col_diferenca = None
+    
+        for idx, col_name in enumerate(colunas):
+            if col_name == "Valor Entregas":
+                col_valor_entregas = idx + 1  # openpyxl usa índices baseados em 1
+            elif col_name == "Descontos":
+                col_descontos = idx + 1
+            elif col_name == "Acréscimo Calculado":
+                col_acrescimo_calculado = idx + 1
+            elif col_name == "Acréscimo Pago":
+                col_acrescimo_pago = idx + 1
+            elif col_name == "Recebido":
+                col_recebido = idx + 1
+            elif col_name == "Total Dia":
+                col_total_dia = idx + 1
+            elif col_name == "Diferença":
+                col_diferenca = idx + 1
+    
+        # Aplica fórmulas Excel para cada linha de dados (exceto cabeçalho)
+        if all([col_valor_entregas, col_descontos, col_acrescimo_calculado, col_acrescimo_pago, 
+               col_recebido, col_total_dia, col_diferenca]):
+    
+            from openpyxl.utils import get_column_letter
+    
+            for row_num in range(2, ws.max_row + 1):  # Começa na linha 2 (pula o cabeçalho)
+                # Converte números de coluna para letras (A, B, C, etc.)
+                letra_valor_entregas = get_column_letter(col_valor_entregas)
+                letra_descontos = get_column_letter(col_descontos)
+                letra_acrescimo_calculado = get_column_letter(col_acrescimo_calculado)
+                letra_acrescimo_pago = get_column_letter(col_acrescimo_pago)
+                letra_recebido = get_column_letter(col_recebido)
+                letra_total_dia = get_column_letter(col_total_dia)
+                letra_diferenca = get_column_letter(col_diferenca)
+    
+                # FÓRMULA 1: Recebido = Valor Entregas + Acréscimo Calculado
+                formula_recebido = f"={letra_valor_entregas}{row_num}+{letra_acrescimo_calculado}{row_num}"
+                ws[f"{letra_recebido}{row_num}"] = formula_recebido
+    
+                # FÓRMULA 2: Total Dia = Valor Entregas + Acréscimo Pago - Descontos
+                formula_total_dia = f"={letra_valor_entregas}{row_num}+{letra_acrescimo_pago}{row_num}"
+                ws[f"{letra_total_dia}{row_num}"] = formula_total_dia
+    
+                # FÓRMULA 3: Diferença = Recebido - Total Dia
+                formula_diferenca = f"={letra_recebido}{row_num}-{letra_total_dia}{row_num}"
+                ws[f"{letra_diferenca}{row_num}"] = formula_diferenca
+    
+            logging.info(f"    Fórmulas Excel aplicadas na aba {sheet_name}: Recebido, Total Dia e Diferença")
+        else:
+            logging.warning(f"    Não foi possível aplicar fórmulas na aba {sheet_name} - algumas colunas não encontradas")
+    
+        # Formatação da aba
+        header_fill = PatternFill(start_color="ADD8E6", end_color="ADD8E6", fill_type="solid") # LightBlue
+        for cell in ws["1:1"]:
+            cell.fill = header_fill
+    
+        # Encontrar a linha "Total" e aplicar formatação
+        for row_idx in range(1, ws.max_row + 1):
+            if ws.cell(row=row_idx, column=1).value == "Total":
+                for col_idx in range(1, ws.max_column + 1):
+                    ws.cell(row=row_idx, column=col_idx).fill = PatternFill(start_color="ADD8E6", end_color="ADD8E6", fill_type="solid") # LightBlue
+                break
+    
+    book.save(caminho_saida)
+
+# Fechamentos sintéticos de um mês, gerados pelo próprio calcular_fechamento
+def gerar_fechamentos(motoristas=MOTORISTAS_FECHAMENTO, dias=DIAS_FECHAMENTO, semente=42):
+    aleatorio = random.Random(semente)
+    script_fechamento.diarios_info = {f"MOTORISTA {i:04d}": {"diaria": 200, "tipo": "PASSEIO"} for i in range(motoristas)}
+    fechamentos = []
+    for nome in script_fechamento.diarios_info:
+        entregas = {}
+        acrescimos = {}
+        for dia in range(1, dias + 1):
+            data = datetime(2025, 7, dia).date()
+            entregas[data] = {"entregues": aleatorio.randint(20, 80), "insucessos": aleatorio.randint(0, 5)}
+            if aleatorio.random() < 0.2:
+                acrescimos[data] = 30.0
+        fechamentos.append(calcular_fechamento(nome, entregas, acrescimos, set(acrescimos)))
+    return fechamentos
+
+# Cálculo do fechamento como era feito antes (um motorista por vez, lista de dicionários por dia)
+def calcular_fechamento_legado(nome_motorista, entregas_por_dia, acres_por_data, bonus_pago_dates):
+    valor_entrega = script_fechamento.VALOR_ENTREGA
+    bonus_diario = script_fechamento.BONUS_DIARIO
+    nome_final = encontrar_nome_aproximado(nome_motorista.strip().upper())
+    if not nome_final:
+        return None, pd.DataFrame()
+    info = script_fechamento.diarios_info[nome_final]
+    diaria, tipo_veiculo = info["diaria"], info["tipo"]
+
+    registros = []
+    todas_datas = set(entregas_por_dia.keys()) | set(acres_por_data.keys())
+    for data in sorted(todas_datas):
+        entregues = entregas_por_dia.get(data, {"entregues": 0})["entregues"]
+        insucessos = entregas_por_dia.get(data, {"insucessos": 0})["insucessos"]
+        valor_entregas = entregues * valor_entrega
+        descontos = insucessos * valor_entrega
+        registros.append({
+            "Data": data.strftime("%d/%m/%Y"), "Motorista": nome_final, "Tipo de Veículo": tipo_veiculo,
+            "Entregues": entregues, "Insucessos": insucessos, "Valor Entregas": valor_entregas, "Descontos": descontos,
+            "Acréscimo Calculado": max(0.0, diaria - valor_entregas - descontos), "Acréscimo Pago": acres_por_data.get(data, 0.0),
+            "Recebido": None, "Total Dia": None, "Bônus": bonus_diario if data in bonus_pago_dates else 0, "Diferença": None,
+        })
+    registros.append({
+        "Data": "Total", "Motorista": nome_final, "Tipo de Veículo": tipo_veiculo,
+        "Entregues": sum(v["entregues"] for v in entregas_por_dia.values()),
+        "Insucessos": sum(v["insucessos"] for v in entregas_por_dia.values()),
+        "Valor Entregas": sum(v["entregues"] for v in entregas_por_dia.values()) * valor_entrega,
+        "Descontos": sum(v["insucessos"] for v in entregas_por_dia.values()) * valor_entrega,
+        "Acréscimo Calculado": 0.0, "Acréscimo Pago": sum(acres_por_data.values()),
+        "Recebido": None, "Total Dia": None,
+        "Bônus": len([d for d in todas_datas if d in bonus_pago_dates]) * bonus_diario, "Diferença": None,
+    })
+    return nome_final, pd.DataFrame(registros)
+
+# Resultados de extração sintéticos de um mês para os motoristas de gerar_fechamentos()
+def gerar_extracoes(motoristas=MOTORISTAS_FECHAMENTO, dias=DIAS_FECHAMENTO, semente=42):
+    aleatorio = random.Random(semente)
+    extracoes = []
+    for indice in range(motoristas):
+        entregas = {}
+        acrescimos = {}
+        for dia in range(1, dias + 1):
+            data = datetime(2025, 7, dia).date()
+            entregas[data] = {"entregues": aleatorio.randint(20, 80), "insucessos": aleatorio.randint(0, 5)}
+            if aleatorio.random() < 0.2:
+                acrescimos[data] = aleatorio.choice([15.0, 30.0, 45.5])
+        extracoes.append((f"MOTORISTA {indice:04d}", entregas, acrescimos, set(acrescimos)))
+    return extracoes
+
+def benchmark_calculo_fechamento():
+    extracoes = gerar_extracoes()
+    script_fechamento.diarios_info = {nome: {"diaria": 200, "tipo": "PASSEIO"} for nome, _, _, _ in extracoes}
+
+    inicio = time.perf_counter()
+    legado = [calcular_fechamento_legado(*extracao) for extracao in extracoes]
+    duracao_legado = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    registros = [(extracao[0], RegistrosMotorista.da_extracao(*extracao)) for extracao in extracoes]
+    duracao_registros = time.perf_counter() - inicio
+    novo = calcular_fechamentos(registros)
+    duracao_novo = time.perf_counter() - inicio
+
+    for (nome_legado, df_legado), (nome_novo, df_novo) in zip(legado, novo):
+        if nome_legado != nome_novo:
+            raise AssertionError("O cálculo vetorizado encontrou outro motorista")
+        pd.testing.assert_frame_equal(df_legado, df_novo, check_dtype=False)
+    print(f"Cálculo do fechamento ({len(extracoes)} motoristas, {DIAS_FECHAMENTO} dias): antes {duracao_legado * 1000:.0f} ms, "
+          f"depois {duracao_novo * 1000:.0f} ms (dos quais {duracao_registros * 1000:.0f} ms montando os registros)")
+    return {"calculo/parede_s": duracao_novo}
+
+# Tempo e pico de memória (tracemalloc) de uma função de gravação
+def medir_gravacao(funcao, fechamentos):
+    with tempfile.TemporaryDirectory() as pasta:
+        caminho = os.path.join(pasta, "fechamento.xlsx")
+        inicio = time.perf_counter()
+        funcao(caminho, fechamentos)
+        duracao = time.perf_counter() - inicio
+
+        tracemalloc.start()
+        funcao(caminho, fechamentos)
+        _, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return duracao, pico
+
+def benchmark_gravacao_excel():
+    logging.disable(logging.WARNING)
+    try:
+        fechamentos = gerar_fechamentos()
+        for motoristas in (MOTORISTAS_FECHAMENTO // 3, MOTORISTAS_FECHAMENTO):
+            duracao_legado, pico_legado = medir_gravacao(escrever_fechamento_legado, fechamentos[:motoristas])
+            duracao_novo, pico_novo = medir_gravacao(escrever_fechamento, fechamentos[:motoristas])
+            print(f"Gravação do Excel ({motoristas} abas de {DIAS_FECHAMENTO} dias): "
+                  f"antes {duracao_legado:.2f} s / {pico_legado / 2**20:.0f} MB, depois {duracao_novo:.2f} s / {pico_novo / 2**20:.0f} MB")
+    finally:
+        logging.disable(logging.NOTSET)
+
+# Executa a função e devolve (resultado, segundos, pico de memória alocada pelo Python em bytes)
+# A memória é medida numa segunda execução, porque o tracemalloc deixa o código bem mais lento
+def medir_tempo_e_memoria(funcao, *args, **kwargs):
+    inicio = time.perf_counter()
+    resultado = funcao(*args, **kwargs)
+    duracao = time.perf_counter() - inicio
+
+    tracemalloc.start()
+    try:
+        funcao(*args, **kwargs)
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return resultado, duracao, pico
+
+# extrair_dados_pdf em faturas sintéticas de tamanhos crescentes; confere o resultado com o esperado pelo gerador
+def benchmark_extracao_sintetica(paginas_escala=PAGINAS_ESCALA):
+    resultados = {}
+    with tempfile.TemporaryDirectory() as pasta:
+        for paginas in paginas_escala:
+            caminho = os.path.join(pasta, f"fatura_{paginas}.pdf")
+            esperado = gerar_fatura(caminho, "MOTORISTA SINTETICO", entregas_para_paginas(paginas), semente=paginas)
+            megabytes = os.path.getsize(caminho) / 2**20
+            for backend in BACKENDS_ESCALA:
+                extraido, duracao, pico = medir_tempo_e_memoria(extrair_dados_pdf, caminho, backend=backend)
+                nome, entregas, acrescimos, bonus = extraido
+                if (nome, {data: dict(valor) for data, valor in entregas.items()}, dict(acrescimos), set(bonus)) != esperado:
+                    raise AssertionError(f"Extração ({backend}) da fatura sintética de {paginas} páginas diferente do esperado")
+                paginas_lidas = script_fechamento.metricas_pdfs[caminho]["paginas"]
+                chave = f"extracao/{backend}/{paginas}p"
+                resultados[f"{chave}/parede_s"] = duracao
+                resultados[f"{chave}/pico_mb"] = pico / 2**20
+                print(f"Extração sintética ({paginas_lidas} páginas, {megabytes:.2f} MB, {backend}): {duracao:.2f} s, "
+                      f"{paginas_lidas / duracao:.1f} páginas/s, {megabytes / duracao:.2f} MB/s, pico {pico / 2**20:.1f} MB")
+    return resultados
+
+# Execução completa do main() (extração, busca de nomes, fechamento e planilha) num corpus sintético
+# A planilha de motoristas tem os nomes do corpus no meio de MOTORISTAS_PLANILHA nomes aleatórios
+def benchmark_ponta_a_ponta(motoristas=MOTORISTAS_CORPUS, paginas=PAGINAS_CORPUS):
+    resultados = {}
+    with tempfile.TemporaryDirectory() as pasta:
+        pasta_pdfs = os.path.join(pasta, "pdfs")
+        corpus = gerar_corpus(pasta_pdfs, motoristas, paginas)
+        diarios, _ = gerar_nomes()
+        for _, (nome, _, _, _) in corpus:
+            diarios[nome] = {"diaria": 150.0, "tipo": "MOTO"}
+
+        configuracao = dict(PASTA_PDFS=pasta_pdfs, SAIDA_EXCEL=os.path.join(pasta, "fechamento.xlsx"),
+                            ERROR_REPORT_FILE=os.path.join(pasta, "erros.log"), RELATORIO_EXECUCAO=os.path.join(pasta, "execucao.json"),
+                            USAR_CACHE=False, INCREMENTAL=False, WORKERS=1, BACKEND_PDF="auto", diarios_info=diarios)
+        anterior = {nome: getattr(script_fechamento, nome) for nome in configuracao}
+        try:
+            for nome, valor in configuracao.items():
+                setattr(script_fechamento, nome, valor)
+            # Os tempos por etapa vêm do relatório da primeira execução, sem o custo do tracemalloc
+            inicio = time.perf_counter()
+            script_fechamento.main()
+            duracao = time.perf_counter() - inicio
+            with open(configuracao["RELATORIO_EXECUCAO"], encoding="utf-8") as f:
+                relatorio = json.load(f)
+
+            tracemalloc.start()
+            try:
+                script_fechamento.main()
+                _, pico = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+        finally:
+            for nome, valor in anterior.items():
+                setattr(script_fechamento, nome, valor)
+
+    paginas_lidas = relatorio["resumo"]["paginas"]
+    etapas = ", ".join(f"{etapa} {tempo['parede_s']:.2f} s" for etapa, tempo in relatorio["etapas"].items())
+    print(f"Execução completa ({motoristas} PDFs, {paginas_lidas} páginas, {len(diarios)} motoristas na planilha): "
+          f"{duracao:.2f} s, {paginas_lidas / duracao:.1f} páginas/s, pico {pico / 2**20:.1f} MB ({etapas})")
+    resultados["ponta_a_ponta/parede_s"] = duracao
+    resultados["ponta_a_ponta/pico_mb"] = pico / 2**20
+    for etapa, tempo in relatorio["etapas"].items():
+        resultados[f"ponta_a_ponta/{etapa}/parede_s"] = tempo["parede_s"]
+    return resultados
+
+# Compara com resultados salvos: tempos (_s) e memória (_mb) acima da tolerância contam como regressão
+def comparar_resultados(atuais, anteriores, tolerancia=TOLERANCIA_REGRESSAO):
+    regressoes = []
+    for chave, valor in sorted(atuais.items()):
+        anterior = anteriores.get(chave)
+        # Etapas muito curtas variam mais que a tolerância só por ruído de medição
+        if not anterior or anterior < 0.05:
+            continue
+        if valor > anterior * (1 + tolerancia):
+            regressoes.append(f"{chave}: {anterior:.3f} -> {valor:.3f} (+{(valor / anterior - 1) * 100:.0f}%)")
+    for regressao in regressoes:
+        print(f"REGRESSÃO {regressao}")
+    return regressoes
+
+BENCHMARKS = {
+    "classificador": benchmark_classificador_linhas,
+    "nomes": benchmark_busca_nomes,
+    "planilha_veiculos": benchmark_planilha_veiculos,
+    "calculo": benchmark_calculo_fechamento,
+    "gravacao": benchmark_gravacao_excel,
+    "extracao": benchmark_extracao_sintetica,
+    "ponta_a_ponta": benchmark_ponta_a_ponta,
+}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks do script de fechamento.")
+    parser.add_argument("--somente", nargs="+", choices=list(BENCHMARKS), help="Executa só os benchmarks indicados.")
+    parser.add_argument("--motoristas", type=int, default=MOTORISTAS_CORPUS, help="PDFs do corpus sintético da execução completa.")
+    parser.add_argument("--paginas", type=int, default=PAGINAS_CORPUS, help="Páginas por PDF do corpus sintético da execução completa.")
+    parser.add_argument("--salvar", help="Grava os tempos e picos de memória medidos neste arquivo JSON.")
+    parser.add_argument("--comparar", help="Compara com um arquivo gravado por --salvar e termina com erro se houver regressão.")
+    args = parser.parse_args()
+
+    # Os logs INFO por linha dominariam o tempo medido
+    logging.getLogger().setLevel(logging.WARNING)
+    resultados = {}
+    for nome in args.somente or BENCHMARKS:
+        if nome == "ponta_a_ponta":
+            medidos = benchmark_ponta_a_ponta(args.motoristas, args.paginas)
+        else:
+            medidos = BENCHMARKS[nome]()
+        resultados.update(medidos or {})
+
+    if args.salvar:
+        with open(args.salvar, "w", encoding="utf-8") as f:
+            json.dump(resultados, f, indent=2)
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            if comparar_resultados(resultados, json.load(f)):
+                sys.exit(1)
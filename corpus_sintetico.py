@@ -0,0 +1,232 @@
+# Gerador de faturas sintéticas de motorista no layout dos PDFs da Magalu
+# Usado pelos benchmarks e testes para medir a extração com quantos motoristas e páginas forem necessários
+# Uso: python corpus_sintetico.py PASTA [--motoristas N] [--paginas N]
+import argparse
+import os
+import random
+import zlib
+from collections import defaultdict
+from datetime import date, timedelta
+
+PRENOMES = ["ANA", "BRUNO", "CAMILA", "DANIEL", "ELISIANE", "FERNANDO", "GABRIELA", "HELIO", "IGOR", "JULIANA",
+            "KAUA", "LUCAS", "MARIA", "NATALIA", "OTAVIO", "PAULO", "RAFAELA", "SERGIO", "TATIANE", "VINICIUS"]
+SOBRENOMES = ["SILVA", "SANTOS", "OLIVEIRA", "SOUZA", "RODRIGUES", "FERREIRA", "ALVES", "PEREIRA", "LIMA", "GOMES",
+              "COSTA", "RIBEIRO", "MARTINS", "CARVALHO", "ALMEIDA", "LOPES", "SOARES", "FERNANDES", "VIEIRA", "BARBOSA",
+              "ROCHA", "DIAS", "NASCIMENTO", "ANDRADE", "MOREIRA", "NUNES", "MARQUES", "MACHADO", "MENDES", "FREITAS"]
+
+# Página A4 em pontos, margens e espaçamento das linhas de texto
+LARGURA_PAGINA = 595
+ALTURA_PAGINA = 842
+MARGEM = 40
+TAMANHO_FONTE = 8
+ENTRELINHA = 14
+LINHAS_POR_PAGINA = (ALTURA_PAGINA - 2 * MARGEM) // ENTRELINHA
+
+VALOR_ENTREGA = 3.8
+SERVICOS = ["Entrega Convencional", "Entrega Convencional", "Entrega Expressa", "3P Malha Direta"]
+MOTIVOS_ACRESCIMO = ["Ajuste de rota", "Diária complementar", "Coleta extra", "Pedágio"]
+VALORES_ACRESCIMO = [15.0, 20.0, 25.5, 40.0, 45.0, 60.0]
+
+# Colunas (posição x) da listagem de entregas e da tabela de acréscimos
+COLUNAS_ENTREGAS = [MARGEM, 95, 150, 210, 320, 380, 445, 500]
+COLUNAS_ACRESCIMOS = [MARGEM, 110, 250, 330, 450, 510, LARGURA_PAGINA - MARGEM]
+
+# Documento PDF mínimo (PDF 1.4) com texto em Helvetica e linhas retas
+# Cada página é uma lista de comandos de conteúdo; as fontes padrão não precisam ser embutidas
+class DocumentoPdf:
+    def __init__(self):
+        self.paginas = []
+
+    def nova_pagina(self):
+        self.paginas.append([])
+
+    def texto(self, x, y, conteudo, pagina=-1):
+        conteudo = conteudo.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+        self.paginas[pagina].append(f"BT /F1 {TAMANHO_FONTE} Tf {x} {y} Td ({conteudo}) Tj ET")
+
+    def linha(self, x1, y1, x2, y2):
+        self.paginas[-1].append(f"{x1} {y1} m {x2} {y2} l S")
+
+    def salvar(self, caminho):
+        # Objetos: 1 catálogo, 2 árvore de páginas, 3 fonte; depois página e conteúdo de cada página
+        objetos = [
+            b"<< /Type /Catalog /Pages 2 0 R >>",
+            None,
+            b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+        ]
+        paginas = []
+        for comandos in self.paginas:
+            conteudo = zlib.compress("\n".join(["0.5 w"] + comandos).encode("cp1252"))
+            numero_pagina = len(objetos) + 1
+            paginas.append(f"{numero_pagina} 0 R")
+            objetos.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {LARGURA_PAGINA} {ALTURA_PAGINA}] "
+                           f"/Resources << /Font << /F1 3 0 R >> >> /Contents {numero_pagina + 1} 0 R >>".encode())
+            objetos.append(f"<< /Length {len(conteudo)} /Filter /FlateDecode >>\nstream\n".encode() + conteudo + b"\nendstream")
+        objetos[1] = f"<< /Type /Pages /Kids [{' '.join(paginas)}] /Count {len(paginas)} >>".encode()
+
+        saida = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        posicoes = []
+        for numero, objeto in enumerate(objetos, start=1):
+            posicoes.append(len(saida))
+            saida += f"{numero} 0 obj\n".encode() + objeto + b"\nendobj\n"
+        inicio_xref = len(saida)
+        saida += f"xref\n0 {len(objetos) + 1}\n0000000000 65535 f \n".encode()
+        for posicao in posicoes:
+            saida += f"{posicao:010d} 00000 n \n".encode()
+        saida += f"trailer\n<< /Size {len(objetos) + 1} /Root 1 0 R >>\nstartxref\n{inicio_xref}\n%%EOF\n".encode()
+        with open(caminho, "wb") as f:
+            f.write(saida)
+
+# Escreve as linhas da fatura de cima para baixo, abrindo páginas novas (com o cabeçalho de impressão) quando necessário
+class _Paginador:
+    def __init__(self, documento, cabecalho):
+        self.documento = documento
+        self.cabecalho = cabecalho
+        self.y = 0
+
+    def _reservar(self, linhas):
+        if not self.documento.paginas or self.y - linhas * ENTRELINHA < MARGEM:
+            self.documento.nova_pagina()
+            self.y = ALTURA_PAGINA - MARGEM
+            self.documento.texto(MARGEM, self.y, self.cabecalho)
+            self.y -= ENTRELINHA
+
+    def linha(self, conteudo):
+        self._reservar(1)
+        self.documento.texto(MARGEM, self.y, conteudo)
+        self.y -= ENTRELINHA
+
+    def celulas(self, colunas, valores):
+        self._reservar(1)
+        for x, valor in zip(colunas, valores):
+            self.documento.texto(x + 2, self.y, valor)
+        self.y -= ENTRELINHA
+
+    # Tabela com grade completa (bordas em todas as células), que o pdfplumber detecta como tabela
+    def tabela(self, colunas, linhas):
+        self._reservar(len(linhas))
+        topo = self.y + ENTRELINHA - 4
+        for valores in linhas:
+            self.celulas(colunas, valores)
+        base = self.y + ENTRELINHA - 4
+        for indice in range(len(linhas) + 1):
+            y = topo - indice * ENTRELINHA
+            self.documento.linha(colunas[0], y, colunas[-1], y)
+        for x in colunas:
+            self.documento.linha(x, topo, x, base)
+
+def _reais(valor):
+    return "R$ " + f"{valor:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+
+# Nome de motorista sintético (dois prenomes e dois sobrenomes)
+def gerar_nome(rng):
+    return " ".join(rng.sample(PRENOMES, 2) + rng.sample(SOBRENOMES, 2))
+
+# Gera a fatura de um motorista e devolve o resultado esperado da extração:
+# (nome, {data: {"entregues", "insucessos"}}, {data: acréscimo}, {datas com bônus})
+# As entregas se espalham pelos dias do período; acréscimos e bônus caem em alguns desses dias
+# Cada página leva o cabeçalho e o rodapé da impressão do navegador (hora da impressão, endereço e contador "1/4");
+# "paginas" (opcional) exporta só as páginas de índices dados, como uma impressão de parte do relatório,
+# e o resultado esperado continua sendo o da fatura inteira
+def gerar_fatura(caminho, motorista, entregas, inicio=date(2025, 7, 1), dias=15, semente=0,
+                 taxa_insucesso=0.05, dias_com_acrescimo=3, dias_com_bonus=5, impressao="10:59", paginas=None):
+    rng = random.Random(semente)
+    datas = [inicio + timedelta(days=indice) for indice in range(dias)]
+    emissao = (inicio + timedelta(days=dias + 1)).strftime("%d/%m/%Y")
+    documento = DocumentoPdf()
+    paginador = _Paginador(documento, f"{emissao}, {impressao} GFL - Impressão de Fatura Motorista")
+
+    fatura = rng.randint(1000000, 9999999)
+    paginador.linha("Magalu Log Serviços Logísticos Ltda")
+    paginador.linha(f"Fatura Nº: {fatura}")
+    paginador.linha("Beneficiário: LOGISTICA SINTETICA LTDA")
+    paginador.linha(f"Motorista: {motorista}")
+    paginador.linha(f"CPF: {rng.randint(100, 999)}.{rng.randint(100, 999)}.{rng.randint(100, 999)}-{rng.randint(10, 99)}")
+    paginador.linha("REMUNERAÇÕES")
+    paginador.linha("Coletas/Entregas")
+    paginador.celulas(COLUNAS_ENTREGAS, ["Cod.", "Solicitação", "NF/Série", "Serviço", "Romaneio", "Data Operação", "Realizado?", "$ À pagar"])
+
+    esperado_entregas = defaultdict(lambda: {"entregues": 0, "insucessos": 0})
+    codigo = rng.randint(300000000, 330000000)
+    for indice in range(entregas):
+        data = datas[indice * dias // max(entregas, 1)]
+        entregue = rng.random() >= taxa_insucesso
+        esperado_entregas[data]["entregues" if entregue else "insucessos"] += 1
+        paginador.celulas(COLUNAS_ENTREGAS, [
+            str(codigo + indice), str(rng.randint(200000000, 299999999)), f"{rng.randint(1000, 99999999)}/{rng.randint(1, 99)}",
+            rng.choice(SERVICOS), str(16500000 + datas.index(data)), data.strftime("%d/%m/%Y"),
+            "Sim" if entregue else "Não", _reais(VALOR_ENTREGA if entregue else 0),
+        ])
+
+    # Bônus diário: uma linha de R$ 30,00 por dia na seção de Remunerações Diárias
+    datas_bonus = set(rng.sample(datas, min(dias_com_bonus, dias)))
+    paginador.linha("Remunerações Diárias")
+    for data in sorted(datas_bonus):
+        paginador.linha(f"{data.strftime('%d/%m/%Y')} Bônus diário {_reais(30.0)}")
+
+    # Acréscimos: tabela com grade; valores distintos no mesmo dia para não serem tomados como duplicados
+    esperado_acrescimos = defaultdict(float)
+    linhas_acrescimos = [["Identificador", "Nome da Pessoa", "Data de Operação", "Motivo do Acréscimo", "Valor", "Observação"]]
+    for data in sorted(rng.sample(datas, min(dias_com_acrescimo, dias))):
+        for valor in rng.sample(VALORES_ACRESCIMO, rng.randint(1, 2)):
+            esperado_acrescimos[data] += valor
+            linhas_acrescimos.append([str(rng.randint(10000, 99999)), motorista.split()[0], data.strftime("%d/%m/%Y"),
+                                      rng.choice(MOTIVOS_ACRESCIMO), _reais(valor), "-"])
+    paginador.linha("ACRÉSCIMOS")
+    paginador.tabela(COLUNAS_ACRESCIMOS, linhas_acrescimos)
+    paginador.linha("DESCONTOS")
+    paginador.linha("Identificador Nome da Pessoa Data de Operação Motivo do Desconto Valor Observação")
+
+    total_entregas = sum(item["entregues"] for item in esperado_entregas.values()) * VALOR_ENTREGA
+    total_acrescimos = sum(esperado_acrescimos.values())
+    paginador.linha("RESUMO DA FATURA (Totais)")
+    paginador.tabela([MARGEM, 250, 400], [
+        ["Extrato", ""],
+        ["Valor Remuneração", _reais(total_entregas)],
+        ["Acréscimos", "+ " + _reais(total_acrescimos)],
+        ["Descontos Gerais", "- " + _reais(0)],
+        ["Valor Líquido", _reais(total_entregas + total_acrescimos)],
+    ])
+    paginador.linha("Motorista Conferente Transportadora")
+
+    if paginas is not None:
+        documento.paginas = [documento.paginas[indice] for indice in paginas]
+    fcr = f"{zlib.crc32(f'{fatura} {emissao} {impressao}'.encode()):08x}" * 4
+    for indice in range(len(documento.paginas)):
+        documento.texto(MARGEM, MARGEM - ENTRELINHA, f"https://gfl.sinclog.com.br/InvoicesCharges/InvoiceChargePrint"
+                        f"?f={fatura}&fcr={fcr} {indice + 1}/{len(documento.paginas)}", indice)
+    documento.salvar(caminho)
+    return motorista, dict(esperado_entregas), dict(esperado_acrescimos), datas_bonus
+
+# Quantidade de entregas que ocupa aproximadamente o número de páginas pedido
+# O cabeçalho da fatura, as remunerações, os acréscimos e o resumo ocupam cerca de LINHAS_FORA_ENTREGAS linhas
+LINHAS_FORA_ENTREGAS = 45
+def entregas_para_paginas(paginas):
+    return max(1, paginas * (LINHAS_POR_PAGINA - 1) - LINHAS_FORA_ENTREGAS)
+
+# Gera um corpus com um PDF por motorista, cada um com aproximadamente "paginas" páginas
+# Devolve [(caminho, resultado esperado)] na ordem dos arquivos gerados
+def gerar_corpus(pasta, motoristas=10, paginas=4, semente=42):
+    os.makedirs(pasta, exist_ok=True)
+    rng = random.Random(semente)
+    corpus = []
+    nomes = set()
+    while len(nomes) < motoristas:
+        nome = gerar_nome(rng)
+        if nome in nomes:
+            continue
+        nomes.add(nome)
+        caminho = os.path.join(pasta, f"{nome.title()}.pdf")
+        esperado = gerar_fatura(caminho, nome, entregas_para_paginas(paginas), semente=rng.random())
+        corpus.append((caminho, esperado))
+    return corpus
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gera faturas sintéticas de motoristas no layout dos PDFs da Magalu.")
+    parser.add_argument("pasta", help="Pasta onde os PDFs serão gravados.")
+    parser.add_argument("--motoristas", type=int, default=10, help="Quantidade de motoristas (um PDF cada; padrão: 10).")
+    parser.add_argument("--paginas", type=int, default=4, help="Páginas aproximadas por PDF (padrão: 4).")
+    parser.add_argument("--semente", type=int, default=42, help="Semente do gerador aleatório (padrão: 42).")
+    args = parser.parse_args()
+    corpus = gerar_corpus(args.pasta, args.motoristas, args.paginas, args.semente)
+    print(f"{len(corpus)} PDFs gerados em {args.pasta}")
@@ -6,8 +6,42 @@ import os
 import sys
 import time
 import queue
+import shutil
+import tempfile
 from datetime import datetime
 
+# Limites da área de logs: a interface mostra só as últimas linhas (o log completo fica no arquivo
+# temporário usado por "Salvar Logs") e cada ciclo insere no máximo um lote de mensagens
+MAX_LINHAS_LOG = 5000
+MAX_MENSAGENS_POR_CICLO = 20000
+INTERVALO_LOG_MS = 100
+
+def classificar_nivel(linha):
+    """Determina o nível (cor) de uma linha de saída do script, convertendo-a uma única vez"""
+    maiusculas = linha.upper()
+    if "ERROR" in maiusculas or "ERRO" in maiusculas:
+        return "ERROR"
+    if "WARNING" in maiusculas or "AVISO" in maiusculas:
+        return "WARNING"
+    if "SUCCESS" in maiusculas or "SUCESSO" in maiusculas:
+        return "SUCCESS"
+    return "INFO"
+
+def agrupar_mensagens(mensagens):
+    """Junta mensagens seguidas do mesmo nível; devolve os argumentos (texto, tag, texto, tag, ...) de um único insert"""
+    argumentos = []
+    textos = []
+    nivel_atual = None
+    for mensagem, nivel in mensagens:
+        if nivel != nivel_atual and textos:
+            argumentos += ["".join(textos), nivel_atual]
+            textos = []
+        textos.append(mensagem)
+        nivel_atual = nivel
+    if textos:
+        argumentos += ["".join(textos), nivel_atual]
+    return argumentos
+
 class ScriptLauncher:
     def __init__(self, root):
         self.root = root
@@ -19,6 +53,8 @@ class ScriptLauncher:
         self.current_process = None
         self.is_running = False
         self.log_queue = queue.Queue()
+        # Log completo da execução (a área de logs guarda só as últimas MAX_LINHAS_LOG linhas)
+        self.log_spool = tempfile.TemporaryFile(mode="w+", encoding="utf-8")
         
         # Configuração dos scripts disponíveis
         self.scripts_config = {
@@ -160,22 +196,43 @@ class ScriptLauncher:
         # Adicionar à queue para thread-safe update
         self.log_queue.put((formatted_msg, level))
     
-    def check_log_queue(self):
-        """Verifica a queue de logs e atualiza a interface"""
+    def flush_log_queue(self):
+        """Move as mensagens da queue para a interface com um único insert; devolve se ainda sobraram mensagens"""
+        mensagens = []
         try:
-            while True:
-                message, level = self.log_queue.get_nowait()
-                self.log_text.insert(tk.END, message, level)
-                self.log_text.see(tk.END)
+            while len(mensagens) < MAX_MENSAGENS_POR_CICLO:
+                mensagens.append(self.log_queue.get_nowait())
         except queue.Empty:
             pass
+        if not mensagens:
+            return False
+
+        self.log_spool.write("".join(message for message, _ in mensagens))
+        # Só as últimas MAX_LINHAS_LOG mensagens do lote podem sobrar na área de logs
+        self.log_text.insert(tk.END, *agrupar_mensagens(mensagens[-MAX_LINHAS_LOG:]))
+        linhas = int(self.log_text.index("end-1c").split(".")[0]) - 1
+        if linhas > MAX_LINHAS_LOG:
+            self.log_text.delete("1.0", f"{linhas - MAX_LINHAS_LOG + 1}.0")
+        self.log_text.see(tk.END)
+        return len(mensagens) == MAX_MENSAGENS_POR_CICLO
+    
+    def check_log_queue(self):
+        """Verifica a queue de logs e atualiza a interface"""
+        sobrou = self.flush_log_queue()
         
-        # Reagendar verificação
-        self.root.after(100, self.check_log_queue)
+        # Reagendar verificação (logo em seguida se a queue ainda tem mensagens)
+        self.root.after(1 if sobrou else INTERVALO_LOG_MS, self.check_log_queue)
+    
+    def reset_logs(self):
+        """Esvazia a área de logs e o log completo"""
+        self.flush_log_queue()
+        self.log_text.delete(1.0, tk.END)
+        self.log_spool.seek(0)
+        self.log_spool.truncate()
     
     def clear_logs(self):
         """Limpa a área de logs"""
-        self.log_text.delete(1.0, tk.END)
+        self.reset_logs()
         self.log_message("Logs limpos", "INFO")
     
     def save_logs(self):
@@ -186,8 +243,14 @@ class ScriptLauncher:
         )
         if file_path:
             try:
+                # Salva o log completo, inclusive as linhas que já saíram da área de logs
+                while self.flush_log_queue():
+                    pass
+                self.log_spool.flush()
+                self.log_spool.seek(0)
                 with open(file_path, 'w', encoding='utf-8') as f:
-                    f.write(self.log_text.get(1.0, tk.END))
+                    shutil.copyfileobj(self.log_spool, f)
+                self.log_spool.seek(0, os.SEEK_END)
                 self.log_message(f"Logs salvos em: {file_path}", "SUCCESS")
             except Exception as e:
                 self.log_message(f"Erro ao salvar logs: {e}", "ERROR")
@@ -243,16 +306,7 @@ class ScriptLauncher:
                 line = line.strip()
                 if line:
                     # Determina o nível baseado no conteúdo
-                    if "ERROR" in line.upper() or "ERRO" in line.upper():
-                        level = "ERROR"
-                    elif "WARNING" in line.upper() or "AVISO" in line.upper():
-                        level = "WARNING"
-                    elif "SUCCESS" in line.upper() or "SUCESSO" in line.upper():
-                        level = "SUCCESS"
-                    else:
-                        level = "INFO"
-                    
-                    self.log_message(line, level)
+                    self.log_message(line, classificar_nivel(line))
             
             # Aguarda finalização
             return_code = self.current_process.wait()
@@ -309,7 +363,7 @@ class ScriptLauncher:
         self.status_var.set("🔄 Executando...")
         
         # Limpa logs anteriores
-        self.log_text.delete(1.0, tk.END)
+        self.reset_logs()
         
         # Inicia thread de execução
         thread = threading.Thread(target=self.run_script_thread, args=(script_config,))
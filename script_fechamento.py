@@ -1,586 +1,2767 @@
 import os
-import pandas as pd
-import pdfplumber
-from collections import defaultdict
-from datetime import datetime
+from collections import defaultdict, Counter, namedtuple, OrderedDict
+from datetime import datetime, date
 import difflib
 import re
 import unicodedata
-from openpyxl import load_workbook, Workbook
-from openpyxl.styles import PatternFill
 import configparser
 import logging
 import argparse
+import hashlib
+import json
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+from itertools import groupby
 
+# pandas, pdfplumber, pypdfium2 e openpyxl são importados dentro das funções que os usam:
+# importar este módulo (testes, benchmark) é rápido e não lê arquivos nem argumentos.
+# A configuração é feita por configurar(), chamada no início da execução do script
 
-# Lista para armazenar mensagens de erro e aviso
-error_report_messages = []
 
 # Configuração de logging
-class CustomFormatter(logging.Formatter):
-    def format(self, record):
-        msg = super().format(record)
-        if record.levelno in [logging.WARNING, logging.ERROR]:
-            error_report_messages.append(msg)
-        return msg
+FORMATO_LOG = "%(asctime)s - %(levelname)s - %(message)s"
+# Bibliotecas de leitura de PDF cujos avisos são agregados por arquivo (o pdfminer repete
+# "CropBox missing from /Page" para cada página de alguns PDFs)
+LOGGERS_TERCEIROS = ["pdfminer", "pdfplumber", "pypdfium2"]
 
-logger = logging.getLogger()
-logger.setLevel(logging.INFO)
+# Relatório de erros (WARNING e ERROR), gravado no disco à medida que as mensagens chegam
+# Antes de abrir() (avisos de configurar(), processos filhos) as linhas ficam pendentes em memória;
+# o arquivo só é criado quando a primeira mensagem da execução chega
+class RelatorioErros(logging.Handler):
+    def __init__(self):
+        super().__init__(logging.WARNING)
+        self.setFormatter(logging.Formatter(FORMATO_LOG))
+        self.pendentes = []
+        self.caminho = None
+        self.arquivo = None
+        self.mensagens = 0
 
-console_handler = logging.StreamHandler()
-console_handler.setFormatter(CustomFormatter("%(asctime)s - %(levelname)s - %(message)s"))
-logger.addHandler(console_handler)
+    def emit(self, record):
+        # Mensagens sobre o próprio relatório só vão para o console
+        if getattr(record, "fora_do_relatorio", False):
+            return
+        try:
+            self._escrever([self.format(record)])
+        except Exception:
+            self.handleError(record)
 
-# Carrega configurações do arquivo config.ini
-config = configparser.ConfigParser()
-config.read("config.ini")
+    def _escrever(self, linhas):
+        if self.caminho is None:
+            self.pendentes.extend(linhas)
+            return
+        if self.arquivo is None:
+            self.arquivo = open(self.caminho, "w")
+        for linha in linhas:
+            self.arquivo.write(linha + "\n")
+        self.arquivo.flush()
+        self.mensagens += len(linhas)
+
+    # Linhas já formatadas (vindas dos processos filhos)
+    def escrever(self, linhas):
+        self.acquire()
+        try:
+            self._escrever(linhas)
+        finally:
+            self.release()
+
+    def abrir(self, caminho):
+        self.acquire()
+        try:
+            # Uma execução anterior que terminou com exit() pode ter deixado o arquivo aberto
+            if self.arquivo is not None:
+                self.arquivo.close()
+                self.arquivo = None
+            self.caminho = caminho
+            self.mensagens = 0
+            pendentes, self.pendentes = self.pendentes, []
+            if pendentes:
+                self._escrever(pendentes)
+        finally:
+            self.release()
+
+    def retirar_pendentes(self):
+        self.acquire()
+        try:
+            pendentes, self.pendentes = self.pendentes, []
+            return pendentes
+        finally:
+            self.release()
+
+    # Fecha o arquivo e devolve quantas mensagens foram gravadas nele
+    def fechar(self):
+        self.acquire()
+        try:
+            if self.arquivo is not None:
+                self.arquivo.close()
+            self.arquivo = None
+            self.caminho = None
+            return self.mensagens
+        finally:
+            self.release()
+
+# Conta os avisos das bibliotecas de PDF em vez de repassá-los um a um
+# descarregar() registra um único aviso por mensagem distinta, com o número de repetições
+class AgregadorAvisos(logging.Handler):
+    def __init__(self):
+        super().__init__(logging.WARNING)
+        self.contagem = Counter()
+
+    def emit(self, record):
+        self.contagem[(record.levelno, record.name, record.getMessage())] += 1
+
+    def descarregar(self, origem):
+        self.acquire()
+        try:
+            contagem, self.contagem = self.contagem, Counter()
+        finally:
+            self.release()
+        for (nivel, nome, mensagem), vezes in contagem.items():
+            logging.log(nivel, "Aviso de %s em %s (%d vez(es)): %s", nome, origem, vezes, mensagem)
+
+console_handler = None
+relatorio_erros = RelatorioErros()
+agregador_avisos = AgregadorAvisos()
+
+# Instala o handler de console e o do relatório de erros no logger raiz e o agregador nos loggers
+# das bibliotecas de PDF, uma única vez por processo
+def configurar_logging():
+    global console_handler
+    if console_handler is not None:
+        return
+    logger = logging.getLogger()
+    logger.setLevel(logging.INFO)
+
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(logging.Formatter(FORMATO_LOG))
+    logger.addHandler(console_handler)
+    logger.addHandler(relatorio_erros)
+
+    for nome in LOGGERS_TERCEIROS:
+        logger_terceiro = logging.getLogger(nome)
+        logger_terceiro.addHandler(agregador_avisos)
+        logger_terceiro.propagate = False
+
+# Datas da linha de comando (dd/mm/aaaa)
+def _data_argumento(texto):
+    try:
+        return _converter_data(texto)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"data inválida: {texto} (use dd/mm/aaaa)")
 
 # Argumentos de linha de comando
-parser = argparse.ArgumentParser(description="Processa PDFs de motoristas para gerar um fechamento em Excel.")
-parser.add_argument("--pdfs_folder", type=str, help="Caminho para a pasta contendo os PDFs.")
-parser.add_argument("--type_sheet", type=str, help="Caminho para a planilha de tipos de veículos.")
-parser.add_argument("--output_excel", type=str, help="Nome do arquivo Excel de saída.")
-parser.add_argument("--error_report", type=str, default="error_report.log", help="Nome do arquivo para o relatório de erros.")
-args = parser.parse_args()
-
-# Caminhos (prioriza argumentos de linha de comando)
-PASTA_PDFS = args.pdfs_folder if args.pdfs_folder else config["Paths"]["pdfs_folder"]
-PLANILHA_TIPO = args.type_sheet if args.type_sheet else config["Paths"]["type_sheet"]
-SAIDA_EXCEL = args.output_excel if args.output_excel else config["Paths"]["output_excel"]
-ERROR_REPORT_FILE = args.error_report
-
-# Valores fixos
-VALOR_ENTREGA = float(config["Values"]["delivery_value"])
-BONUS_DIARIO = float(config["Values"]["daily_bonus"])
+def criar_parser():
+    parser = argparse.ArgumentParser(description="Processa PDFs de motoristas para gerar um fechamento em Excel.")
+    parser.add_argument("--pdfs_folder", type=str, help="Caminho para a pasta contendo os PDFs.")
+    parser.add_argument("--type_sheet", type=str, help="Caminho para a planilha de tipos de veículos.")
+    parser.add_argument("--output_excel", type=str, help="Nome do arquivo Excel de saída.")
+    parser.add_argument("--error_report", type=str, default="error_report.log", help="Nome do arquivo para o relatório de erros.")
+    parser.add_argument("--workers", type=int, default=1, help="Número de processos para extrair os PDFs em paralelo (padrão: 1, sequencial).")
+    parser.add_argument("--no-cache", action="store_true", help="Não usa o cache de extração; todos os PDFs são lidos novamente.")
+    parser.add_argument("--rebuild-cache", action="store_true", help="Ignora as entradas existentes do cache de extração e as regrava.")
+    parser.add_argument("--cache-dir", type=str, default=".cache_fechamento", help="Pasta do cache de extração (padrão: .cache_fechamento).")
+    parser.add_argument("--pdf-backend", choices=["pdfplumber", "pdfium", "auto"], default="pdfplumber",
+                        help="Leitor de PDF: pdfplumber (padrão), pdfium (só texto, mais rápido) ou auto (texto pelo pdfium e tabelas pelo pdfplumber quando necessário).")
+    parser.add_argument("--full-tables", action="store_true", help="Procura tabelas em todas as páginas, inclusive nas listagens de entregas (validação; desativa o cache).")
+    parser.add_argument("--cache-max-mb", type=float, default=256, help="Tamanho máximo do cache de extração em MB (padrão: 256).")
+    parser.add_argument("--run-report", type=str, help="Grava um relatório JSON da execução (tempo por etapa e por PDF, páginas, bytes e linhas) no caminho informado.")
+    parser.add_argument("--verbose", action="store_true", help="Mostra o detalhe de cada PDF (entregas, bônus, acréscimos e tabelas encontrados).")
+    parser.add_argument("--incremental", action="store_true", help="Processa de novo só os motoristas cujos PDFs ou linha da planilha de veículos mudaram desde a última execução.")
+    parser.add_argument("--watch", action="store_true", help="Fica acompanhando a pasta de PDFs: extrai cada PDF novo ou alterado assim que termina de ser gravado e gera a planilha de novo a cada mudança.")
+    parser.add_argument("--watch-interval", type=float, default=5.0, help="Intervalo em segundos entre as verificações da pasta no modo --watch (padrão: 5).")
+    parser.add_argument("--export", choices=FORMATOS_EXPORTACAO, help="Exporta também as linhas do fechamento (por motorista e dia, com os valores calculados) em Parquet ou CSV.")
+    parser.add_argument("--export-file", type=str, help="Arquivo da exportação (padrão: o nome da planilha de saída com a extensão do formato).")
+    parser.add_argument("--export-partition", choices=PARTICOES_EXPORTACAO, default="motorista", help="Ordem e partição das linhas exportadas: por motorista (padrão) ou por data.")
+    parser.add_argument("--pdf-timeout", type=float, help="Tempo máximo em segundos para extrair cada PDF (ou trecho de PDF); o PDF que passar do limite é ignorado e registrado no relatório de erros.")
+    parser.add_argument("--pdf-max-mb", type=float, help="Memória máxima em MB de cada processo de extração (espaço de endereçamento; Linux e macOS); o PDF que passar do limite é ignorado.")
+    parser.add_argument("--recycle-after", type=int, help="Troca cada processo de extração por um novo depois de N PDFs (ou trechos), limitando o acúmulo de memória.")
+    parser.add_argument("--store", type=str, help="Grava os registros por dia de cada PDF extraído em uma base SQLite, que guarda o histórico entre fechamentos.")
+    parser.add_argument("--from-store", action="store_true", help="Gera o fechamento a partir da base --store, sem ler PDFs (use com --since, --until e --driver).")
+    parser.add_argument("--since", type=_data_argumento, help="Com --from-store: primeiro dia do fechamento (dd/mm/aaaa).")
+    parser.add_argument("--until", type=_data_argumento, help="Com --from-store: último dia do fechamento (dd/mm/aaaa).")
+    parser.add_argument("--driver", action="append", help="Com --from-store: motorista a incluir, com o nome como aparece no PDF (pode ser repetido).")
+    return parser
+
+# Configuração padrão; configurar() a substitui pelos valores do config.ini e da linha de comando
+PASTA_PDFS = "pdfs/"
+PLANILHA_TIPO = "tipo de veiculos.xlsx"
+SAIDA_EXCEL = "Fechamento_Motoristas.xlsx"
+ERROR_REPORT_FILE = "error_report.log"
+WORKERS = 1
+USAR_CACHE = True
+RECONSTRUIR_CACHE = False
+PASTA_CACHE = ".cache_fechamento"
+CACHE_TAMANHO_MAXIMO = 256 * 1024 * 1024
+FORCAR_TABELAS = False
+BACKEND_PDF = "pdfplumber"
+INCREMENTAL = False
+RELATORIO_EXECUCAO = None
+EXPORTACAO = None
+ARQUIVO_EXPORTACAO = None
+PARTICAO_EXPORTACAO = "motorista"
+BASE_REGISTROS = None
+FECHAR_DA_BASE = False
+PERIODO_INICIO = None
+PERIODO_FIM = None
+MOTORISTAS_BASE = None
+TEMPO_LIMITE_PDF = None
+MEMORIA_PDF_MB = None
+TAREFAS_POR_PROCESSO = None
+
+# Versão da lógica de extração: incremente ao mudar extrair_dados_pdf para invalidar o cache
+EXTRATOR_VERSAO = 2
+
+# Contadores da extração exibidos no resumo da execução
+estatisticas_extracao = Counter()
+
+# Métricas de cada PDF extraído nesta execução (caminho -> dict), usadas no relatório de execução
+metricas_pdfs = {}
+# Quantidade de PDFs mais lentos listados no resumo do console
+PDFS_MAIS_LENTOS = 3
+
+# PDFs já extraídos pelo modo de vigia (--watch): caminho -> (tamanho, mtime_ns, {páginas repetidas: resultado})
+# extrair_pdfs usa o resultado sem ler o arquivo nem calcular o seu hash enquanto o tamanho e a data de
+# modificação não mudarem. O resultado depende das páginas repetidas em outros PDFs do motorista, que
+# entram na chave como no cache em disco; além da extração completa, só a mais recente com páginas
+# repetidas é guardada
+extracoes_prontas = {}
+
+# Tempo de parede e de CPU acumulados por etapa (abrir, texto, tabelas, analise, ...)
+class TemposEtapas:
+    def __init__(self):
+        self.parede = defaultdict(float)
+        self.cpu = defaultdict(float)
+
+    @contextmanager
+    def medir(self, etapa):
+        inicio_parede = time.perf_counter()
+        inicio_cpu = time.process_time()
+        try:
+            yield
+        finally:
+            self.parede[etapa] += time.perf_counter() - inicio_parede
+            self.cpu[etapa] += time.process_time() - inicio_cpu
+
+    def como_dict(self):
+        return {etapa: {"parede_s": round(self.parede[etapa], 4), "cpu_s": round(self.cpu[etapa], 4)} for etapa in self.parede}
+
+# Valores fixos (padrão; lidos do config.ini por configurar())
+VALOR_ENTREGA = 3.8
+BONUS_DIARIO = 30.0
 
 # Expressões regulares
 regex_data = re.compile(r"\b\d{2}/\d{2}/\d{4}\b")
 regex_valor = re.compile(r"R\$\s*([\d.,]+)")
+# Marcadores de seção e de status, procurados de uma vez no texto normalizado da linha
+# "coletas/entregas" vem antes de "entregas" para que a forma mais longa seja reconhecida
+regex_marcadores = re.compile(r"motorista:|remuneracoes diarias|acrescimo|remuneracao adicional|valores adicionais|coletas/entregas|entregas|total|resumo|sim|nao")
+MARCADORES_INICIO_ACRESCIMOS = frozenset(["acrescimo", "remuneracao adicional", "valores adicionais"])
+MARCADORES_FIM_ACRESCIMOS = frozenset(["total", "resumo", "coletas/entregas", "entregas"])
+
+# Tabela para str.translate que remove os caracteres combinantes (acentos) da decomposição NFKD
+# É preenchida sob demanda: cada caractere só é consultado no unicodedata na primeira vez que aparece
+class _TabelaSemAcentos(dict):
+    def __missing__(self, codigo):
+        valor = None if unicodedata.combining(chr(codigo)) else codigo
+        self[codigo] = valor
+        return valor
+
+_sem_acentos = _TabelaSemAcentos()
 
 # Normalização de texto
 def normalize(texto):
-    nfkd = unicodedata.normalize("NFKD", texto)
-    return u"".join([c for c in nfkd if not unicodedata.combining(c)]).lower()
+    return unicodedata.normalize("NFKD", texto).translate(_sem_acentos).lower()
+
+# Conversão de datas dd/mm/aaaa; um relatório repete poucas datas em milhares de linhas
+@lru_cache(maxsize=4096)
+def _converter_data(texto):
+    return datetime.strptime(texto, "%d/%m/%Y").date()
+
+# Resultado da classificação de uma linha do texto do PDF
+# secao: "remuneracoes" ou "acrescimos" quando a linha abre uma dessas seções
+# status: "Sim"/"Não" das linhas de entrega; data e valor: primeiras ocorrências na linha (texto)
+LinhaClassificada = namedtuple("LinhaClassificada", [
+    "motorista", "secao", "fim_remuneracoes", "fim_acrescimos", "status", "data", "valor", "bonus"])
+
+# Classifica a linha em uma única passada: normaliza uma vez, procura todos os marcadores
+# com uma só expressão e localiza a data e o valor uma vez cada
+def classificar_linha(linha):
+    linha_limpa = linha.strip()
+    if not linha_limpa:
+        return None
+
+    low = normalize(linha_limpa)
+    marcadores = set(regex_marcadores.findall(low))
+    # As ocorrências do findall não se sobrepõem: "sim" e "motorista:" podem começar dentro de um
+    # marcador colado a eles (ex.: "entregasim", "resumotorista:") e por isso são conferidos à parte
+    if "sim" not in marcadores and "sim" in low:
+        marcadores.add("sim")
+    if "motorista:" not in marcadores and "motorista:" in low:
+        marcadores.add("motorista:")
+    if "remuneracoes diarias" in marcadores:
+        secao = "remuneracoes"
+    elif not marcadores.isdisjoint(MARCADORES_INICIO_ACRESCIMOS):
+        secao = "acrescimos"
+    else:
+        secao = None
+
+    if "sim" in marcadores:
+        status = "Sim"
+    elif "nao" in marcadores:
+        status = "Não"
+    else:
+        status = None
+
+    m_data = regex_data.search(linha)
+    m_valor = regex_valor.search(linha)
+    return LinhaClassificada(
+        motorista="motorista:" in marcadores,
+        secao=secao,
+        fim_remuneracoes="coletas/entregas" in marcadores,
+        fim_acrescimos=not marcadores.isdisjoint(MARCADORES_FIM_ACRESCIMOS),
+        status=status,
+        data=m_data.group() if m_data else None,
+        valor=m_valor.group(1) if m_valor else None,
+        bonus="30,00" in linha,
+    )
+
+# Colunas aceitas na planilha de tipos de veículos, em ordem de preferência
+COLUNAS_NOME = ["nome do motorista", "motorista", "nome"]
+COLUNAS_DIARIA = ["diária combinada", "diaria combinada", "diaria"]
+# Quantidade de linhas citadas como exemplo em cada aviso da planilha
+EXEMPLOS_AVISO = 5
+
+# Erro de conteúdo da planilha de tipos de veículos (colunas ausentes, nenhum motorista válido)
+class PlanilhaVeiculosInvalida(ValueError):
+    pass
+
+# Registra um único aviso para todas as linhas com o mesmo problema, citando algumas como exemplo
+def _avisar_linhas(mensagem, exemplos, origem):
+    if not exemplos:
+        return
+    amostra = ", ".join(exemplos[:EXEMPLOS_AVISO])
+    if len(exemplos) > EXEMPLOS_AVISO:
+        amostra += ", ..."
+    logging.warning(f"Aviso: {mensagem} em {len(exemplos)} linha(s) da planilha {origem}: {amostra}")
+
+# Monta diarios_info ({nome: {"diaria", "tipo"}}) a partir da planilha de tipos de veículos
+# As colunas são resolvidas uma única vez e validadas com operações vetorizadas do pandas
+def montar_diarios_info(df_veiculos, origem):
+    import pandas as pd
 
-# Leitura da planilha de tipos de veículos
-try:
-    df_veiculos = pd.read_excel(PLANILHA_TIPO)
     df_veiculos.columns = df_veiculos.columns.str.strip().str.lower()
 
     # Validação: Verificar se as colunas essenciais existem
-    required_cols_name = ["nome do motorista", "motorista", "nome"]
-    required_cols_diaria = ["diária combinada", "diaria combinada", "diaria"]
-    
-    found_name_col = any(col in df_veiculos.columns for col in required_cols_name)
-    found_diaria_col = any(col in df_veiculos.columns for col in required_cols_diaria)
-
-    if not found_name_col:
-        logging.error(f"Erro: Nenhuma das colunas de nome de motorista ({required_cols_name}) encontrada na planilha {PLANILHA_TIPO}.")
-        exit(1)
-    if not found_diaria_col:
-        logging.error(f"Erro: Nenhuma das colunas de diária combinada ({required_cols_diaria}) encontrada na planilha {PLANILHA_TIPO}.")
-        exit(1)
+    coluna_nome = next((col for col in COLUNAS_NOME if col in df_veiculos.columns), None)
+    coluna_diaria = next((col for col in COLUNAS_DIARIA if col in df_veiculos.columns), None)
+    if not coluna_nome:
+        raise PlanilhaVeiculosInvalida(f"Erro: Nenhuma das colunas de nome de motorista ({COLUNAS_NOME}) encontrada na planilha {origem}.")
+    if not coluna_diaria:
+        raise PlanilhaVeiculosInvalida(f"Erro: Nenhuma das colunas de diária combinada ({COLUNAS_DIARIA}) encontrada na planilha {origem}.")
 
     tipo_colunas = [col for col in df_veiculos.columns if "tipo" in col]
     coluna_tipo = tipo_colunas[0] if tipo_colunas else None
     if not coluna_tipo:
-        logging.warning(f"Aviso: Nenhuma coluna contendo \"tipo\" foi encontrada na planilha {PLANILHA_TIPO}. O tipo de veículo não será registrado.")
-
-    diarios_info = {}
-    for idx, linha in df_veiculos.iterrows():
-        nome = None
-        for col_n in required_cols_name:
-            if col_n in df_veiculos.columns:
-                nome = linha.get(col_n)
-                break
-        
-        if pd.isna(nome) or str(nome).strip() == "":
-            logging.warning(f"Aviso: Nome de motorista inválido ou vazio na linha {idx + 2} da planilha {PLANILHA_TIPO}. Pulando esta linha.")
-            continue
-        nome_str = str(nome).strip().upper()
-        
-        diaria_valor = 0
-        for col_d in required_cols_diaria:
-            if col_d in df_veiculos.columns:
-                diaria_valor = linha.get(col_d, 0) or 0
-                break
-        
-        if not isinstance(diaria_valor, (int, float)) or diaria_valor < 0:
-            logging.warning(f"Aviso: Valor de diária inválido ({diaria_valor}) para o motorista {nome_str} na linha {idx + 2} da planilha {PLANILHA_TIPO}. Usando 0.")
-            diaria_valor = 0
+        logging.warning(f"Aviso: Nenhuma coluna contendo \"tipo\" foi encontrada na planilha {origem}. O tipo de veículo não será registrado.")
 
-        tipo_valor = linha.get(coluna_tipo) if coluna_tipo else None
-        if pd.isna(tipo_valor) or str(tipo_valor).strip() == "":
-            logging.warning(f"Aviso: Tipo de veículo inválido ou vazio para o motorista {nome_str} na linha {idx + 2} da planilha {PLANILHA_TIPO}. Usando \"N/A\".")
-            tipo_valor = "N/A"
+    # Número da linha no Excel (cabeçalho na linha 1)
+    linhas_excel = (df_veiculos.index + 2).astype(str)
 
-        diarios_info[nome_str] = {"diaria": diaria_valor, "tipo": tipo_valor}
+    # Nomes vazios: a linha é ignorada
+    nomes = df_veiculos[coluna_nome]
+    nomes_texto = nomes.astype(str).str.strip()
+    nomes_validos = nomes.notna() & (nomes_texto != "")
+    _avisar_linhas("Nome de motorista inválido ou vazio (linhas ignoradas)", linhas_excel[~nomes_validos].tolist(), origem)
 
+    df_validos = df_veiculos[nomes_validos]
+    linhas_excel = linhas_excel[nomes_validos]
+    nomes_texto = nomes_texto[nomes_validos].str.upper()
+
+    # Diária: só números não negativos; textos (mesmo "120") e negativos viram 0 e células vazias contam como 0
+    diarias = df_validos[coluna_diaria]
+    if pd.api.types.is_numeric_dtype(diarias):
+        diarias_numericas = pd.to_numeric(diarias)
+    else:
+        textos = diarias.map(lambda valor: isinstance(valor, str))
+        diarias_numericas = pd.to_numeric(diarias.mask(textos), errors="coerce")
+    diarias_invalidas = (diarias.notna() & diarias_numericas.isna()) | (diarias_numericas < 0)
+    exemplos = [f"{linha} ({nome}: {valor})" for linha, nome, valor in zip(linhas_excel[diarias_invalidas], nomes_texto[diarias_invalidas], diarias[diarias_invalidas])]
+    _avisar_linhas("Valor de diária inválido (usando 0)", exemplos, origem)
+    zerar = diarias_invalidas | diarias_numericas.isna()
+    if zerar.any():
+        diarias_numericas = diarias_numericas.mask(zerar, 0)
+
+    # Tipo de veículo vazio ou ausente: "N/A"
+    if coluna_tipo:
+        tipos = df_validos[coluna_tipo]
+        tipos_invalidos = tipos.isna() | (tipos.astype(str).str.strip() == "")
+    else:
+        tipos = pd.Series("N/A", index=df_validos.index, dtype=object)
+        tipos_invalidos = pd.Series(True, index=df_validos.index)
+    exemplos = [f"{linha} ({nome})" for linha, nome in zip(linhas_excel[tipos_invalidos], nomes_texto[tipos_invalidos])]
+    _avisar_linhas("Tipo de veículo inválido ou vazio (usando \"N/A\")", exemplos, origem)
+    if tipos_invalidos.any():
+        tipos = tipos.astype(object).mask(tipos_invalidos, "N/A")
+
+    # Nomes repetidos: prevalece a última linha, como na leitura linha a linha
+    diarios_info = {
+        nome: {"diaria": diaria, "tipo": tipo}
+        for nome, diaria, tipo in zip(nomes_texto.tolist(), diarias_numericas.tolist(), tipos.tolist())
+    }
     if not diarios_info:
-        logging.error("Nenhum motorista válido encontrado na planilha de veículos. Verifique os nomes e colunas.")
-        exit(1)
-except FileNotFoundError:
-    logging.error(f"Erro: A planilha de tipos de veículos {PLANILHA_TIPO} não foi encontrada.")
-    exit(1)
-except Exception as e:
-    logging.error(f"Erro ao ler a planilha de tipos de veículos: {e}")
-    exit(1)
+        raise PlanilhaVeiculosInvalida("Nenhum motorista válido encontrado na planilha de veículos. Verifique os nomes e colunas.")
+    return diarios_info
+
+# Leitura da planilha de tipos de veículos
+def carregar_planilha_veiculos(caminho):
+    import pandas as pd
+
+    return montar_diarios_info(pd.read_excel(caminho), caminho)
+
+# Motoristas da planilha carregada por configurar(): {nome: {"diaria", "tipo"}}
+diarios_info = {}
+
+# Índice dos nomes da planilha para a busca aproximada
+# Normaliza os nomes uma única vez e monta um índice invertido de trigramas. Cada busca tenta
+# primeiro o nome exato e depois compara com o difflib começando pelos nomes que mais
+# compartilham trigramas com o procurado; os resultados ficam memorizados por nome
+class IndiceNomes:
+    def __init__(self, nomes, cutoff=0.5):
+        self.origem = nomes
+        self.tamanho = len(nomes)
+        self.cutoff = cutoff
+        self.nomes_normalizados = {normalize(nome): nome for nome in nomes}
+        self.lista_normalizados = list(self.nomes_normalizados)
+        self.indice_trigramas = defaultdict(list)
+        for posicao, nome in enumerate(self.lista_normalizados):
+            for trigrama in self._trigramas(nome):
+                self.indice_trigramas[trigrama].append(posicao)
+        self.resultados = {}
+
+    @staticmethod
+    def _trigramas(texto):
+        texto = f"  {texto} "
+        return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+    def buscar(self, nome_pdf):
+        if nome_pdf in self.resultados:
+            return self.resultados[nome_pdf]
+
+        nome_pdf_normalizado = normalize(nome_pdf)
+        nome = self.nomes_normalizados.get(nome_pdf_normalizado)
+        if nome is None:
+            nome = self._buscar_aproximado(nome_pdf_normalizado)
+        self.resultados[nome_pdf] = nome
+        return nome
+
+    def _buscar_aproximado(self, nome_pdf_normalizado):
+        # Ordena os nomes pelos trigramas em comum com o procurado; os que não compartilham nenhum vêm por último
+        contagem = Counter()
+        for trigrama in self._trigramas(nome_pdf_normalizado):
+            contagem.update(self.indice_trigramas.get(trigrama, ()))
+        ordem = [posicao for posicao, _ in contagem.most_common()]
+        if len(ordem) < len(self.lista_normalizados):
+            ordem.extend(posicao for posicao in range(len(self.lista_normalizados)) if posicao not in contagem)
+
+        # Mesmo critério do difflib.get_close_matches(n=1): maior (ratio, nome) com ratio >= cutoff.
+        # Como os nomes mais parecidos vêm primeiro, o limite sobe logo para o melhor ratio encontrado
+        # e os demais são descartados pelas estimativas rápidas (real_quick_ratio/quick_ratio)
+        comparador = difflib.SequenceMatcher()
+        comparador.set_seq2(nome_pdf_normalizado)
+        melhor = None
+        limite = self.cutoff
+        for posicao in ordem:
+            nome = self.lista_normalizados[posicao]
+            comparador.set_seq1(nome)
+            if comparador.real_quick_ratio() >= limite and comparador.quick_ratio() >= limite:
+                ratio = comparador.ratio()
+                if ratio >= limite and (melhor is None or (ratio, nome) > melhor):
+                    melhor = (ratio, nome)
+                    limite = ratio
+
+        if melhor:
+            return self.nomes_normalizados[melhor[1]]
+        else:
+            return None
+
+# Índice montado a partir da planilha carregada
+indice_nomes = None
 
 # Busca nome aproximado
 def encontrar_nome_aproximado(nome_pdf):
-    # Normaliza o nome do PDF para comparação
-    nome_pdf_normalizado = normalize(nome_pdf)
-    
-    # Normaliza os nomes dos motoristas na planilha para comparação
-    nomes_planilha_normalizados = {normalize(nome): nome for nome in diarios_info.keys()}
-    
-    # Ajuste o cutoff para um valor mais flexível, por exemplo, 0.6 ou 0.5
-    matches = difflib.get_close_matches(nome_pdf_normalizado, list(nomes_planilha_normalizados.keys()), n=1, cutoff=0.5) 
-    
-    if matches:
-        return nomes_planilha_normalizados[matches[0]]
-    else:
-        return None
+    global indice_nomes
+    # Remonta o índice se a planilha de motoristas foi trocada ou alterada
+    if indice_nomes is None or indice_nomes.origem is not diarios_info or indice_nomes.tamanho != len(diarios_info):
+        indice_nomes = IndiceNomes(diarios_info)
+    return indice_nomes.buscar(nome_pdf)
 
-# Extrai dados do PDF com foco na correção dos acréscimos
-def extrair_dados_pdf(caminho_pdf):
-    entregas_por_dia = defaultdict(lambda: {"entregues": 0, "insucessos": 0})
-    acres_por_data = defaultdict(float)
-    bonus_pago_dates = set()
-    nome_motorista = None
+# Estado da leitura de um PDF, alimentado página a página
+# Acumula entregas, acréscimos e bônus e mantém as seções (Remunerações Diárias / Acréscimos)
+# abertas de uma página para a outra, sem guardar o texto completo do documento
+class EstadoExtracao:
+    def __init__(self):
+        self.nome_motorista = None
+        self.entregas_por_dia = defaultdict(lambda: {"entregues": 0, "insucessos": 0})
+        self.acres_por_data = defaultdict(float)
+        self.bonus_pago_dates = set()
+        self.remuneracoes_section = False
+        self.acrescimos_section = False
+        self.tabelas_processadas = 0
+        # Chaves data_valor dos acréscimos das tabelas, para evitar duplicatas, e os acréscimos
+        # somados, na ordem em que apareceram (usados para juntar trechos de um PDF)
+        self.acrescimos_tabela_encontrados = set()
+        self.acrescimos_tabela = []
+        # Acréscimos encontrados no texto: só são somados em finalizar(), depois que as tabelas
+        # de todas as páginas foram vistas, como quando o documento inteiro era lido de uma vez
+        self.acrescimos_texto_pendentes = []
+        # O texto de uma página continua na seguinte: a última linha só é processada
+        # quando a próxima página (ou o fim do documento) chega
+        self.linha_incompleta = ""
 
-    logging.info(f"Processando PDF: {os.path.basename(caminho_pdf)}")
+    # tabelas=None marca uma página repetida (já contada em outro PDF do motorista): ela só avança o
+    # estado (nome, seções), sem somar nada, e começa e termina sem continuar linhas das páginas vizinhas
+    def processar_pagina(self, texto, tabelas):
+        if tabelas is None:
+            self._processar_pagina_repetida(texto)
+            return
+        for table in tabelas:
+            self.processar_tabela(table)
+
+        linhas = texto.split("\n")
+        linhas[0] = self.linha_incompleta + linhas[0]
+        self.linha_incompleta = linhas.pop()
+        for linha in linhas:
+            self.processar_linha(linha)
+
+    def _processar_pagina_repetida(self, texto):
+        if self.linha_incompleta:
+            self.processar_linha(self.linha_incompleta)
+            self.linha_incompleta = ""
+        somas = self.entregas_por_dia, self.bonus_pago_dates, self.acrescimos_texto_pendentes
+        self.entregas_por_dia = defaultdict(lambda: {"entregues": 0, "insucessos": 0})
+        self.bonus_pago_dates = set()
+        self.acrescimos_texto_pendentes = []
+        try:
+            for linha in texto.split("\n"):
+                self.processar_linha(linha)
+        finally:
+            self.entregas_por_dia, self.bonus_pago_dates, self.acrescimos_texto_pendentes = somas
+
+    # Processamento das tabelas para acréscimos
+    # Cada tabela é processada individualmente e verificamos se contém acréscimos
+    def processar_tabela(self, table):
+        self.tabelas_processadas += 1
+        logging.debug("  Processando tabela %d", self.tabelas_processadas)
+
+        if not table or len(table) == 0:
+            return
+
+        # Verifica se a tabela contém colunas relacionadas a acréscimos
+        header_row = table[0] if table else []
+        header_text = " ".join([str(cell) for cell in header_row if cell]).lower()
+
+        # Identifica se é uma tabela de acréscimos baseada no cabeçalho
+        is_acrescimo_table = any(keyword in header_text for keyword in
+            ['acrescimo', 'acréscimo', 'valor', 'remuneracao', 'remuneração'])
+
+        for row_idx, row in enumerate(table):
+            if not row:
+                continue
+
+            row_text = " ".join([str(cell) for cell in row if cell])
+            data_match = regex_data.search(row_text)
+            valor_match = regex_valor.search(row_text)
+
+            if data_match and valor_match:
+                try:
+                    data = datetime.strptime(data_match.group(), "%d/%m/%Y").date()
+                    valor_str = valor_match.group(1).replace(".", "").replace(",", ".")
+                    valor_float = float(valor_str)
+
+                    # Cria uma chave única para evitar duplicatas entre tabelas
+                    chave_acrescimo = f"{data}_{valor_float}"
+
+                    if chave_acrescimo not in self.acrescimos_tabela_encontrados:
+                        self.acres_por_data[data] += valor_float
+                        self.acrescimos_tabela_encontrados.add(chave_acrescimo)
+                        self.acrescimos_tabela.append((data, valor_float))
+                        logging.debug("    Acréscimo encontrado na tabela: Data %s, Valor R$ %s", data, valor_str)
+                    else:
+                        logging.debug("    Acréscimo duplicado ignorado: Data %s, Valor R$ %s", data, valor_str)
+
+                except ValueError as ve:
+                    logging.warning(f"    Valor ou data inválida na tabela: {row_text} - Erro: {ve}")
+                except Exception as e:
+                    logging.warning(f"    Erro ao processar linha da tabela: {e} na linha: {row_text}")
+
+    # Processamento do texto linha por linha
+    def processar_linha(self, linha):
+        classificacao = classificar_linha(linha)
+        if classificacao is None:
+            return
+
+        # Identifica nome do motorista
+        if classificacao.motorista and not self.nome_motorista:
+            parts = linha.split(":")
+            if len(parts) > 1:
+                self.nome_motorista = parts[-1].strip().upper()
+                logging.info(f"  Motorista identificado: {self.nome_motorista}")
+                return
+
+        # Detecta início de "Remunerações Diárias"
+        if classificacao.secao == "remuneracoes":
+            self.remuneracoes_section = True
+            self.acrescimos_section = False
+            return
+
+        # Detecta seções de acréscimos
+        if classificacao.secao == "acrescimos":
+            self.acrescimos_section = True
+            self.remuneracoes_section = False
+            return
+
+        # Se estiver na seção de remunerações, busca data + 30,00 (bônus)
+        if self.remuneracoes_section:
+            if classificacao.data and classificacao.bonus:
+                try:
+                    data = _converter_data(classificacao.data)
+                    self.bonus_pago_dates.add(data)
+                    logging.debug("    Bônus encontrado: Data %s", data)
+                except ValueError:
+                    logging.warning(f"    Data inválida encontrada no bônus: {linha}")
+                except Exception as e:
+                    logging.warning(f"    Erro ao processar bônus: {e} na linha: {linha}")
+
+            # Sai da seção se encontrar indicador de fim
+            if classificacao.fim_remuneracoes:
+                self.remuneracoes_section = False
+            return
+
+        # Processamento de acréscimos na seção específica
+        if self.acrescimos_section:
+            if classificacao.data and classificacao.valor:
+                try:
+                    data = _converter_data(classificacao.data)
+                    valor_str = classificacao.valor.replace(".", "").replace(",", ".")
+                    valor_float = float(valor_str)
+                    self.acrescimos_texto_pendentes.append((data, valor_float, valor_str, False))
+
+                except ValueError:
+                    logging.warning(f"    Valor ou data inválida no acréscimo: {linha}")
+                except Exception as e:
+                    logging.warning(f"    Erro ao processar acréscimo no texto: {e} na linha: {linha}")
+
+            # Sai da seção se encontrar indicador de fim
+            if classificacao.fim_acrescimos:
+                self.acrescimos_section = False
+            return
+
+        # Processamento geral de entregas/insucessos e acréscimos avulsos
+        if classificacao.data:
+            try:
+                data = _converter_data(classificacao.data)
+            except ValueError:
+                logging.warning(f"    Data inválida encontrada: {linha}")
+                return
+            except Exception as e:
+                logging.warning(f"    Erro ao processar data: {e} na linha: {linha}")
+                return
+
+            # Entregas/Insucessos: procura sim/nao
+            if classificacao.status:
+                if classificacao.status == "Sim":
+                    self.entregas_por_dia[data]["entregues"] += 1
+                else:
+                    self.entregas_por_dia[data]["insucessos"] += 1
+                logging.debug("    Entrega registrada: Data %s, Status %s", data, classificacao.status)
+
+            # Acréscimos avulsos (fora das seções específicas)
+            elif classificacao.valor:
+                try:
+                    valor_str = classificacao.valor.replace(".", "").replace(",", ".")
+                    valor_float = float(valor_str)
+
+                    # Filtra valores muito pequenos que podem ser ruído (ex: < R$ 1,00)
+                    if valor_float >= 1.0:
+                        self.acrescimos_texto_pendentes.append((data, valor_float, valor_str, True))
+
+                except ValueError:
+                    logging.warning(f"    Valor inválido no acréscimo avulso: {linha}")
+                except Exception as e:
+                    logging.warning(f"    Erro ao processar acréscimo avulso: {e} na linha: {linha}")
+
+    # Processa a última linha do documento e soma os acréscimos do texto que não vieram das tabelas
+    def finalizar(self):
+        self.processar_linha(self.linha_incompleta)
+        self.linha_incompleta = ""
+
+        # Conjunto para rastrear acréscimos já encontrados no texto (evita duplicatas com tabelas)
+        acrescimos_texto_encontrados = set()
+        for data, valor_float, valor_str, avulso in self.acrescimos_texto_pendentes:
+            # Cria chave única para evitar duplicatas
+            chave_acrescimo = f"{data}_{valor_float}"
+
+            # Verifica se não foi encontrado nas tabelas nem no texto anteriormente
+            if (chave_acrescimo not in self.acrescimos_tabela_encontrados and
+                chave_acrescimo not in acrescimos_texto_encontrados):
+                self.acres_por_data[data] += valor_float
+                acrescimos_texto_encontrados.add(chave_acrescimo)
+                if avulso:
+                    logging.debug("    Acréscimo avulso encontrado: Data %s, Valor R$ %s", data, valor_str)
+                else:
+                    logging.debug("    Acréscimo encontrado no texto: Data %s, Valor R$ %s", data, valor_str)
+            elif not avulso:
+                logging.debug("    Acréscimo duplicado ignorado no texto: Data %s, Valor R$ %s", data, valor_str)
+        self.acrescimos_texto_pendentes = []
+
+        return self.nome_motorista, self.entregas_por_dia, self.acres_por_data, self.bonus_pago_dates
+
+    # Dados e estado de saída de um trecho do PDF, em tipos serializáveis (ver extrair_trecho_pdf)
+    def parcial(self):
+        return {
+            "nome": self.nome_motorista if isinstance(self.nome_motorista, str) else None,
+            "entregas": {data: dict(info) for data, info in self.entregas_por_dia.items()},
+            "acrescimos_tabela": self.acrescimos_tabela,
+            "acrescimos_texto": self.acrescimos_texto_pendentes,
+            "bonus": self.bonus_pago_dates,
+            "remuneracoes_section": self.remuneracoes_section,
+            "acrescimos_section": self.acrescimos_section,
+            "linha_incompleta": self.linha_incompleta,
+            "tabelas": self.tabelas_processadas,
+        }
+
+    # Soma ao estado um trecho lido a partir do mesmo estado de seções em que este se encontra
+    # Os acréscimos das tabelas são somados de novo, na ordem original, para o resultado ser o mesmo
+    # da leitura sequencial (inclusive nos arredondamentos)
+    def incorporar(self, parcial):
+        if parcial["nome"] and not self.nome_motorista:
+            self.nome_motorista = parcial["nome"]
+        for data, info in parcial["entregas"].items():
+            self.entregas_por_dia[data]["entregues"] += info["entregues"]
+            self.entregas_por_dia[data]["insucessos"] += info["insucessos"]
+        for data, valor_float in parcial["acrescimos_tabela"]:
+            chave_acrescimo = f"{data}_{valor_float}"
+            if chave_acrescimo not in self.acrescimos_tabela_encontrados:
+                self.acres_por_data[data] += valor_float
+                self.acrescimos_tabela_encontrados.add(chave_acrescimo)
+                self.acrescimos_tabela.append((data, valor_float))
+        self.acrescimos_texto_pendentes.extend(parcial["acrescimos_texto"])
+        self.bonus_pago_dates.update(parcial["bonus"])
+        self.tabelas_processadas += parcial["tabelas"]
+        self.remuneracoes_section = parcial["remuneracoes_section"]
+        self.acrescimos_section = parcial["acrescimos_section"]
+        self.linha_incompleta = parcial["linha_incompleta"]
+
+# Classificação barata, a partir do texto já extraído, das páginas que podem ter tabela de acréscimos
+# Páginas com as seções de remunerações/acréscimos sempre passam pela detecção de tabelas. Nas demais,
+# uma linha de tabela só gera acréscimo se tiver valor em R$; nas listagens de entregas todas as linhas
+# com R$ têm o status Sim/Não e são contadas pelo texto, então a detecção de tabelas é dispensada.
+# A regra não depende da ordem das linhas, então vale para o texto de qualquer backend
+def _pagina_pode_ter_acrescimos(texto):
+    low = normalize(texto)
+    if any(keyword in low for keyword in ['acrescimo', 'remuneracoes diarias', 'remuneracao adicional', 'valores adicionais']):
+        return True
+    for linha in low.split("\n"):
+        if "r$" in linha and not ("sim" in linha or "nao" in linha):
+            return True
+    return False
+
+# PDFs dentro de pacotes: --pdfs_folder pode ser um .zip ou .tar (.tar.gz, .tgz...) e cada PDF do pacote é
+# identificado pelo caminho do pacote seguido do nome do membro ("semana.zip/joao.pdf"), como um arquivo
+# em uma pasta. Os membros são lidos direto do pacote para a memória, sem extrair nada no disco; cada
+# processo mantém o pacote aberto, com a lista de membros, enquanto ele não muda (um processo filho
+# criado com fork abre o seu, já que a posição de leitura do arquivo herdado é compartilhada)
+EXTENSOES_PACOTE = (".zip", ".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tar.xz", ".txz")
+_pacote_aberto = {}
+_ultimo_membro = {}
+
+def eh_pacote(caminho):
+    return caminho.lower().endswith(EXTENSOES_PACOTE) and os.path.isfile(caminho)
+
+# (pacote, membro) de um PDF que está dentro de um pacote, ou None para um arquivo comum
+def separar_membro(caminho_pdf):
+    pacote = os.path.dirname(caminho_pdf)
+    while pacote and not os.path.isdir(pacote):
+        if eh_pacote(pacote):
+            return pacote, os.path.relpath(caminho_pdf, pacote).replace(os.sep, "/")
+        if os.path.dirname(pacote) == pacote:
+            break
+        pacote = os.path.dirname(pacote)
+    return None
+
+# Pacote aberto e os seus membros PDF ({nome do membro: ZipInfo ou TarInfo}, na ordem do pacote)
+# Erros de leitura do pacote viram OSError, como os de um arquivo comum
+def _abrir_pacote(pacote):
+    import tarfile
+    import zipfile
+
+    info = os.stat(pacote)
+    chave = (os.path.abspath(pacote), info.st_size, info.st_mtime_ns, os.getpid())
+    if chave not in _pacote_aberto:
+        for (*_, pid), (arquivo, _) in _pacote_aberto.items():
+            if pid == os.getpid():
+                arquivo.close()
+        _pacote_aberto.clear()
+        _ultimo_membro.clear()
+        try:
+            if pacote.lower().endswith(".zip"):
+                arquivo = zipfile.ZipFile(pacote)
+                membros = {membro.filename: membro for membro in arquivo.infolist() if not membro.is_dir()}
+            else:
+                arquivo = tarfile.open(pacote)
+                membros = {membro.name: membro for membro in arquivo.getmembers() if membro.isfile()}
+        except (zipfile.BadZipFile, tarfile.TarError, EOFError) as e:
+            raise OSError(f"Pacote {pacote} ilegível: {e}") from e
+        membros = {nome: membro for nome, membro in membros.items() if nome.lower().endswith(".pdf")}
+        _pacote_aberto[chave] = (arquivo, membros)
+    return _pacote_aberto[chave]
+
+# Conteúdo (bytes) de um membro do pacote; o último membro lido fica guardado, já que o pdfium e o
+# pdfplumber leem o mesmo PDF em seguida
+def ler_membro(pacote, membro):
+    import tarfile
+    import zipfile
+
+    arquivo, membros = _abrir_pacote(pacote)
+    if membro not in membros:
+        raise FileNotFoundError(f"{membro} não encontrado no pacote {pacote}")
+    if membro not in _ultimo_membro:
+        try:
+            if isinstance(arquivo, zipfile.ZipFile):
+                conteudo = arquivo.read(membros[membro])
+            else:
+                with arquivo.extractfile(membros[membro]) as f:
+                    conteudo = f.read()
+        except (zipfile.BadZipFile, tarfile.TarError, EOFError) as e:
+            raise OSError(f"Não foi possível ler {membro} do pacote {pacote}: {e}") from e
+        _ultimo_membro.clear()
+        _ultimo_membro[membro] = conteudo
+    return _ultimo_membro[membro]
+
+# PDFs da pasta ou do pacote: lista de (nome do arquivo, caminho), na ordem da listagem
+def listar_pdfs(pasta):
+    if eh_pacote(pasta):
+        return [(membro.rsplit("/", 1)[-1], os.path.join(pasta, membro)) for membro in _abrir_pacote(pasta)[1]]
+    return [(nome_arquivo, os.path.join(pasta, nome_arquivo)) for nome_arquivo in os.listdir(pasta)
+            if nome_arquivo.lower().endswith(".pdf")]
+
+# (tamanho, mtime_ns) do PDF; um membro de pacote tem o seu tamanho e a data de modificação do pacote
+def assinatura_pdf(caminho_pdf):
+    membro = separar_membro(caminho_pdf)
+    if membro is None:
+        info = os.stat(caminho_pdf)
+        return info.st_size, info.st_mtime_ns
+    pacote, nome = membro
+    membros = _abrir_pacote(pacote)[1]
+    if nome not in membros:
+        raise FileNotFoundError(f"{nome} não encontrado no pacote {pacote}")
+    tamanho = getattr(membros[nome], "file_size", None)
+    return membros[nome].size if tamanho is None else tamanho, os.stat(pacote).st_mtime_ns
+
+# O que o pdfium e o pdfplumber recebem para abrir o PDF: o caminho ou, para um membro de pacote, os bytes
+def fonte_pdf(caminho_pdf):
+    membro = separar_membro(caminho_pdf)
+    return caminho_pdf if membro is None else ler_membro(*membro)
+
+def _abrir_pdfplumber(caminho_pdf):
+    import io
+    import pdfplumber
+
+    fonte = fonte_pdf(caminho_pdf)
+    return pdfplumber.open(io.BytesIO(fonte) if isinstance(fonte, bytes) else fonte)
+
+def _abrir_pdfium(caminho_pdf):
+    import pypdfium2 as pdfium
+
+    return pdfium.PdfDocument(fonte_pdf(caminho_pdf))
+
+# Texto de uma página de um documento do pdfium, com quebras de linha "\n"
+def _texto_pagina_pdfium(documento, indice):
+    pagina = documento[indice]
     try:
-        with pdfplumber.open(caminho_pdf) as pdf:
-            full_text = ""
-            all_tables = []
-            for pagina in pdf.pages:
-                full_text += pagina.extract_text() or ""
-                all_tables.extend(pagina.extract_tables())
-
-            # Processamento melhorado das tabelas para acréscimos
-            # Agora processamos cada tabela individualmente e verificamos se contém acréscimos
-            acrescimos_tabela_encontrados = set()  # Para evitar duplicatas
-            
-            for table_idx, table in enumerate(all_tables):
-                logging.info(f"  Processando tabela {table_idx + 1} de {len(all_tables)}")
-                
-                if not table or len(table) == 0:
-                    continue
-                    
-                # Verifica se a tabela contém colunas relacionadas a acréscimos
-                header_row = table[0] if table else []
-                header_text = " ".join([str(cell) for cell in header_row if cell]).lower()
-                
-                # Identifica se é uma tabela de acréscimos baseada no cabeçalho
-                is_acrescimo_table = any(keyword in header_text for keyword in 
-                    ['acrescimo', 'acréscimo', 'valor', 'remuneracao', 'remuneração'])
-                
-                for row_idx, row in enumerate(table):
-                    if not row:
-                        continue
-                        
-                    row_text = " ".join([str(cell) for cell in row if cell])
-                    data_match = regex_data.search(row_text)
-                    valor_match = regex_valor.search(row_text)
-                    
-                    if data_match and valor_match:
-                        try:
-                            data = datetime.strptime(data_match.group(), "%d/%m/%Y").date()
-                            valor_str = valor_match.group(1).replace(".", "").replace(",", ".")
-                            valor_float = float(valor_str)
-                            
-                            # Cria uma chave única para evitar duplicatas entre tabelas
-                            chave_acrescimo = f"{data}_{valor_float}"
-                            
-                            if chave_acrescimo not in acrescimos_tabela_encontrados:
-                                acres_por_data[data] += valor_float
-                                acrescimos_tabela_encontrados.add(chave_acrescimo)
-                                logging.info(f"    Acréscimo encontrado na tabela: Data {data}, Valor R$ {valor_str}")
-                            else:
-                                logging.info(f"    Acréscimo duplicado ignorado: Data {data}, Valor R$ {valor_str}")
-                                
-                        except ValueError as ve:
-                            logging.warning(f"    Valor ou data inválida na tabela: {row_text} - Erro: {ve}")
-                        except Exception as e:
-                            logging.warning(f"    Erro ao processar linha da tabela: {e} na linha: {row_text}")
-
-            # Processamento do texto linha por linha melhorado
-            linhas_texto = full_text.split("\n")
-            remuneracoes_section = False
-            acrescimos_section = False
-            
-            # Conjunto para rastrear acréscimos já encontrados no texto (evita duplicatas com tabelas)
-            acrescimos_texto_encontrados = set()
-
-            for i, linha in enumerate(linhas_texto):
-                linha_limpa = linha.strip()
-                if not linha_limpa:
-                    continue
-                    
-                low = normalize(linha_limpa)
-                
-                # Identifica nome do motorista
-                if not nome_motorista and "motorista:" in low:
-                    parts = linha.split(":")
-                    if len(parts) > 1:
-                        nome_motorista = parts[-1].strip().upper()
-                        logging.info(f"  Motorista identificado: {nome_motorista}")
+        pagina_texto = pagina.get_textpage()
+        try:
+            texto = pagina_texto.get_text_range()
+        finally:
+            pagina_texto.close()
+    finally:
+        pagina.close()
+    return texto.replace("\r\n", "\n").replace("\r", "\n")
+
+# Percorre as páginas do PDF uma a uma com o pdfplumber, devolvendo o texto e as tabelas de cada página
+# O cache da página (caracteres, objetos de layout) é liberado assim que ela é consumida
+# As páginas repetidas (índices em "repetidas") têm o texto lido pelo pdfium, bem mais rápido, e vêm
+# com tabelas=None
+def _iterar_paginas_pdfplumber(caminho_pdf, forcar_tabelas=False, tempos=None, inicio=0, fim=None, repetidas=frozenset()):
+    tempos = tempos or TemposEtapas()
+    with tempos.medir("abrir"):
+        arquivo_pdf = _abrir_pdfplumber(caminho_pdf)
+    documento_repetidas = None
+    try:
+        with arquivo_pdf as pdf:
+            with tempos.medir("abrir"):
+                paginas = pdf.pages
+                if inicio or fim is not None:
+                    paginas = paginas[inicio:fim]
+            for indice, pagina in enumerate(paginas, start=inicio):
+                try:
+                    if indice in repetidas:
+                        with tempos.medir("texto"):
+                            if documento_repetidas is None:
+                                documento_repetidas = _abrir_pdfium(caminho_pdf)
+                            texto = _texto_pagina_pdfium(documento_repetidas, indice)
+                        estatisticas_extracao["paginas"] += 1
+                        estatisticas_extracao["paginas_repetidas"] += 1
+                        yield texto, None
                         continue
-                
-                # Detecta seções de forma mais robusta
-                # Detecta início de "Remunerações Diárias"
-                if "remuneracoes diarias" in low or "remunerações diárias" in low:
-                    remuneracoes_section = True
-                    acrescimos_section = False
-                    continue
-                
-                # Detecta seções de acréscimos
-                if any(keyword in low for keyword in ['acrescimo', 'acréscimo', 'remuneracao adicional', 'valores adicionais']):
-                    acrescimos_section = True
-                    remuneracoes_section = False
-                    continue
+                    with tempos.medir("texto"):
+                        texto = pagina.extract_text() or ""
+                    estatisticas_extracao["paginas"] += 1
+                    if forcar_tabelas or _pagina_pode_ter_acrescimos(texto):
+                        with tempos.medir("tabelas"):
+                            tabelas = pagina.extract_tables()
+                    else:
+                        tabelas = []
+                        estatisticas_extracao["paginas_sem_tabelas"] += 1
+                    yield texto, tabelas
+                finally:
+                    pagina.close()
+    finally:
+        if documento_repetidas is not None:
+            documento_repetidas.close()
 
-                # Se estiver na seção de remunerações, busca data + 30,00 (bônus)
-                if remuneracoes_section:
-                    if regex_data.search(linha) and "30,00" in linha:
-                        m_data = regex_data.search(linha)
-                        try:
-                            data = datetime.strptime(m_data.group(), "%d/%m/%Y").date()
-                            bonus_pago_dates.add(data)
-                            logging.info(f"    Bônus encontrado: Data {data}")
-                        except ValueError:
-                            logging.warning(f"    Data inválida encontrada no bônus: {linha}")
-                        except Exception as e:
-                            logging.warning(f"    Erro ao processar bônus: {e} na linha: {linha}")
-                    
-                    # Sai da seção se encontrar linha vazia ou indicador de fim
-                    if low.strip() == "" or "coletas/entregas" in low:
-                        remuneracoes_section = False
-                    continue
-                
-                # Processamento de acréscimos na seção específica
-                if acrescimos_section:
-                    if regex_data.search(linha) and regex_valor.search(linha):
-                        m_data = regex_data.search(linha)
-                        m_val = regex_valor.search(linha)
-                        
-                        try:
-                            data = datetime.strptime(m_data.group(), "%d/%m/%Y").date()
-                            valor_str = m_val.group(1).replace(".", "").replace(",", ".")
-                            valor_float = float(valor_str)
-                            
-                            # Cria chave única para evitar duplicatas
-                            chave_acrescimo = f"{data}_{valor_float}"
-                            
-                            # Verifica se não foi encontrado nas tabelas nem no texto anteriormente
-                            if (chave_acrescimo not in acrescimos_tabela_encontrados and 
-                                chave_acrescimo not in acrescimos_texto_encontrados):
-                                acres_por_data[data] += valor_float
-                                acrescimos_texto_encontrados.add(chave_acrescimo)
-                                logging.info(f"    Acréscimo encontrado no texto: Data {data}, Valor R$ {valor_str}")
-                            else:
-                                logging.info(f"    Acréscimo duplicado ignorado no texto: Data {data}, Valor R$ {valor_str}")
-                                
-                        except ValueError:
-                            logging.warning(f"    Valor ou data inválida no acréscimo: {linha}")
-                        except Exception as e:
-                            logging.warning(f"    Erro ao processar acréscimo no texto: {e} na linha: {linha}")
-                    
-                    # Sai da seção se encontrar indicador de fim
-                    if any(fim in low for fim in ['total', 'resumo', 'coletas/entregas', 'entregas']):
-                        acrescimos_section = False
-                    continue
-                
-                # Processamento geral de entregas/insucessos e acréscimos avulsos
-                if regex_data.search(linha):
-                    m_data = regex_data.search(linha)
+# Percorre as páginas com o pdfium, cuja extração de texto é muito mais rápida que a do pdfminer
+# O pdfium não detecta tabelas: com_tabelas=True abre o PDF também no pdfplumber, sob demanda,
+# só para extrair as tabelas das páginas que podem ter acréscimos (backend "auto")
+def _iterar_paginas_pdfium(caminho_pdf, forcar_tabelas=False, com_tabelas=True, tempos=None, inicio=0, fim=None, repetidas=frozenset()):
+    tempos = tempos or TemposEtapas()
+    with tempos.medir("abrir"):
+        documento = _abrir_pdfium(caminho_pdf)
+    pdf_tabelas = None
+    try:
+        for indice in range(inicio, len(documento) if fim is None else min(fim, len(documento))):
+            with tempos.medir("texto"):
+                texto = _texto_pagina_pdfium(documento, indice)
+            estatisticas_extracao["paginas"] += 1
+
+            if indice in repetidas:
+                estatisticas_extracao["paginas_repetidas"] += 1
+                yield texto, None
+                continue
+            if com_tabelas and (forcar_tabelas or _pagina_pode_ter_acrescimos(texto)):
+                if pdf_tabelas is None:
+                    with tempos.medir("abrir"):
+                        pdf_tabelas = _abrir_pdfplumber(caminho_pdf)
+                with tempos.medir("tabelas"):
+                    pagina_tabelas = pdf_tabelas.pages[indice]
                     try:
-                        data = datetime.strptime(m_data.group(), "%d/%m/%Y").date()
-                    except ValueError:
-                        logging.warning(f"    Data inválida encontrada: {linha}")
-                        continue
-                    except Exception as e:
-                        logging.warning(f"    Erro ao processar data: {e} na linha: {linha}")
-                        continue
-                    
-                    # Entregas/Insucessos: procura sim/nao
-                    if "sim" in low or "nao" in low:
-                        status = "Sim" if "sim" in low else "Não"
-                        if status == "Sim":
-                            entregas_por_dia[data]["entregues"] += 1
-                        else:
-                            entregas_por_dia[data]["insucessos"] += 1
-                        logging.info(f"    Entrega registrada: Data {data}, Status {status}")
-                    
-                    # Acréscimos avulsos (fora das seções específicas)
-                    elif regex_valor.search(linha) and not ("sim" in low or "nao" in low):
-                        # Verifica se não está em uma seção específica
-                        if not remuneracoes_section and not acrescimos_section:
-                            m_val = regex_valor.search(linha)
-                            if m_val:
-                                try:
-                                    valor_str = m_val.group(1).replace(".", "").replace(",", ".")
-                                    valor_float = float(valor_str)
-                                    
-                                    # Filtra valores muito pequenos que podem ser ruído (ex: < R$ 1,00)
-                                    if valor_float >= 1.0:
-                                        chave_acrescimo = f"{data}_{valor_float}"
-                                        
-                                        if (chave_acrescimo not in acrescimos_tabela_encontrados and 
-                                            chave_acrescimo not in acrescimos_texto_encontrados):
-                                            acres_por_data[data] += valor_float
-                                            acrescimos_texto_encontrados.add(chave_acrescimo)
-                                            logging.info(f"    Acréscimo avulso encontrado: Data {data}, Valor R$ {valor_str}")
-                                        
-                                except ValueError:
-                                    logging.warning(f"    Valor inválido no acréscimo avulso: {linha}")
-                                except Exception as e:
-                                    logging.warning(f"    Erro ao processar acréscimo avulso: {e} na linha: {linha}")
-
-            # Log do resumo de acréscimos encontrados
-            total_acrescimos = sum(acres_por_data.values())
-            qtd_dias_acrescimos = len(acres_por_data)
-            logging.info(f"  RESUMO - Acréscimos encontrados: {qtd_dias_acrescimos} dias, Total: R$ {total_acrescimos:.2f}")
-            
-            if qtd_dias_acrescimos > 0:
-                for data, valor in sorted(acres_por_data.items()):
-                    logging.info(f"    {data.strftime('%d/%m/%Y')}: R$ {valor:.2f}")
-            
-    except pdfplumber.PDFSyntaxError:
+                        tabelas = pagina_tabelas.extract_tables()
+                    finally:
+                        pagina_tabelas.close()
+            else:
+                tabelas = []
+                estatisticas_extracao["paginas_sem_tabelas"] += 1
+            yield texto, tabelas
+    finally:
+        if pdf_tabelas is not None:
+            pdf_tabelas.close()
+        documento.close()
+
+# Escolhe o leitor de páginas conforme o backend ("pdfplumber", "pdfium" ou "auto")
+# inicio/fim limitam a leitura às páginas inicio..fim-1 (trechos de um PDF); as páginas em "repetidas"
+# (índices a partir de 0) vêm sem detecção de tabelas, com tabelas=None
+def _iterar_paginas(caminho_pdf, forcar_tabelas=False, backend="pdfplumber", tempos=None, inicio=0, fim=None, repetidas=frozenset()):
+    if backend == "pdfplumber":
+        return _iterar_paginas_pdfplumber(caminho_pdf, forcar_tabelas, tempos, inicio, fim, repetidas)
+    if backend in ("pdfium", "auto"):
+        return _iterar_paginas_pdfium(caminho_pdf, forcar_tabelas, com_tabelas=(backend == "auto"), tempos=tempos,
+                                      inicio=inicio, fim=fim, repetidas=repetidas)
+    raise ValueError(f"Backend de PDF desconhecido: {backend}")
+
+# Log do resumo de acréscimos encontrados em um PDF
+def _resumir_acrescimos(acres_por_data):
+    total_acrescimos = sum(acres_por_data.values())
+    qtd_dias_acrescimos = len(acres_por_data)
+    logging.info(f"  RESUMO - Acréscimos encontrados: {qtd_dias_acrescimos} dias, Total: R$ {total_acrescimos:.2f}")
+
+    if qtd_dias_acrescimos > 0 and logging.getLogger().isEnabledFor(logging.DEBUG):
+        for data, valor in sorted(acres_por_data.items()):
+            logging.debug("    %s: R$ %.2f", data.strftime("%d/%m/%Y"), valor)
+
+# Extrai dados do PDF com foco na correção dos acréscimos
+# As páginas são processadas em fluxo, então a memória usada não cresce com o número de páginas
+# forcar_tabelas=True procura tabelas em todas as páginas (validação da classificação de páginas)
+# backend escolhe o leitor de PDF: "pdfplumber", "pdfium" (só texto) ou "auto"
+# repetidas: índices das páginas já contadas em outro PDF do motorista, que não são somadas de novo
+# O tempo de cada etapa, as páginas, as linhas e o tamanho do arquivo ficam em metricas_pdfs[caminho_pdf]
+def extrair_dados_pdf(caminho_pdf, forcar_tabelas=False, backend="pdfplumber", repetidas=frozenset()):
+    import pypdfium2 as pdfium
+    from pdfminer.pdfparser import PDFSyntaxError
+
+    logging.info(f"Processando PDF: {os.path.basename(caminho_pdf)}")
+    tempos = TemposEtapas()
+    paginas = 0
+    linhas = 0
+    erro = False
+    inicio_parede = time.perf_counter()
+    inicio_cpu = time.process_time()
+    try:
+        estado = EstadoExtracao()
+        for texto, tabelas in _iterar_paginas(caminho_pdf, forcar_tabelas, backend, tempos, repetidas=repetidas):
+            paginas += 1
+            linhas += texto.count("\n") + 1 if texto else 0
+            with tempos.medir("analise"):
+                estado.processar_pagina(texto, tabelas)
+        with tempos.medir("analise"):
+            nome_motorista, entregas_por_dia, acres_por_data, bonus_pago_dates = estado.finalizar()
+
+        _resumir_acrescimos(acres_por_data)
+
+    except (PDFSyntaxError, pdfium.PdfiumError):
+        erro = True
         logging.error(f"Erro de sintaxe no PDF: {os.path.basename(caminho_pdf)}. O arquivo pode estar corrompido ou não é um PDF válido.")
         return None, defaultdict(lambda: {"entregues": 0, "insucessos": 0}), defaultdict(float), set()
+    except MemoryError:
+        erro = True
+        logging.error(f"Erro: Memória insuficiente ao extrair dados do PDF {os.path.basename(caminho_pdf)}; o PDF foi ignorado")
+        return None, defaultdict(lambda: {"entregues": 0, "insucessos": 0}), defaultdict(float), set()
     except Exception as e:
+        erro = True
         logging.error(f"Erro inesperado ao extrair dados do PDF {os.path.basename(caminho_pdf)}: {e}")
         return None, defaultdict(lambda: {"entregues": 0, "insucessos": 0}), defaultdict(float), set()
-    
+    finally:
+        agregador_avisos.descarregar(os.path.basename(caminho_pdf))
+        try:
+            tamanho = assinatura_pdf(caminho_pdf)[0]
+        except OSError:
+            tamanho = None
+        metricas_pdfs[caminho_pdf] = {
+            "arquivo": os.path.basename(caminho_pdf),
+            "bytes": tamanho,
+            "paginas": paginas,
+            "linhas": linhas,
+            "parede_s": round(time.perf_counter() - inicio_parede, 4),
+            "cpu_s": round(time.process_time() - inicio_cpu, 4),
+            "erro": erro,
+            "etapas": tempos.como_dict(),
+        }
+
     return nome_motorista, entregas_por_dia, acres_por_data, bonus_pago_dates
 
+# Divisão de um PDF grande em trechos de páginas lidos por processos diferentes (extrair_pdfs com --workers)
+# Um trecho que não começa na primeira página é lido de forma especulativa, presumindo que nenhuma seção
+# (Remunerações Diárias / Acréscimos) está aberta e que o nome do motorista já foi encontrado. A primeira
+# linha do trecho fica separada, pois é a continuação da última linha do trecho anterior. juntar_trechos()
+# confere a suposição com o estado real ao fim do trecho anterior e, se ela não vale, analisa de novo as
+# páginas do trecho (o texto e as tabelas vêm junto), então o resultado é sempre o da leitura sequencial
+PAGINAS_POR_TRECHO = 5
+_NOME_PRESUMIDO = object()
+
+# Quantidade de páginas do PDF (0 se não for possível abrir; o erro aparece na extração)
+def contar_paginas(caminho_pdf):
+    try:
+        documento = _abrir_pdfium(caminho_pdf)
+    except Exception:
+        return 0
+    try:
+        return len(documento)
+    finally:
+        documento.close()
+
+# Faixas de páginas (inicio, fim) para até "workers" trechos de no mínimo PAGINAS_POR_TRECHO páginas,
+# ou None se não vale a pena dividir
+def dividir_em_trechos(paginas, workers):
+    quantidade = min(workers, paginas // PAGINAS_POR_TRECHO)
+    if quantidade < 2:
+        return None
+    tamanho = -(-paginas // quantidade)
+    return [(inicio, min(inicio + tamanho, paginas)) for inicio in range(0, paginas, tamanho)]
+
+# Lê as páginas inicio..fim-1 do PDF; devolve o parcial do trecho (EstadoExtracao.parcial), a primeira
+# linha separada e, nos trechos especulativos, o texto e as tabelas das páginas
+def extrair_trecho_pdf(caminho_pdf, inicio, fim, forcar_tabelas=False, backend="pdfplumber", repetidas=frozenset()):
+    logging.info(f"Processando PDF: {os.path.basename(caminho_pdf)} (páginas {inicio + 1} a {fim})")
+    tempos = TemposEtapas()
+    estado = EstadoExtracao()
+    if inicio:
+        estado.nome_motorista = _NOME_PRESUMIDO
+    paginas = []
+    primeira_linha = None
+    analisar = True
+    linhas = 0
+    erro = False
+    inicio_parede = time.perf_counter()
+    inicio_cpu = time.process_time()
+    try:
+        for texto, tabelas in _iterar_paginas(caminho_pdf, forcar_tabelas, backend, tempos, inicio, fim, repetidas):
+            linhas += texto.count("\n") + 1 if texto else 0
+            if inicio:
+                paginas.append((texto, tabelas))
+                if len(paginas) == 1:
+                    # Página de uma linha só: ela inteira continua a linha anterior, sem o que especular;
+                    # uma página repetida não continua a linha anterior e é analisada só na junção
+                    analisar = "\n" in texto and tabelas is not None
+                    if analisar:
+                        primeira_linha, texto = texto.split("\n", 1)
+            if analisar:
+                with tempos.medir("analise"):
+                    estado.processar_pagina(texto, tabelas)
+    except Exception as e:
+        erro = True
+        logging.error(f"Erro ao extrair as páginas {inicio + 1} a {fim} do PDF {os.path.basename(caminho_pdf)}: {e}")
+    finally:
+        agregador_avisos.descarregar(f"{os.path.basename(caminho_pdf)} (páginas {inicio + 1} a {fim})")
+
+    metricas = {
+        "paginas": fim - inicio,
+        "linhas": linhas,
+        "parede_s": round(time.perf_counter() - inicio_parede, 4),
+        "cpu_s": round(time.process_time() - inicio_cpu, 4),
+        "erro": erro,
+        "etapas": tempos.como_dict(),
+    }
+    return {
+        "inicio": inicio,
+        "erro": erro,
+        "parcial": estado.parcial() if analisar and not erro else None,
+        "primeira_linha": primeira_linha,
+        "paginas": paginas if inicio else None,
+        "metricas": metricas,
+    }
+
+# Junta os trechos de um PDF, na ordem das páginas, no resultado de extrair_dados_pdf
+def juntar_trechos(trechos):
+    estado = EstadoExtracao()
+    for trecho in trechos:
+        if trecho["inicio"] == 0:
+            estado.incorporar(trecho["parcial"])
+            continue
+        valido = False
+        if trecho["primeira_linha"] is not None:
+            estado.processar_linha(estado.linha_incompleta + trecho["primeira_linha"])
+            estado.linha_incompleta = ""
+            valido = (trecho["parcial"] is not None and estado.nome_motorista is not None
+                      and not estado.remuneracoes_section and not estado.acrescimos_section)
+        if valido:
+            estado.incorporar(trecho["parcial"])
+            continue
+        # Suposição errada: o trecho é analisado de novo a partir do estado real
+        estatisticas_extracao["trechos_reanalisados"] += 1
+        for indice, (texto, tabelas) in enumerate(trecho["paginas"]):
+            if indice == 0 and trecho["primeira_linha"] is not None:
+                texto = texto.split("\n", 1)[1]
+            estado.processar_pagina(texto, tabelas)
+    return estado.finalizar()
+
+# Executa extrair_trecho_pdf em um processo filho, devolvendo também os avisos e contadores do filho
+def _extrair_trecho_em_processo(caminho_pdf, inicio, fim, forcar_tabelas=False, backend="pdfplumber", repetidas=frozenset()):
+    configurar_logging()
+    relatorio_erros.retirar_pendentes()
+    estatisticas_antes = Counter(estatisticas_extracao)
+    trecho = extrair_trecho_pdf(caminho_pdf, inicio, fim, forcar_tabelas, backend, repetidas)
+    estatisticas = Counter(estatisticas_extracao)
+    estatisticas.subtract(estatisticas_antes)
+    return trecho, relatorio_erros.retirar_pendentes(), estatisticas
+
+# Resultado de um PDF lido em trechos: junta os trechos e registra as métricas somadas do arquivo
+def _combinar_trechos(caminho_pdf, trechos):
+    etapas = TemposEtapas()
+    for trecho in trechos:
+        for etapa, tempo in trecho["metricas"]["etapas"].items():
+            etapas.parede[etapa] += tempo["parede_s"]
+            etapas.cpu[etapa] += tempo["cpu_s"]
+    erro = any(trecho["erro"] for trecho in trechos)
+    inicio_cpu = time.process_time()
+    if erro:
+        resultado = (None, {}, {}, set())
+    else:
+        nome, entregas, acrescimos, bonus = juntar_trechos(trechos)
+        _resumir_acrescimos(acrescimos)
+        resultado = (nome, {data: dict(info) for data, info in entregas.items()}, dict(acrescimos), bonus)
+    etapas.cpu["juntar"] += time.process_time() - inicio_cpu
+    try:
+        tamanho = assinatura_pdf(caminho_pdf)[0]
+    except OSError:
+        tamanho = None
+    metricas_pdfs[caminho_pdf] = {
+        "arquivo": os.path.basename(caminho_pdf),
+        "bytes": tamanho,
+        "paginas": sum(trecho["metricas"]["paginas"] for trecho in trechos),
+        "linhas": sum(trecho["metricas"]["linhas"] for trecho in trechos),
+        "parede_s": max(trecho["metricas"]["parede_s"] for trecho in trechos),
+        "cpu_s": round(sum(trecho["metricas"]["cpu_s"] for trecho in trechos), 4),
+        "erro": erro,
+        "etapas": etapas.como_dict(),
+        "trechos": len(trechos),
+    }
+    return resultado
+
+# SHA-256 do conteúdo do arquivo (ou do membro de pacote), lido em blocos
+# O resultado é lembrado enquanto o tamanho e a data de modificação do arquivo não mudam: a busca de
+# PDFs idênticos, o manifesto e o cache pedem o mesmo hash na mesma execução
+# Uma entrada por caminho (caminho -> (tamanho, mtime_ns, sha256)), com no máximo HASHES_MAXIMO caminhos;
+# os usados há mais tempo saem primeiro, o que limita a memória no modo de vigia e no serviço
+HASHES_MAXIMO = 4096
+_hashes_arquivos = OrderedDict()
+
+def hash_arquivo(caminho):
+    chave = os.path.abspath(caminho)
+    assinatura = assinatura_pdf(caminho)
+    lembrado = _hashes_arquivos.get(chave)
+    if lembrado and lembrado[:2] == assinatura:
+        _hashes_arquivos.move_to_end(chave)
+        return lembrado[2]
+    sha = hashlib.sha256()
+    fonte = fonte_pdf(caminho)
+    if isinstance(fonte, bytes):
+        sha.update(fonte)
+    else:
+        with open(caminho, "rb") as f:
+            for bloco in iter(lambda: f.read(1024 * 1024), b""):
+                sha.update(bloco)
+    _hashes_arquivos[chave] = (*assinatura, sha.hexdigest())
+    _hashes_arquivos.move_to_end(chave)
+    while len(_hashes_arquivos) > HASHES_MAXIMO:
+        _hashes_arquivos.popitem(last=False)
+    return _hashes_arquivos[chave][2]
+
+# Descarta o hash lembrado de um arquivo que saiu da pasta
+def esquecer_hash(caminho):
+    _hashes_arquivos.pop(os.path.abspath(caminho), None)
+
+# Impressões das páginas lembradas pelo SHA-256 do arquivo (sha256 -> impressões), também com no máximo
+# HASHES_MAXIMO entradas: a busca de páginas repetidas não abre de novo um PDF que já leu
+_impressoes_arquivos = OrderedDict()
+
+# Remove dos grupos os PDFs byte a byte idênticos a um PDF anterior (de qualquer motorista), que seriam
+# lidos e somados duas vezes; grupos que ficam vazios saem da lista
+# Devolve os grupos e a lista de pares (PDF ignorado, PDF igual que foi mantido)
+def remover_pdfs_identicos(grupos):
+    vistos = {}
+    ignorados = []
+    restantes = {}
+    for nome_base, caminhos_pdfs in grupos.items():
+        mantidos = []
+        for caminho_pdf in caminhos_pdfs:
+            try:
+                sha = hash_arquivo(caminho_pdf)
+            except OSError:
+                mantidos.append(caminho_pdf)  # Arquivo ilegível: a própria extração registra o erro
+                continue
+            if sha in vistos:
+                ignorados.append((caminho_pdf, vistos[sha]))
+                logging.warning(f"Aviso: PDF {os.path.basename(caminho_pdf)} é idêntico a "
+                                f"{os.path.basename(vistos[sha])} e foi ignorado")
+                continue
+            vistos[sha] = caminho_pdf
+            mantidos.append(caminho_pdf)
+        if mantidos:
+            restantes[nome_base] = mantidos
+    estatisticas_extracao["pdfs_identicos"] += len(ignorados)
+    return restantes, ignorados
+
+# Linhas que o navegador acrescenta em cada página impressa e que mudam a cada exportação do mesmo relatório:
+# o cabeçalho com a data e a hora da impressão ("17/07/2025, 11:02 GFL - Impressão de Fatura Motorista"),
+# o endereço da fatura (com o fcr, que muda a cada impressão, e o contador "1/4" no fim) e o contador sozinho
+regex_linha_impressao = re.compile(r"\d{2}/\d{2}/\d{4},? \d{1,2}:\d{2}\b.*|https?://.*|\d+ ?/ ?\d+")
+
+# Impressão digital de cada página do PDF: SHA-256 do texto (lido pelo pdfium, com os espaços normalizados)
+# sem as linhas da impressão, para que a mesma página exportada em outra hora ou em outro intervalo de páginas
+# seja reconhecida; páginas sem texto ficam com None e nunca contam como repetidas
+def impressoes_paginas(caminho_pdf):
+    documento = _abrir_pdfium(caminho_pdf)
+    try:
+        impressoes = []
+        for indice in range(len(documento)):
+            linhas = (" ".join(linha.split()) for linha in _texto_pagina_pdfium(documento, indice).splitlines())
+            texto = "\n".join(linha for linha in linhas if linha and not regex_linha_impressao.fullmatch(linha))
+            impressoes.append(hashlib.sha256(texto.encode("utf-8")).hexdigest() if texto else None)
+        return impressoes
+    finally:
+        documento.close()
+
+# Impressões das páginas de um PDF, pelo SHA-256 do arquivo: da memória, do cache em disco (quando há) ou,
+# na primeira vez que o conteúdo aparece, lidas com o pdfium; um PDF já visto não é aberto de novo
+def impressoes_pdf(caminho_pdf, cache=None):
+    sha = hash_arquivo(caminho_pdf)
+    impressoes = _impressoes_arquivos.get(sha)
+    if impressoes is None and cache is not None:
+        impressoes = cache.obter_impressoes(sha)
+    if impressoes is None:
+        impressoes = impressoes_paginas(caminho_pdf)
+        if cache is not None:
+            cache.gravar_impressoes(sha, impressoes)
+    _impressoes_arquivos[sha] = impressoes
+    _impressoes_arquivos.move_to_end(sha)
+    while len(_impressoes_arquivos) > HASHES_MAXIMO:
+        _impressoes_arquivos.popitem(last=False)
+    return impressoes
+
+# Páginas repetidas em uma sequência de PDFs: [(chave, impressões das páginas)] -> {chave: frozenset(índices)}
+# com as páginas cujo texto já apareceu antes, no mesmo PDF ou em um PDF anterior da sequência
+def marcar_repetidas(impressoes_pdfs):
+    vistas = set()
+    repetidas = {}
+    for chave, impressoes in impressoes_pdfs:
+        indices = set()
+        for indice, impressao in enumerate(impressoes):
+            if impressao is None:
+                continue
+            if impressao in vistas:
+                indices.add(indice)
+            vistas.add(impressao)
+        if indices:
+            repetidas[chave] = frozenset(indices)
+    return repetidas
+
+# Ordem dos PDFs de um motorista na busca de páginas repetidas (a cópia que conta é a do primeiro PDF):
+# pelo sufixo numérico do nome (ana.pdf, ana2.pdf, ana 3.pdf), pelo nome e pelo SHA-256. É a mesma ordem
+# na base de registros, e o resultado não depende da ordem da listagem da pasta
+def ordem_repetidas(nome_arquivo, sha256=""):
+    sufixo = re.search(r"(\d*)\.pdf$", nome_arquivo.lower())
+    return int(sufixo.group(1)) if sufixo and sufixo.group(1) else 0, nome_arquivo, sha256
+
+# Chave de um conjunto de páginas repetidas ("" quando não há nenhuma), usada no cache e na base de registros
+def chave_repetidas(indices):
+    return ",".join(str(indice) for indice in sorted(indices))
+
+# Páginas repetidas nos PDFs de um mesmo motorista (relatórios exportados de novo ou com períodos
+# sobrepostos): {caminho: frozenset(índices)} com as páginas cujo texto já apareceu antes, no mesmo PDF
+# ou em um PDF anterior na ordem_repetidas; só os PDFs com páginas repetidas aparecem no resultado
+# impressoes (opcional) recebe {caminho: impressões das páginas} de cada PDF lido; com o cache, as impressões
+# dos PDFs já vistos em outra execução vêm do disco
+def paginas_repetidas(caminhos_pdfs, impressoes=None, cache=None):
+    impressoes = {} if impressoes is None else impressoes
+    ordenados = []
+    for caminho_pdf in caminhos_pdfs:
+        try:
+            impressoes[caminho_pdf] = impressoes_pdf(caminho_pdf, cache)
+            ordenados.append((ordem_repetidas(os.path.basename(caminho_pdf), hash_arquivo(caminho_pdf)), caminho_pdf))
+        except Exception:
+            continue  # PDF ilegível: a própria extração registra o erro
+    repetidas = marcar_repetidas((caminho_pdf, impressoes[caminho_pdf]) for _, caminho_pdf in sorted(ordenados))
+    for caminho_pdf, indices in repetidas.items():
+        logging.warning(f"Aviso: {len(indices)} de {len(impressoes[caminho_pdf])} páginas do PDF {os.path.basename(caminho_pdf)} "
+                        f"já foram lidas no mesmo PDF ou em outro PDF do motorista e não serão somadas de novo")
+    return repetidas
+
+# Cache em disco dos dados extraídos de cada PDF
+# As entradas são indexadas pelo SHA-256 do arquivo, pela versão do extrator e pelo backend de PDF;
+# as impressões das páginas ficam em entradas próprias, só pelo SHA-256 e pela versão das impressões
+# Quando a pasta passa do tamanho máximo, as entradas usadas há mais tempo (mtime) são removidas primeiro
+IMPRESSOES_VERSAO = 2
+class CacheExtracao:
+    def __init__(self, pasta, tamanho_maximo, reconstruir=False, backend="pdfplumber"):
+        self.pasta = pasta
+        self.tamanho_maximo = tamanho_maximo
+        self.reconstruir = reconstruir
+        self.backend = backend
+        os.makedirs(pasta, exist_ok=True)
+
+    def _caminho(self, sha):
+        return os.path.join(self.pasta, f"v{EXTRATOR_VERSAO}-{self.backend}-{sha}.json")
+
+    def _ler(self, caminho):
+        if self.reconstruir:
+            return None
+        try:
+            with open(caminho, "r", encoding="utf-8") as f:
+                dados = json.load(f)
+            # Marca a entrada como usada recentemente para a política LRU
+            os.utime(caminho, None)
+        except (OSError, ValueError):
+            return None
+        return dados
+
+    def _escrever(self, caminho, dados):
+        temporario = f"{caminho}.{os.getpid()}.tmp"
+        try:
+            with open(temporario, "w", encoding="utf-8") as f:
+                json.dump(dados, f, ensure_ascii=False)
+            os.replace(temporario, caminho)
+        except OSError as e:
+            logging.warning(f"Aviso: Não foi possível gravar o cache de extração {caminho}: {e}")
+
+    def obter(self, sha):
+        dados = self._ler(self._caminho(sha))
+        if dados is None:
+            return None
+        entregas = {date.fromisoformat(d): {"entregues": e, "insucessos": i} for d, (e, i) in dados["entregas"].items()}
+        acrescimos = {date.fromisoformat(d): valor for d, valor in dados["acrescimos"].items()}
+        bonus = {date.fromisoformat(d) for d in dados["bonus"]}
+        return dados["nome"], entregas, acrescimos, bonus
+
+    def gravar(self, sha, resultado):
+        nome, entregas, acrescimos, bonus = resultado
+        dados = {
+            "nome": nome,
+            "entregas": {d.isoformat(): [info["entregues"], info["insucessos"]] for d, info in entregas.items()},
+            "acrescimos": {d.isoformat(): valor for d, valor in acrescimos.items()},
+            "bonus": sorted(d.isoformat() for d in bonus),
+        }
+        self._escrever(self._caminho(sha), dados)
+
+    def _caminho_impressoes(self, sha):
+        return os.path.join(self.pasta, f"paginas-v{IMPRESSOES_VERSAO}-{sha}.json")
+
+    def obter_impressoes(self, sha):
+        dados = self._ler(self._caminho_impressoes(sha))
+        return dados if isinstance(dados, list) else None
+
+    def gravar_impressoes(self, sha, impressoes):
+        self._escrever(self._caminho_impressoes(sha), impressoes)
+
+    def aplicar_limite(self):
+        entradas = []
+        with os.scandir(self.pasta) as it:
+            for entrada in it:
+                if entrada.is_file() and entrada.name.endswith(".json"):
+                    info = entrada.stat()
+                    entradas.append((info.st_mtime, info.st_size, entrada.path))
+        total = sum(tamanho for _, tamanho, _ in entradas)
+        for _, tamanho, caminho in sorted(entradas):
+            if total <= self.tamanho_maximo:
+                break
+            try:
+                os.remove(caminho)
+                total -= tamanho
+            except OSError:
+                pass
+
+# Executa extrair_dados_pdf em um processo filho
+# Devolve o resultado com tipos serializáveis (sem defaultdict com lambda), os avisos, os contadores
+# e as métricas de tempo gerados no filho
+def _extrair_em_processo(caminho_pdf, forcar_tabelas=False, backend="pdfplumber", repetidas=frozenset()):
+    # Com o método "spawn" (Windows) o filho importa o módulo do zero, sem o logging configurado
+    configurar_logging()
+    relatorio_erros.retirar_pendentes()
+    estatisticas_antes = Counter(estatisticas_extracao)
+    nome, entregas, acrescimos, bonus = extrair_dados_pdf(caminho_pdf, forcar_tabelas, backend, repetidas)
+    entregas = {data: dict(info_entrega) for data, info_entrega in entregas.items()}
+    estatisticas = Counter(estatisticas_extracao)
+    estatisticas.subtract(estatisticas_antes)
+    metricas = metricas_pdfs.pop(caminho_pdf, None)
+    return (nome, entregas, dict(acrescimos), bonus), relatorio_erros.retirar_pendentes(), estatisticas, metricas
+
+# Laço de um processo supervisionado: recebe (função, argumentos) pela conexão, devolve (True, resultado)
+# ou (False, descrição do erro) e termina ao receber None
+# O Ctrl+C é tratado pelo processo principal, que encerra os filhos
+def _processo_supervisionado(conexao, memoria_mb=None):
+    import signal
+
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if memoria_mb:
+        import resource
+
+        # As bibliotecas de PDF são carregadas antes: o limite vale para a leitura dos PDFs
+        import pdfplumber  # noqa: F401
+        import pypdfium2  # noqa: F401
+
+        limite = int(memoria_mb * 1024 * 1024)
+        resource.setrlimit(resource.RLIMIT_AS, (limite, limite))
+    while True:
+        tarefa = conexao.recv()
+        if tarefa is None:
+            return
+        funcao, argumentos = tarefa
+        try:
+            resposta = (True, funcao(*argumentos))
+        except MemoryError:
+            resposta = (False, f"limite de memória de {memoria_mb:g} MB excedido")
+        except Exception as e:
+            resposta = (False, f"{type(e).__name__}: {e}")
+        conexao.send(resposta)
+
+# Executa as tarefas de extração em processos filhos acompanhados pelo processo principal
+# - tempo_limite (s): a tarefa que passa do limite tem o processo encerrado e fica sem resultado
+# - memoria_mb: limite do espaço de endereçamento de cada processo (RLIMIT_AS; só em sistemas POSIX)
+# - tarefas_por_processo: o processo é trocado por um novo depois dessa quantidade de tarefas, para
+#   limitar o acúmulo de memória das bibliotecas de PDF
+# Um processo que morre no meio de uma tarefa (falta de memória, falha do leitor de PDF) é substituído;
+# as tarefas que falham são registradas no relatório de erros e as demais seguem normalmente
+class SupervisorExtracao:
+    def __init__(self, processos, tempo_limite=None, memoria_mb=None, tarefas_por_processo=None):
+        self.processos = max(1, processos)
+        self.tempo_limite = tempo_limite
+        self.memoria_mb = memoria_mb
+        self.tarefas_por_processo = tarefas_por_processo
+
+    def _iniciar(self, contexto):
+        conexao, conexao_filho = contexto.Pipe()
+        processo = contexto.Process(target=_processo_supervisionado, args=(conexao_filho, self.memoria_mb), daemon=True)
+        processo.start()
+        conexao_filho.close()
+        estatisticas_extracao["processos_iniciados"] += 1
+        return {"processo": processo, "conexao": conexao, "tarefas": 0}
+
+    @staticmethod
+    def _encerrar(trabalhador, matar=False):
+        processo = trabalhador["processo"]
+        if not matar:
+            try:
+                trabalhador["conexao"].send(None)
+            except OSError:
+                matar = True
+            else:
+                processo.join(5)
+        if matar or processo.is_alive():
+            processo.kill()
+            processo.join()
+        trabalhador["conexao"].close()
+
+    # tarefas: lista de (descrição, função, argumentos); devolve os resultados na mesma ordem, com None
+    # nas tarefas que falharam, passaram do tempo limite ou perderam o processo
+    def executar(self, tarefas):
+        import multiprocessing
+        from multiprocessing.connection import wait
+
+        contexto = multiprocessing.get_context()
+        resultados = [None] * len(tarefas)
+        proximas = iter(range(len(tarefas)))
+        proxima = next(proximas, None)
+        livres = []
+        ocupados = {}  # conexão -> (trabalhador, índice da tarefa, início)
+        try:
+            while proxima is not None or ocupados:
+                while proxima is not None and len(ocupados) < self.processos:
+                    trabalhador = livres.pop() if livres else self._iniciar(contexto)
+                    trabalhador["conexao"].send(tarefas[proxima][1:])
+                    ocupados[trabalhador["conexao"]] = (trabalhador, proxima, time.monotonic())
+                    proxima = next(proximas, None)
+
+                espera = None
+                if self.tempo_limite:
+                    prazo = min(inicio for _, _, inicio in ocupados.values()) + self.tempo_limite
+                    espera = max(0.0, prazo - time.monotonic())
+                prontos = set(wait(list(ocupados) + [trabalhador["processo"].sentinel for trabalhador, _, _ in ocupados.values()], espera))
+
+                for conexao, (trabalhador, indice, inicio) in list(ocupados.items()):
+                    descricao = tarefas[indice][0]
+                    if conexao in prontos:
+                        try:
+                            sucesso, valor = conexao.recv()
+                        except (EOFError, OSError):
+                            sucesso = None
+                    elif trabalhador["processo"].sentinel in prontos:
+                        sucesso = None
+                    elif self.tempo_limite and time.monotonic() - inicio >= self.tempo_limite:
+                        del ocupados[conexao]
+                        self._encerrar(trabalhador, matar=True)
+                        estatisticas_extracao["tarefas_tempo_esgotado"] += 1
+                        logging.error(f"Erro: Tempo limite de {self.tempo_limite:g} s excedido ao ler {descricao}; "
+                                      f"o processo foi encerrado e o PDF foi ignorado")
+                        continue
+                    else:
+                        continue
+
+                    del ocupados[conexao]
+                    if sucesso is None:
+                        # O processo morreu sem responder (falta de memória, falha do leitor de PDF)
+                        trabalhador["processo"].join(1)
+                        codigo = trabalhador["processo"].exitcode
+                        self._encerrar(trabalhador, matar=True)
+                        estatisticas_extracao["processos_perdidos"] += 1
+                        logging.error(f"Erro: O processo que lia {descricao} terminou inesperadamente (código {codigo}); o PDF foi ignorado")
+                        continue
+                    if sucesso:
+                        resultados[indice] = valor
+                    else:
+                        logging.error(f"Erro ao extrair {descricao}: {valor}; o PDF foi ignorado")
+                    trabalhador["tarefas"] += 1
+                    if self.tarefas_por_processo and trabalhador["tarefas"] >= self.tarefas_por_processo:
+                        self._encerrar(trabalhador)
+                    else:
+                        livres.append(trabalhador)
+        finally:
+            for trabalhador in livres:
+                self._encerrar(trabalhador)
+            for trabalhador, _, _ in ocupados.values():
+                self._encerrar(trabalhador, matar=True)
+        return resultados
+
+# Supervisor da extração conforme --pdf-timeout, --pdf-max-mb e --recycle-after; None se nenhum limite foi pedido
+def criar_supervisor():
+    if TEMPO_LIMITE_PDF or MEMORIA_PDF_MB or TAREFAS_POR_PROCESSO:
+        return SupervisorExtracao(WORKERS, TEMPO_LIMITE_PDF, MEMORIA_PDF_MB, TAREFAS_POR_PROCESSO)
+    return None
+
+# Resultado de um PDF cuja extração supervisionada falhou: sem nome de motorista, como os PDFs ilegíveis
+def _extracao_ignorada(caminho_pdf):
+    try:
+        tamanho = assinatura_pdf(caminho_pdf)[0]
+    except OSError:
+        tamanho = None
+    estatisticas_extracao["pdfs_ignorados"] += 1
+    metricas_pdfs[caminho_pdf] = {
+        "arquivo": os.path.basename(caminho_pdf),
+        "bytes": tamanho,
+        "paginas": 0,
+        "linhas": 0,
+        "parede_s": 0.0,
+        "cpu_s": 0.0,
+        "erro": True,
+        "etapas": {},
+    }
+    return None, {}, {}, set()
+
+# Extrai os PDFs informados, em paralelo quando workers > 1
+# Os resultados são devolvidos na mesma ordem de caminhos_pdfs, garantindo a mesma consolidação do modo sequencial
+# Com cache, PDFs cujo conteúdo já foi extraído antes não são lidos novamente
+# repetidas ({caminho: índices}, de paginas_repetidas) indica as páginas que não devem ser somadas; o
+# resultado depende delas, então elas entram na chave do cache e das extrações prontas do modo de vigia
+# Com um supervisor (tempo ou memória limitados), mesmo com um processo a extração roda em processos filhos
+def extrair_pdfs(caminhos_pdfs, workers=1, cache=None, forcar_tabelas=False, backend="pdfplumber", repetidas=None, supervisor=None):
+    repetidas = repetidas or {}
+    resultados = {}
+    hashes = {}
+    assinaturas = {}
+    pendentes = []
+    for caminho_pdf in caminhos_pdfs:
+        pronto = extracoes_prontas.get(caminho_pdf)
+        if pronto:
+            try:
+                assinaturas[caminho_pdf] = assinatura_pdf(caminho_pdf)
+            except OSError:
+                pass
+            resultado = pronto[2].get(repetidas.get(caminho_pdf, frozenset()))
+            if assinaturas.get(caminho_pdf) == pronto[:2] and resultado is not None:
+                resultados[caminho_pdf] = resultado
+                continue
+        if cache:
+            try:
+                hashes[caminho_pdf] = hash_arquivo(caminho_pdf)
+            except OSError:
+                pass  # Arquivo ilegível: a própria extração registra o erro
+            else:
+                if caminho_pdf in repetidas:
+                    indices = chave_repetidas(repetidas[caminho_pdf])
+                    hashes[caminho_pdf] += "-r" + hashlib.sha256(indices.encode()).hexdigest()[:16]
+                resultado = cache.obter(hashes[caminho_pdf])
+                if resultado is not None:
+                    resultados[caminho_pdf] = resultado
+                    estatisticas_extracao["pdfs_do_cache"] += 1
+                    continue
+        pendentes.append(caminho_pdf)
+
+    if cache:
+        logging.info(f"Cache de extração: {len(caminhos_pdfs) - len(pendentes)} de {len(caminhos_pdfs)} PDFs reaproveitados")
+
+    # Com vários processos, os PDFs grandes são divididos em trechos de páginas; as tarefas maiores
+    # são enviadas primeiro para que nenhum processo fique com um PDF grande para o final
+    paginas = {caminho_pdf: contar_paginas(caminho_pdf) for caminho_pdf in pendentes} if workers > 1 else {}
+    trechos = {caminho_pdf: dividir_em_trechos(paginas[caminho_pdf], workers) for caminho_pdf in paginas}
+    tarefas = sum(len(trechos[caminho_pdf] or [None]) for caminho_pdf in trechos)
+    if supervisor is None and (workers <= 1 or tarefas <= 1):
+        extraidos = [extrair_dados_pdf(caminho_pdf, forcar_tabelas, backend, repetidas.get(caminho_pdf, frozenset()))
+                     for caminho_pdf in pendentes]
+    else:
+        supervisor = supervisor or SupervisorExtracao(workers)
+        ordem = sorted(pendentes, key=lambda caminho_pdf: -paginas.get(caminho_pdf, 0) / len(trechos.get(caminho_pdf) or [None]))
+        lista_tarefas = []
+        posicoes = {}
+        for caminho_pdf in ordem:
+            nome_arquivo = os.path.basename(caminho_pdf)
+            repetidas_pdf = repetidas.get(caminho_pdf, frozenset())
+            posicoes[caminho_pdf] = len(lista_tarefas)
+            if trechos.get(caminho_pdf):
+                lista_tarefas.extend((f"o PDF {nome_arquivo} (páginas {inicio + 1} a {fim})", _extrair_trecho_em_processo,
+                                      (caminho_pdf, inicio, fim, forcar_tabelas, backend, repetidas_pdf))
+                                     for inicio, fim in trechos[caminho_pdf])
+            else:
+                lista_tarefas.append((f"o PDF {nome_arquivo}", _extrair_em_processo, (caminho_pdf, forcar_tabelas, backend, repetidas_pdf)))
+        respostas = supervisor.executar(lista_tarefas)
+
+        extraidos = []
+        for caminho_pdf in pendentes:
+            # Os avisos, contadores e métricas dos processos filhos entram nos relatórios do processo principal
+            inicio = posicoes[caminho_pdf]
+            respostas_pdf = respostas[inicio:inicio + len(trechos.get(caminho_pdf) or [None])]
+            for resposta in respostas_pdf:
+                if resposta is not None:
+                    relatorio_erros.escrever(resposta[1])
+                    estatisticas_extracao.update(resposta[2])
+            if any(resposta is None for resposta in respostas_pdf):
+                extraidos.append(_extracao_ignorada(caminho_pdf))
+            elif trechos.get(caminho_pdf):
+                extraidos.append(_combinar_trechos(caminho_pdf, [trecho for trecho, _, _ in respostas_pdf]))
+            else:
+                resultado, _, _, metricas = respostas_pdf[0]
+                if metricas:
+                    metricas_pdfs[caminho_pdf] = metricas
+                extraidos.append(resultado)
+
+    for caminho_pdf, resultado in zip(pendentes, extraidos):
+        resultados[caminho_pdf] = resultado
+        # Falhas de extração (sem nome de motorista) não são guardadas, para serem tentadas de novo
+        if cache and resultado[0] and caminho_pdf in hashes:
+            cache.gravar(hashes[caminho_pdf], resultado)
+        pronto = extracoes_prontas.get(caminho_pdf)
+        if pronto and resultado[0] and assinaturas.get(caminho_pdf) == pronto[:2]:
+            completo = {frozenset(): pronto[2][frozenset()]} if frozenset() in pronto[2] else {}
+            extracoes_prontas[caminho_pdf] = (*pronto[:2], {**completo, repetidas.get(caminho_pdf, frozenset()): resultado})
+    if cache and pendentes:
+        cache.aplicar_limite()
+
+    return [resultados[caminho_pdf] for caminho_pdf in caminhos_pdfs]
+
+# Extração do PDF inteiro (sem descontar páginas repetidas) que já está pronta no modo de vigia ou no cache
+# em disco, sem ler o PDF; None quando ela não está pronta
+def extracao_inteira_pronta(caminho_pdf, cache=None):
+    pronto = extracoes_prontas.get(caminho_pdf)
+    try:
+        if pronto and frozenset() in pronto[2] and assinatura_pdf(caminho_pdf) == pronto[:2]:
+            return pronto[2][frozenset()]
+        return cache.obter(hash_arquivo(caminho_pdf)) if cache else None
+    except OSError:
+        return None
+
+# Registros extraídos de um motorista em colunas, um elemento por dia (ordenados)
+# Datas como ordinal (date.toordinal), contagens inteiras e dinheiro em centavos (int64): o cálculo
+# do fechamento é feito com o NumPy sobre todos os motoristas de uma vez e o objeto é pequeno e
+# serializável com pickle, sem um dicionário e um date por dia
+# movimento marca os dias com entregas ou acréscimos (os que viram linha na aba); bônus de outros dias não contam
+class RegistrosMotorista:
+    __slots__ = ("nome", "dias", "entregues", "insucessos", "acrescimos", "bonus", "movimento")
+
+    def __init__(self, nome, dias, entregues, insucessos, acrescimos, bonus, movimento):
+        self.nome = nome
+        self.dias = dias
+        self.entregues = entregues
+        self.insucessos = insucessos
+        self.acrescimos = acrescimos
+        self.bonus = bonus
+        self.movimento = movimento
+
+    # A partir do resultado de extrair_dados_pdf (dicionários por data e conjunto de datas com bônus)
+    @classmethod
+    def da_extracao(cls, nome, entregas_por_dia, acres_por_data, bonus_pago_dates):
+        import numpy as np
+
+        datas = sorted(set(entregas_por_dia) | set(acres_por_data) | set(bonus_pago_dates))
+        n = len(datas)
+        return cls(
+            nome,
+            np.fromiter((data.toordinal() for data in datas), np.int64, n),
+            np.fromiter((entregas_por_dia[data]["entregues"] if data in entregas_por_dia else 0 for data in datas), np.int64, n),
+            np.fromiter((entregas_por_dia[data]["insucessos"] if data in entregas_por_dia else 0 for data in datas), np.int64, n),
+            np.fromiter((round(acres_por_data.get(data, 0.0) * 100) for data in datas), np.int64, n),
+            np.fromiter((data in bonus_pago_dates for data in datas), bool, n),
+            np.fromiter((data in entregas_por_dia or data in acres_por_data for data in datas), bool, n),
+        )
+
+    # Junta os registros de vários PDFs do mesmo motorista somando os dias repetidos
+    # O nome é o do primeiro registro que tem nome
+    @classmethod
+    def consolidar(cls, registros):
+        import numpy as np
+
+        if len(registros) == 1:
+            return registros[0]
+        nome = next((registro.nome for registro in registros if registro.nome), None)
+        dias, posicoes = np.unique(np.concatenate([registro.dias for registro in registros]), return_inverse=True)
+
+        def juntar(campo, operacao, tipo):
+            resultado = np.zeros(len(dias), tipo)
+            operacao.at(resultado, posicoes, np.concatenate([getattr(registro, campo) for registro in registros]))
+            return resultado
+
+        return cls(nome, dias, juntar("entregues", np.add, np.int64), juntar("insucessos", np.add, np.int64),
+                   juntar("acrescimos", np.add, np.int64), juntar("bonus", np.logical_or, bool),
+                   juntar("movimento", np.logical_or, bool))
+
+# Colunas das abas do fechamento; Recebido, Total Dia e Diferença são preenchidas com fórmulas na gravação
+COLUNAS_FECHAMENTO = ["Data", "Motorista", "Tipo de Veículo", "Entregues", "Insucessos", "Valor Entregas", "Descontos",
+                      "Acréscimo Calculado", "Acréscimo Pago", "Recebido", "Total Dia", "Bônus", "Diferença"]
+
+# Calcula o fechamento de vários motoristas de uma vez
+# motoristas: [(nome lido no PDF, RegistrosMotorista)]; devolve [(nome na planilha, DataFrame)] na mesma
+# ordem, com (None, DataFrame vazio) para quem não está na planilha de veículos
+# Os dias de todos os motoristas são calculados juntos, em centavos; cada DataFrame recebe as linhas
+# do seu motorista seguidas da linha "Total"
+def calcular_fechamentos(motoristas):
+    import numpy as np
+    import pandas as pd
+
+    resultados = [(None, pd.DataFrame()) for _ in motoristas]
+    encontrados = []
+    for posicao, (nome_motorista, registros) in enumerate(motoristas):
+        nome_final = encontrar_nome_aproximado(nome_motorista.strip().upper())
+        if not nome_final:
+            logging.warning(f"  Nome não encontrado na planilha de veículos para: {nome_motorista}")
+            continue
+        encontrados.append((posicao, nome_final, registros))
+    if not encontrados:
+        return resultados
+
+    valor_entrega = round(VALOR_ENTREGA * 100)
+    bonus_diario = round(BONUS_DIARIO * 100)
+    movimentos = [registros.movimento for _, _, registros in encontrados]
+    tamanhos = np.array([np.count_nonzero(movimento) for movimento in movimentos], np.int64)
+    quantidade = len(encontrados)
+    motorista = np.repeat(np.arange(quantidade), tamanhos)
+
+    def coluna(campo):
+        return np.concatenate([getattr(registros, campo)[movimento] for (_, _, registros), movimento in zip(encontrados, movimentos)])
+
+    dias = coluna("dias")
+    entregues = coluna("entregues")
+    insucessos = coluna("insucessos")
+    acrescimos = coluna("acrescimos")
+    bonus = coluna("bonus")
+    diarias = np.array([round(diarios_info[nome_final]["diaria"] * 100) for _, nome_final, _ in encontrados], np.int64)
+
+    # Valores do dia (centavos)
+    valor_entregas = entregues * valor_entrega
+    descontos = insucessos * valor_entrega
+    acrescimo_calculado = np.maximum(0, diarias[motorista] - valor_entregas - descontos)
+    bonus_valor = bonus * bonus_diario
+
+    # Linha "Total" de cada motorista: o acréscimo calculado é sempre 0 na linha de total
+    def totais(valores):
+        return np.bincount(motorista, weights=valores, minlength=quantidade).round().astype(np.int64)
+
+    # Posição de cada dia e de cada total nas linhas de todos os motoristas, em sequência
+    fins = np.cumsum(tamanhos + 1)
+    posicao_totais = fins - 1
+    posicao_dias = np.arange(len(dias)) + motorista
+    linhas = int(fins[-1])
+
+    def intercalar(valores_dia, valores_total, tipo):
+        resultado = np.empty(linhas, tipo)
+        resultado[posicao_dias] = valores_dia
+        resultado[posicao_totais] = valores_total
+        return resultado
+
+    def reais(valores_dia, valores_total):
+        return intercalar(valores_dia, valores_total, np.int64) / 100
+
+    # Cada dia diferente é formatado uma única vez
+    dias_unicos, indices_dias = np.unique(dias, return_inverse=True)
+    textos_dias = np.array([date.fromordinal(int(dia)).strftime("%d/%m/%Y") for dia in dias_unicos], dtype=object)
+    nomes = np.array([nome_final for _, nome_final, _ in encontrados], dtype=object)
+    tipos = np.array([diarios_info[nome_final]["tipo"] for _, nome_final, _ in encontrados], dtype=object)
+    formulas = np.full(linhas, None, dtype=object)
+    total_entregues = totais(entregues)
+    total_insucessos = totais(insucessos)
+
+    df = pd.DataFrame({
+        "Data": intercalar(textos_dias[indices_dias], "Total", object),
+        "Motorista": np.repeat(nomes, tamanhos + 1),
+        "Tipo de Veículo": np.repeat(tipos, tamanhos + 1),
+        "Entregues": intercalar(entregues, total_entregues, np.int64),
+        "Insucessos": intercalar(insucessos, total_insucessos, np.int64),
+        "Valor Entregas": reais(valor_entregas, total_entregues * valor_entrega),
+        "Descontos": reais(descontos, total_insucessos * valor_entrega),
+        "Acréscimo Calculado": reais(acrescimo_calculado, 0),
+        "Acréscimo Pago": reais(acrescimos, totais(acrescimos)),
+        "Recebido": formulas,
+        "Total Dia": formulas,
+        "Bônus": reais(bonus_valor, totais(bonus_valor)),
+        "Diferença": formulas,
+    }, columns=COLUNAS_FECHAMENTO)
+
+    inicio = 0
+    for (posicao, nome_final, _), fim in zip(encontrados, fins.tolist()):
+        resultados[posicao] = (nome_final, df.iloc[inicio:fim].reset_index(drop=True))
+        inicio = fim
+    return resultados
+
 # Calcula fechamento do motorista
 def calcular_fechamento(nome_motorista, entregas_por_dia, acres_por_data, bonus_pago_dates):
-    nome_upper = nome_motorista.strip().upper()
-    nome_final = encontrar_nome_aproximado(nome_upper)
-    if not nome_final:
-        logging.warning(f"  Nome não encontrado na planilha de veículos para: {nome_motorista}")
-        return None, pd.DataFrame()
-    info = diarios_info[nome_final]
-    diaria, tipo_veiculo = info["diaria"], info["tipo"]
-
-    registros = []
-    total_rotas = 0.0
-    todas_datas = set(entregas_por_dia.keys()) | set(acres_por_data.keys())
-
-    for data in sorted(todas_datas):
-        entregues = entregas_por_dia.get(data, {"entregues": 0})["entregues"]
-        insucessos = entregas_por_dia.get(data, {"insucessos": 0})["insucessos"]
-        valor_entregas = entregues * VALOR_ENTREGA
-        descontos = insucessos * VALOR_ENTREGA
-        acres_pago = acres_por_data.get(data, 0.0)
-        acrescimo_calculado = max(0.0, diaria - valor_entregas - descontos)
-        total_dia = valor_entregas + acres_pago
-        total_rotas += total_dia
-        bonus_val = BONUS_DIARIO if data in bonus_pago_dates else 0
-
-        # Calcular o valor "Recebido"
-        # Valor Entregas + Acréscimo Calculado (sem descontos)
-        recebido = valor_entregas + acrescimo_calculado
-
-        registros.append({
-            "Data": data.strftime("%d/%m/%Y"),
-            "Motorista": nome_final,
-            "Tipo de Veículo": tipo_veiculo,
-            "Entregues": entregues,
-            "Insucessos": insucessos,
-            "Valor Entregas": valor_entregas,
-            "Descontos": descontos,
-            "Acréscimo Calculado": acrescimo_calculado,
-            "Acréscimo Pago": acres_pago,
-            "Recebido": None,  # SERÁ PREENCHIDA COM FÓRMULA EXCEL: =Valor_Entregas + Acréscimo_Calculado
-            "Total Dia": None,  # SERÁ PREENCHIDA COM FÓRMULA EXCEL: =Valor_Entregas + Acréscimo_Pago - Descontos
-            "Bônus": bonus_val,
-            "Diferença": None  # NOVA COLUNA: Será preenchida com fórmula Excel posteriormente
-        })
-
-    # Calcular totais para a linha "Total" incluindo a coluna "Recebido"
-    total_valor_entregas = sum(v["entregues"] for v in entregas_por_dia.values()) * VALOR_ENTREGA
-    total_descontos = sum(v["insucessos"] for v in entregas_por_dia.values()) * VALOR_ENTREGA
-    total_acrescimo_calculado = 0.0  # Sempre 0 na linha de total
-    total_recebido = total_valor_entregas + total_acrescimo_calculado  # CORRIGIDO: Sem descontos
-
-    registros.append({
-        "Data": "Total",
-        "Motorista": nome_final,
-        "Tipo de Veículo": tipo_veiculo,
-        "Entregues": sum(v["entregues"] for v in entregas_por_dia.values()),
-        "Insucessos": sum(v["insucessos"] for v in entregas_por_dia.values()),
-        "Valor Entregas": total_valor_entregas,
-        "Descontos": total_descontos,
-        "Acréscimo Calculado": total_acrescimo_calculado,
-        "Acréscimo Pago": sum(acres_por_data.values()),
-        "Recebido": None,  # SERÁ PREENCHIDA COM FÓRMULA EXCEL: =Valor_Entregas + Acréscimo_Calculado
-        "Total Dia": None,  # SERÁ PREENCHIDA COM FÓRMULA EXCEL: =Valor_Entregas + Acréscimo_Pago - Descontos
-        "Bônus": len([d for d in todas_datas if d in bonus_pago_dates]) * BONUS_DIARIO,
-        "Diferença": None  # NOVA COLUNA: Será preenchida com fórmula Excel posteriormente
+    registros = RegistrosMotorista.da_extracao(nome_motorista, entregas_por_dia, acres_por_data, bonus_pago_dates)
+    return calcular_fechamentos([(nome_motorista, registros)])[0]
+
+# Abas de resumo da frota, gravadas antes das abas dos motoristas
+ABA_RESUMO = "Resumo"
+ABA_RESUMO_DIAS = "Resumo por Dia"
+COLUNAS_SOMADAS_RESUMO = ["Entregues", "Insucessos", "Valor Entregas", "Descontos", "Acréscimo Calculado", "Acréscimo Pago",
+                          "Recebido", "Total Dia", "Bônus", "Diferença"]
+COLUNAS_REAIS_RESUMO = ["Valor Entregas", "Descontos", "Acréscimo Calculado", "Acréscimo Pago", "Recebido", "Total Dia", "Bônus", "Diferença"]
+
+# Linhas de dia (sem a linha "Total") de todos os fechamentos numa única tabela, com os valores em centavos
+# e Recebido, Total Dia e Diferença calculados com as mesmas regras das fórmulas das abas; None se não há dias
+def valores_por_dia(fechamentos):
+    import pandas as pd
+
+    partes = [df_fechamento[df_fechamento["Data"] != "Total"].assign(Motorista=motorista)
+              for motorista, df_fechamento in fechamentos if not df_fechamento.empty]
+    dias = pd.concat(partes, ignore_index=True) if partes else pd.DataFrame(columns=COLUNAS_FECHAMENTO)
+    if dias.empty:
+        return None
+
+    valores = pd.DataFrame({
+        "Motorista": dias["Motorista"],
+        "Tipo de Veículo": dias["Tipo de Veículo"],
+        "Data": dias["Data"],
+        "Entregues": dias["Entregues"].astype("int64"),
+        "Insucessos": dias["Insucessos"].astype("int64"),
     })
+    for coluna in ["Valor Entregas", "Descontos", "Acréscimo Calculado", "Acréscimo Pago", "Bônus"]:
+        valores[coluna] = (dias[coluna].astype(float) * 100).round().astype("int64")
+    valores["Recebido"] = valores["Valor Entregas"] + valores["Acréscimo Calculado"]
+    valores["Total Dia"] = valores["Valor Entregas"] + valores["Acréscimo Pago"]
+    valores["Diferença"] = valores["Recebido"] - valores["Total Dia"]
+    return valores
+
+# Resumo da frota a partir dos fechamentos de todos os motoristas: uma linha por motorista e uma por dia,
+# cada tabela seguida da linha "Total". As linhas de dia de todas as abas são agrupadas uma única vez e
+# somadas em centavos (na linha "Total" das abas o Acréscimo Calculado é 0, no resumo é a soma dos dias)
+def calcular_resumo(fechamentos):
+    import pandas as pd
+
+    colunas_motoristas = ["Motorista", "Tipo de Veículo", "Dias"] + COLUNAS_SOMADAS_RESUMO
+    colunas_dias = ["Data", "Motoristas"] + COLUNAS_SOMADAS_RESUMO
+    valores = valores_por_dia(fechamentos)
+    if valores is None:
+        return pd.DataFrame(columns=colunas_motoristas), pd.DataFrame(columns=colunas_dias)
+
+    por_motorista = valores.groupby("Motorista", sort=False).agg(
+        **{"Tipo de Veículo": ("Tipo de Veículo", "first"), "Dias": ("Data", "size")},
+        **{coluna: (coluna, "sum") for coluna in COLUNAS_SOMADAS_RESUMO},
+    ).reset_index()
+    por_dia = valores.groupby("Data", sort=False).agg(
+        Motoristas=("Motorista", "nunique"),
+        **{coluna: (coluna, "sum") for coluna in COLUNAS_SOMADAS_RESUMO},
+    ).reset_index()
+    por_dia = por_dia.iloc[pd.to_datetime(por_dia["Data"], format="%d/%m/%Y").argsort(kind="stable")]
+
+    totais = valores[COLUNAS_SOMADAS_RESUMO].sum()
+    por_motorista.loc[len(por_motorista)] = {"Motorista": "Total", "Tipo de Veículo": None, "Dias": len(valores), **totais}
+    por_dia = pd.concat([por_dia, pd.DataFrame([{"Data": "Total", "Motoristas": valores["Motorista"].nunique(), **totais}])], ignore_index=True)
+
+    for tabela in (por_motorista, por_dia):
+        tabela[COLUNAS_REAIS_RESUMO] = tabela[COLUNAS_REAIS_RESUMO].astype("int64") / 100
+    return por_motorista[colunas_motoristas], por_dia[colunas_dias]
+
+# Exportação colunar do fechamento (--export): uma linha por motorista e dia, com os valores das
+# colunas de fórmula já calculados e a data como data, em um único arquivo ordenado pela partição
+# (motorista ou data). No Parquet cada motorista (ou data) ocupa o seu próprio grupo de linhas, então
+# quem lê pode filtrar uma partição sem ler o resto do arquivo
+FORMATOS_EXPORTACAO = ["parquet", "csv"]
+PARTICOES_EXPORTACAO = ["motorista", "data"]
+
+def caminho_exportacao(caminho_saida, formato):
+    return f"{os.path.splitext(caminho_saida)[0]}.{formato}"
+
+def montar_exportacao(fechamentos, particao="motorista"):
+    import numpy as np
+    import pandas as pd
 
-    df = pd.DataFrame(registros)
-    return nome_final, df
+    valores = valores_por_dia(fechamentos)
+    if valores is None:
+        return pd.DataFrame(columns=COLUNAS_FECHAMENTO)
+    datas = pd.to_datetime(valores["Data"], format="%d/%m/%Y")
+    # Motoristas na ordem das abas; dentro de cada partição, a outra chave em ordem
+    motoristas = pd.factorize(valores["Motorista"])[0]
+    chaves = (motoristas, datas.to_numpy().astype("int64"))
+    ordem = np.lexsort(chaves if particao == "data" else chaves[::-1])
+
+    registros = valores.assign(Data=datas.dt.date)
+    registros[COLUNAS_REAIS_RESUMO] = registros[COLUNAS_REAIS_RESUMO] / 100
+    return registros.iloc[ordem][COLUNAS_FECHAMENTO].reset_index(drop=True)
+
+def exportar_fechamento(caminho, fechamentos, formato="parquet", particao="motorista"):
+    registros = montar_exportacao(fechamentos, particao)
+    temporario = f"{caminho}.{os.getpid()}.tmp"
+    try:
+        if formato == "csv":
+            registros.to_csv(temporario, index=False, encoding="utf-8")
+        else:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            tabela = pa.Table.from_pandas(registros, preserve_index=False)
+            chave = registros["Data" if particao == "data" else "Motorista"]
+            inicios = [0] + (chave.ne(chave.shift()).to_numpy().nonzero()[0][1:]).tolist() + [len(registros)]
+            with pq.ParquetWriter(temporario, tabela.schema) as writer:
+                for inicio, fim in zip(inicios, inicios[1:]):
+                    writer.write_table(tabela.slice(inicio, fim - inicio))
+        os.replace(temporario, caminho)
+    finally:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+    return len(registros)
+
+# Estilo do cabeçalho e da linha "Total" das abas do fechamento (fundo azul claro)
+ESTILO_DESTAQUE = "Fechamento Destaque"
+COR_DESTAQUE = "ADD8E6"  # LightBlue
+
+# Escreve o fechamento no Excel com um workbook write-only do openpyxl
+# fechamentos: pares (motorista, DataFrame de calcular_fechamento), uma aba por motorista.
+# Cada aba é gravada linha a linha em disco, com as fórmulas e o destaque definidos na própria linha,
+# então a memória não cresce com o número de abas e a planilha não precisa ser relida
+# resumos: pares (nome da aba, DataFrame) gravados antes das abas dos motoristas, só com valores
+def escrever_fechamento(caminho_saida, fechamentos, resumos=()):
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import NamedStyle, PatternFill
+    from openpyxl.utils import get_column_letter
+
+    book = Workbook(write_only=True)
+    book.add_named_style(NamedStyle(name=ESTILO_DESTAQUE, fill=PatternFill(start_color=COR_DESTAQUE, end_color=COR_DESTAQUE, fill_type="solid")))
+
+    def destacar(ws, valores):
+        celulas = []
+        for valor in valores:
+            celula = WriteOnlyCell(ws, value=valor)
+            celula.style = ESTILO_DESTAQUE
+            celulas.append(celula)
+        return celulas
+
+    # Abas de resumo: valores prontos, sem fórmulas; cabeçalho e linha "Total" destacados
+    for nome_aba, df_resumo in resumos:
+        ws = book.create_sheet(nome_aba[:31])
+        ws.append(destacar(ws, df_resumo.columns.tolist()))
+        for valores in zip(*(df_resumo[col_name].tolist() for col_name in df_resumo.columns)):
+            ws.append(destacar(ws, valores) if valores[0] == "Total" else list(valores))
+        ws.close()
+
+    abas = 0
+    for motorista, df_novo in fechamentos:
+        sheet_name = motorista[:31] # Limita o nome da aba para 31 caracteres
+        ws = book.create_sheet(sheet_name)
+        abas += 1
+
+        # Posições das colunas usadas nas fórmulas Excel
+        colunas = df_novo.columns.tolist()
+        posicao = {col_name: idx for idx, col_name in enumerate(colunas)}
+        colunas_formulas = ["Valor Entregas", "Descontos", "Acréscimo Calculado", "Acréscimo Pago", "Recebido", "Total Dia", "Diferença"]
+        aplicar_formulas = all(col_name in posicao for col_name in colunas_formulas)
+        if aplicar_formulas:
+            letra = {col_name: get_column_letter(posicao[col_name] + 1) for col_name in colunas_formulas}
+
+        # Cabeçalho
+        ws.append(destacar(ws, colunas))
+
+        # Dados; a primeira linha "Total" recebe o mesmo destaque do cabeçalho
+        total_destacado = False
+        linhas = zip(*(df_novo[col_name].tolist() for col_name in colunas)) if colunas else ()
+        for row_num, valores in enumerate(linhas, start=2):
+            valores = list(valores)
+            if aplicar_formulas:
+                # FÓRMULA 1: Recebido = Valor Entregas + Acréscimo Calculado
+                valores[posicao["Recebido"]] = f"={letra['Valor Entregas']}{row_num}+{letra['Acréscimo Calculado']}{row_num}"
+                # FÓRMULA 2: Total Dia = Valor Entregas + Acréscimo Pago
+                valores[posicao["Total Dia"]] = f"={letra['Valor Entregas']}{row_num}+{letra['Acréscimo Pago']}{row_num}"
+                # FÓRMULA 3: Diferença = Recebido - Total Dia
+                valores[posicao["Diferença"]] = f"={letra['Recebido']}{row_num}-{letra['Total Dia']}{row_num}"
+
+            if not total_destacado and valores and valores[0] == "Total":
+                ws.append(destacar(ws, valores))
+                total_destacado = True
+            else:
+                ws.append(valores)
+
+        # Fecha o XML da aba já no arquivo temporário; só a compactação fica para o save()
+        ws.close()
+
+        if aplicar_formulas:
+            logging.debug("    Fórmulas Excel aplicadas na aba %s: Recebido, Total Dia e Diferença", sheet_name)
+        else:
+            logging.warning(f"    Não foi possível aplicar fórmulas na aba {sheet_name} - algumas colunas não encontradas")
+
+    # O openpyxl gravaria um arquivo sem abas, que o Excel não abre
+    if not abas:
+        raise ValueError("Nenhum motorista com fechamento para gravar")
+    book.save(caminho_saida)
+
+# Manifesto do modo incremental (--incremental), gravado ao lado da planilha de saída
+# Para cada grupo de PDFs (aba do fechamento) guarda a impressão digital dos arquivos, o motorista
+# encontrado na planilha de veículos com a sua linha (diária e tipo) e as linhas calculadas da aba.
+# Um grupo só é extraído e recalculado de novo se um desses itens mudou; os demais são regravados
+# a partir do manifesto. Mudanças nos parâmetros do cálculo invalidam o manifesto inteiro
+MANIFESTO_VERSAO = 3
+
+def caminho_manifesto(caminho_saida):
+    return f"{caminho_saida}.manifesto.json"
+
+class ManifestoFechamento:
+    def __init__(self, caminho, parametros):
+        self.caminho = caminho
+        self.parametros = parametros
+        self.anterior = {}
+        self.grupos = {}
+        self.impressoes = {}
+
+    def carregar(self):
+        try:
+            with open(self.caminho, "r", encoding="utf-8") as f:
+                dados = json.load(f)
+        except FileNotFoundError:
+            logging.info("Modo incremental: manifesto não encontrado; todos os motoristas serão processados")
+            return
+        except (OSError, ValueError) as e:
+            logging.warning(f"Aviso: Manifesto incremental {self.caminho} ilegível ({e}); todos os motoristas serão processados")
+            return
+        if dados.get("versao") != MANIFESTO_VERSAO or dados.get("parametros") != self.parametros:
+            logging.info("Modo incremental: parâmetros do fechamento mudaram; todos os motoristas serão processados")
+            return
+        self.anterior = dados.get("grupos", {})
+
+    # Impressão digital do arquivo; o SHA-256 anterior é reaproveitado se tamanho e data de modificação não mudaram
+    def _impressao(self, caminho_pdf, anteriores):
+        tamanho, mtime_ns = assinatura_pdf(caminho_pdf)
+        anterior = anteriores.get(os.path.basename(caminho_pdf))
+        if anterior and anterior["tamanho"] == tamanho and anterior["mtime_ns"] == mtime_ns:
+            sha = anterior["sha256"]
+        else:
+            sha = hash_arquivo(caminho_pdf)
+        return {"tamanho": tamanho, "mtime_ns": mtime_ns, "sha256": sha}
+
+    # Devolve a entrada do manifesto se o grupo não mudou desde a última execução, senão None
+    def reaproveitar(self, nome_base, caminhos_pdfs):
+        entrada = self.anterior.get(nome_base)
+        anteriores = {arquivo["nome"]: arquivo for arquivo in entrada["arquivos"]} if entrada else {}
+        try:
+            for caminho_pdf in caminhos_pdfs:
+                self.impressoes[caminho_pdf] = self._impressao(caminho_pdf, anteriores)
+        except OSError:
+            return None  # Arquivo ilegível: a própria extração registra o erro
+        if not entrada:
+            return None
+
+        arquivos = [(os.path.basename(caminho_pdf), self.impressoes[caminho_pdf]["sha256"]) for caminho_pdf in caminhos_pdfs]
+        if arquivos != [(arquivo["nome"], arquivo["sha256"]) for arquivo in entrada["arquivos"]]:
+            return None
+        # A linha da planilha de veículos, ou o próprio motorista encontrado para o nome do PDF, pode ter mudado
+        nome_final = encontrar_nome_aproximado(entrada["nome_pdf"].strip().upper())
+        if nome_final != entrada["motorista"] or diarios_info.get(nome_final) != entrada["planilha"]:
+            return None
+        return entrada
+
+    def registrar(self, nome_base, caminhos_pdfs, nome_pdf, nome_final, df_fechamento):
+        arquivos = []
+        for caminho_pdf in caminhos_pdfs:
+            impressao = self.impressoes.get(caminho_pdf)
+            if impressao is None:
+                return  # Sem impressão digital o grupo será processado de novo na próxima execução
+            arquivos.append({"nome": os.path.basename(caminho_pdf), **impressao})
+        self.grupos[nome_base] = {
+            "arquivos": arquivos,
+            "nome_pdf": nome_pdf,
+            "motorista": nome_final,
+            "planilha": diarios_info[nome_final],
+            "colunas": df_fechamento.columns.tolist(),
+            "linhas": df_fechamento.values.tolist(),
+        }
+
+    def reaproveitado(self, nome_base, entrada):
+        self.grupos[nome_base] = entrada
+
+    def salvar(self):
+        dados = {"versao": MANIFESTO_VERSAO, "parametros": self.parametros, "grupos": self.grupos}
+        temporario = f"{self.caminho}.{os.getpid()}.tmp"
+        try:
+            with open(temporario, "w", encoding="utf-8") as f:
+                json.dump(dados, f, ensure_ascii=False)
+            os.replace(temporario, self.caminho)
+        except (OSError, TypeError, ValueError) as e:
+            # A planilha já foi gravada: a falha do manifesto só faz a próxima execução reprocessar tudo
+            logging.warning(f"Aviso: Não foi possível gravar o manifesto incremental {self.caminho}: {e}")
+            try:
+                os.remove(temporario)
+            except OSError:
+                pass
+
+# Base SQLite de registros (--store): os registros por dia de cada PDF extraído ficam guardados entre
+# os fechamentos, para consultas históricas e para fechar qualquer período (--from-store) sem ler os PDFs
+# Cada PDF entra uma vez, pelo SHA-256 do conteúdo. As datas ficam como texto AAAA-MM-DD e o acréscimo em
+# centavos; os índices por motorista e data e por data atendem às consultas de um período
+# Os registros de um PDF dependem das páginas dele que se repetem em outros PDFs do motorista, então cada
+# extração fica guardada com a chave das páginas repetidas ("" para o PDF inteiro) e a base guarda a
+# impressão de cada página. A cada gravação as páginas repetidas de cada motorista são calculadas
+# de novo sobre todos os PDFs dele na base, e pdfs.repetidas aponta a extração que vale; a visão registros
+# mostra só essas extrações. Na versão 3 a impressão das páginas deixou de contar a hora e o contador da impressão
+BASE_VERSAO = 3
+ESQUEMA_BASE = """
+CREATE TABLE IF NOT EXISTS pdfs (
+    sha256 TEXT PRIMARY KEY,
+    arquivo TEXT NOT NULL,
+    grupo TEXT NOT NULL,
+    motorista TEXT NOT NULL,
+    gravado_em TEXT NOT NULL,
+    repetidas TEXT NOT NULL DEFAULT ''
+);
+CREATE TABLE IF NOT EXISTS paginas (
+    sha256 TEXT NOT NULL REFERENCES pdfs (sha256),
+    indice INTEGER NOT NULL,
+    impressao TEXT,
+    PRIMARY KEY (sha256, indice)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS extracoes (
+    sha256 TEXT NOT NULL REFERENCES pdfs (sha256),
+    repetidas TEXT NOT NULL,
+    PRIMARY KEY (sha256, repetidas)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS registros_extracao (
+    sha256 TEXT NOT NULL,
+    repetidas TEXT NOT NULL,
+    data TEXT NOT NULL,
+    motorista TEXT NOT NULL,
+    entregues INTEGER NOT NULL,
+    insucessos INTEGER NOT NULL,
+    acrescimo_centavos INTEGER NOT NULL,
+    bonus INTEGER NOT NULL,
+    movimento INTEGER NOT NULL,
+    PRIMARY KEY (sha256, repetidas, data),
+    FOREIGN KEY (sha256, repetidas) REFERENCES extracoes (sha256, repetidas)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS registros_motorista_data ON registros_extracao (motorista, data);
+CREATE INDEX IF NOT EXISTS registros_data ON registros_extracao (data);
+CREATE VIEW IF NOT EXISTS registros AS
+    SELECT r.sha256, r.data, r.motorista, r.entregues, r.insucessos, r.acrescimo_centavos, r.bonus, r.movimento
+    FROM registros_extracao r JOIN pdfs p ON p.sha256 = r.sha256 AND p.repetidas = r.repetidas;
+"""
+
+class BaseRegistros:
+    def __init__(self, caminho):
+        import sqlite3
+
+        self.caminho = caminho
+        self.conexao = sqlite3.connect(caminho)
+        try:
+            versao = self.conexao.execute("PRAGMA user_version").fetchone()[0]
+            if versao not in (0, BASE_VERSAO):
+                raise sqlite3.DatabaseError(f"versão {versao} da base não suportada (esperada {BASE_VERSAO}); "
+                                            f"grave os PDFs em uma base nova")
+            self.conexao.executescript(ESQUEMA_BASE)
+            self.conexao.execute(f"PRAGMA user_version = {BASE_VERSAO}")
+        except sqlite3.DatabaseError:
+            self.conexao.close()
+            raise
+
+    def fechar(self):
+        self.conexao.close()
+
+    # pdfs: lista de (sha256, caminho do PDF, grupo, impressões das páginas, {chave das páginas repetidas:
+    # RegistrosMotorista}); tudo em uma transação. Gravar de novo a mesma extração de um PDF substitui os
+    # registros dela; as outras extrações do PDF continuam na base
+    def gravar(self, pdfs):
+        gravado_em = datetime.now().isoformat(timespec="seconds")
+        grupos = set()
+        with self.conexao:
+            for sha, caminho_pdf, grupo, impressoes, extracoes in pdfs:
+                nome = next(iter(extracoes.values())).nome
+                # O grupo anterior do PDF (arquivo renomeado) também tem as suas páginas repetidas recalculadas
+                grupos.update(grupo_anterior for (grupo_anterior,) in self.conexao.execute("SELECT grupo FROM pdfs WHERE sha256 = ?", (sha,)))
+                self.conexao.execute(
+                    "INSERT INTO pdfs (sha256, arquivo, grupo, motorista, gravado_em) VALUES (?, ?, ?, ?, ?) "
+                    "ON CONFLICT (sha256) DO UPDATE SET arquivo = excluded.arquivo, grupo = excluded.grupo, "
+                    "motorista = excluded.motorista, gravado_em = excluded.gravado_em",
+                    (sha, os.path.basename(caminho_pdf), grupo, nome, gravado_em))
+                self.conexao.execute("DELETE FROM paginas WHERE sha256 = ?", (sha,))
+                self.conexao.executemany("INSERT INTO paginas VALUES (?, ?, ?)",
+                                         ((sha, indice, impressao) for indice, impressao in enumerate(impressoes)))
+                for chave, registros in extracoes.items():
+                    self.conexao.execute("DELETE FROM registros_extracao WHERE sha256 = ? AND repetidas = ?", (sha, chave))
+                    self.conexao.execute("INSERT OR IGNORE INTO extracoes VALUES (?, ?)", (sha, chave))
+                    self.conexao.executemany(
+                        "INSERT INTO registros_extracao VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        zip([sha] * len(registros.dias), [chave] * len(registros.dias),
+                            [date.fromordinal(dia).isoformat() for dia in registros.dias.tolist()],
+                            [registros.nome] * len(registros.dias), registros.entregues.tolist(), registros.insucessos.tolist(),
+                            registros.acrescimos.tolist(), registros.bonus.tolist(), registros.movimento.tolist()))
+                grupos.add(grupo)
+            for grupo in sorted(grupos):
+                self._escolher_extracoes(grupo)
+
+    # Calcula as páginas repetidas de todos os PDFs do grupo na base e aponta em pdfs.repetidas a extração
+    # de cada um. Sem a extração exata (PDFs sobrepostos gravados em execuções diferentes), vale a que desconta
+    # mais páginas sem descontar nenhuma a mais, e as páginas que sobram são somadas com um aviso. Se todas
+    # descontam páginas a mais (PDF gravado antes com outros PDFs, em outro grupo), vale a que desconta menos
+    def _escolher_extracoes(self, grupo):
+        pdfs = self.conexao.execute("SELECT sha256, arquivo FROM pdfs WHERE grupo = ?", (grupo,)).fetchall()
+        pdfs.sort(key=lambda pdf: ordem_repetidas(pdf[1], pdf[0]))
+        impressoes = defaultdict(list)
+        extracoes = defaultdict(dict)
+        for sha, impressao in self.conexao.execute(
+                "SELECT g.sha256, g.impressao FROM paginas g JOIN pdfs p ON p.sha256 = g.sha256 WHERE p.grupo = ? "
+                "ORDER BY g.sha256, g.indice", (grupo,)):
+            impressoes[sha].append(impressao)
+        for sha, chave in self.conexao.execute(
+                "SELECT e.sha256, e.repetidas FROM extracoes e JOIN pdfs p ON p.sha256 = e.sha256 WHERE p.grupo = ?", (grupo,)):
+            extracoes[sha][frozenset(int(indice) for indice in chave.split(",") if indice)] = chave
+
+        repetidas = marcar_repetidas((sha, impressoes[sha]) for sha, _ in pdfs)
+        for sha, arquivo in pdfs:
+            necessarias = repetidas.get(sha, frozenset())
+            possiveis = [indices for indices in extracoes[sha] if indices <= necessarias]
+            if not possiveis:
+                escolhidas = min(extracoes[sha], key=lambda indices: (len(indices - necessarias), -len(indices & necessarias)))
+                logging.warning(f"Aviso: {len(escolhidas - necessarias)} páginas do PDF {arquivo} não repetem nenhum outro PDF "
+                                f"do motorista na base {self.caminho}, mas ficam de fora; grave o PDF de novo com os PDFs "
+                                f"do motorista (--store) para somá-las")
+                self.conexao.execute("UPDATE pdfs SET repetidas = ? WHERE sha256 = ?", (extracoes[sha][escolhidas], sha))
+                continue
+            escolhidas = max(possiveis, key=len)
+            if escolhidas != necessarias:
+                logging.warning(f"Aviso: {len(necessarias - escolhidas)} páginas do PDF {arquivo} repetem páginas de outro PDF "
+                                f"do motorista na base {self.caminho}, mas continuam somadas; grave os PDFs do motorista "
+                                f"juntos (--store) para descontá-las")
+            self.conexao.execute("UPDATE pdfs SET repetidas = ? WHERE sha256 = ?", (extracoes[sha][escolhidas], sha))
+
+    # Motoristas da base cujo nome (sem acentos e maiúsculas) é um dos informados
+    def motoristas(self, nomes):
+        procurados = {normalize(nome).strip() for nome in nomes}
+        return [motorista for (motorista,) in self.conexao.execute("SELECT DISTINCT motorista FROM pdfs ORDER BY motorista")
+                if normalize(motorista).strip() in procurados]
+
+    # Registros dos dias inicio..fim (datas ou None para sem limite) dos motoristas informados (None: todos),
+    # na extração que vale de cada PDF. Devolve {grupo: [RegistrosMotorista de cada PDF]}, com os grupos em
+    # ordem alfabética
+    def consultar(self, inicio=None, fim=None, motoristas=None):
+        import numpy as np
+
+        condicoes = ["r.data BETWEEN ? AND ?"]
+        parametros = [(inicio or date.min).isoformat(), (fim or date.max).isoformat()]
+        if motoristas is not None:
+            condicoes.append(f"r.motorista IN ({', '.join('?' * len(motoristas))})")
+            parametros.extend(motoristas)
+        linhas = self.conexao.execute(
+            "SELECT p.grupo, p.sha256, p.motorista, r.data, r.entregues, r.insucessos, r.acrescimo_centavos, r.bonus, r.movimento "
+            f"FROM registros r JOIN pdfs p ON p.sha256 = r.sha256 WHERE {' AND '.join(condicoes)} "
+            "ORDER BY p.grupo, p.arquivo, p.sha256, r.data", parametros).fetchall()
+
+        grupos = defaultdict(list)
+        for (grupo, _, motorista), linhas_pdf in groupby(linhas, key=lambda linha: linha[:3]):
+            _, _, _, datas, entregues, insucessos, acrescimos, bonus, movimento = zip(*linhas_pdf)
+            grupos[grupo].append(RegistrosMotorista(
+                motorista,
+                np.fromiter((date.fromisoformat(data).toordinal() for data in datas), np.int64, len(datas)),
+                np.array(entregues, np.int64), np.array(insucessos, np.int64), np.array(acrescimos, np.int64),
+                np.array(bonus, bool), np.array(movimento, bool),
+            ))
+        return dict(grupos)
+
+# Relatório da execução: tempo de cada etapa de main(), métricas de cada PDF extraído e totais de vazão
+# Os tempos de CPU da execução são do processo principal; com --workers, a CPU gasta nos processos
+# filhos aparece nas métricas de cada PDF (e somada em resumo.cpu_pdfs_s)
+def montar_relatorio_execucao(tempos_execucao, parede_total, cpu_total):
+    pdfs = list(metricas_pdfs.values())
+    etapas_pdfs = TemposEtapas()
+    for metricas in pdfs:
+        for etapa, tempo in metricas["etapas"].items():
+            etapas_pdfs.parede[etapa] += tempo["parede_s"]
+            etapas_pdfs.cpu[etapa] += tempo["cpu_s"]
+
+    paginas = sum(metricas["paginas"] for metricas in pdfs)
+    tamanho = sum(metricas["bytes"] or 0 for metricas in pdfs)
+    extracao_s = tempos_execucao.parede.get("extracao", 0.0)
+    return {
+        "versao": 1,
+        "gerado_em": datetime.now().isoformat(timespec="seconds"),
+        "parametros": {
+            "workers": WORKERS,
+            "backend": BACKEND_PDF,
+            "cache": USAR_CACHE and not FORCAR_TABELAS,
+            "forcar_tabelas": FORCAR_TABELAS,
+            "incremental": INCREMENTAL,
+            "tempo_limite_pdf": TEMPO_LIMITE_PDF,
+            "memoria_pdf_mb": MEMORIA_PDF_MB,
+            "tarefas_por_processo": TAREFAS_POR_PROCESSO,
+            "base_registros": bool(BASE_REGISTROS),
+            "fechamento_da_base": FECHAR_DA_BASE,
+        },
+        "total": {"parede_s": round(parede_total, 4), "cpu_s": round(cpu_total, 4)},
+        "etapas": tempos_execucao.como_dict(),
+        "etapas_pdfs": etapas_pdfs.como_dict(),
+        "resumo": {
+            "pdfs_extraidos": len(pdfs),
+            "pdfs_do_cache": estatisticas_extracao["pdfs_do_cache"],
+            "paginas": paginas,
+            "linhas": sum(metricas["linhas"] for metricas in pdfs),
+            "bytes": tamanho,
+            "cpu_pdfs_s": round(sum(metricas["cpu_s"] for metricas in pdfs), 4),
+            "pdfs_em_trechos": sum(1 for metricas in pdfs if metricas.get("trechos")),
+            "trechos_reanalisados": estatisticas_extracao["trechos_reanalisados"],
+            "pdfs_identicos": estatisticas_extracao["pdfs_identicos"],
+            "paginas_repetidas": estatisticas_extracao["paginas_repetidas"],
+            "pdfs_ignorados": estatisticas_extracao["pdfs_ignorados"],
+            "tarefas_tempo_esgotado": estatisticas_extracao["tarefas_tempo_esgotado"],
+            "processos_perdidos": estatisticas_extracao["processos_perdidos"],
+            "processos_iniciados": estatisticas_extracao["processos_iniciados"],
+            "paginas_por_s": round(paginas / extracao_s, 2) if extracao_s else None,
+            "mb_por_s": round(tamanho / 2**20 / extracao_s, 3) if extracao_s else None,
+        },
+        "pdfs": pdfs,
+    }
+
+# Resumo compacto do relatório no console: tempo por etapa e os PDFs mais lentos
+def resumir_execucao(relatorio):
+    etapas = ", ".join(f"{etapa} {tempo['parede_s']:.2f} s" for etapa, tempo in relatorio["etapas"].items())
+    logging.info(f"Tempo total: {relatorio['total']['parede_s']:.2f} s ({etapas})")
+
+    mais_lentos = sorted(relatorio["pdfs"], key=lambda metricas: metricas["parede_s"], reverse=True)[:PDFS_MAIS_LENTOS]
+    if mais_lentos:
+        descricoes = []
+        for metricas in mais_lentos:
+            etapas_pdf = ", ".join(f"{etapa} {tempo['parede_s']:.2f} s" for etapa, tempo in metricas["etapas"].items())
+            descricoes.append(f"{metricas['arquivo']} {metricas['parede_s']:.2f} s ({metricas['paginas']} páginas; {etapas_pdf})")
+        logging.info("PDFs mais lentos: " + "; ".join(descricoes))
+
+# Lê o config.ini e os argumentos de linha de comando e carrega a planilha de tipos de veículos
+# Chamada uma vez no início da execução, antes de main(); argv=None usa sys.argv
+def configurar(argv=None):
+    global PASTA_PDFS, PLANILHA_TIPO, SAIDA_EXCEL, ERROR_REPORT_FILE, WORKERS, USAR_CACHE, RECONSTRUIR_CACHE
+    global PASTA_CACHE, CACHE_TAMANHO_MAXIMO, FORCAR_TABELAS, BACKEND_PDF, INCREMENTAL, VALOR_ENTREGA, BONUS_DIARIO
+    global RELATORIO_EXECUCAO, EXPORTACAO, ARQUIVO_EXPORTACAO, PARTICAO_EXPORTACAO
+    global BASE_REGISTROS, FECHAR_DA_BASE, PERIODO_INICIO, PERIODO_FIM, MOTORISTAS_BASE
+    global TEMPO_LIMITE_PDF, MEMORIA_PDF_MB, TAREFAS_POR_PROCESSO
+    global diarios_info, indice_nomes
+
+    configurar_logging()
+
+    # Carrega configurações do arquivo config.ini
+    config = configparser.ConfigParser()
+    config.read("config.ini")
+
+    args = criar_parser().parse_args(argv)
+    if args.verbose:
+        logging.getLogger().setLevel(logging.DEBUG)
+
+    # Caminhos (prioriza argumentos de linha de comando)
+    PASTA_PDFS = args.pdfs_folder if args.pdfs_folder else config["Paths"]["pdfs_folder"]
+    PLANILHA_TIPO = args.type_sheet if args.type_sheet else config["Paths"]["type_sheet"]
+    SAIDA_EXCEL = args.output_excel if args.output_excel else config["Paths"]["output_excel"]
+    ERROR_REPORT_FILE = args.error_report
+    WORKERS = max(1, args.workers)
+    USAR_CACHE = not args.no_cache
+    RECONSTRUIR_CACHE = args.rebuild_cache
+    PASTA_CACHE = args.cache_dir
+    CACHE_TAMANHO_MAXIMO = int(args.cache_max_mb * 1024 * 1024)
+    FORCAR_TABELAS = args.full_tables
+    BACKEND_PDF = args.pdf_backend
+    INCREMENTAL = args.incremental
+    RELATORIO_EXECUCAO = args.run_report
+    EXPORTACAO = args.export
+    ARQUIVO_EXPORTACAO = args.export_file
+    PARTICAO_EXPORTACAO = args.export_partition
+    # O Parquet depende do pyarrow, que é opcional; melhor avisar antes de ler os PDFs
+    if EXPORTACAO == "parquet":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            logging.error("Erro: --export parquet precisa do pacote pyarrow (pip install pyarrow); use --export csv para exportar sem ele.")
+            exit(1)
+    # Supervisão da extração: valores zero ou negativos desligam o limite
+    TEMPO_LIMITE_PDF = args.pdf_timeout if args.pdf_timeout and args.pdf_timeout > 0 else None
+    MEMORIA_PDF_MB = args.pdf_max_mb if args.pdf_max_mb and args.pdf_max_mb > 0 else None
+    TAREFAS_POR_PROCESSO = args.recycle_after if args.recycle_after and args.recycle_after > 0 else None
+    if MEMORIA_PDF_MB:
+        try:
+            import resource  # noqa: F401
+        except ImportError:
+            logging.warning("Aviso: --pdf-max-mb não é suportado neste sistema (só Linux e macOS) e foi ignorado.")
+            MEMORIA_PDF_MB = None
+    BASE_REGISTROS = args.store
+    FECHAR_DA_BASE = args.from_store
+    PERIODO_INICIO = args.since
+    PERIODO_FIM = args.until
+    MOTORISTAS_BASE = args.driver
+    if FECHAR_DA_BASE and not BASE_REGISTROS:
+        logging.error("Erro: --from-store precisa da base informada em --store.")
+        exit(1)
+    if (PERIODO_INICIO or PERIODO_FIM or MOTORISTAS_BASE) and not FECHAR_DA_BASE:
+        logging.error("Erro: --since, --until e --driver só valem para o fechamento a partir da base (--from-store).")
+        exit(1)
+    if FECHAR_DA_BASE and (INCREMENTAL or args.watch):
+        logging.error("Erro: --from-store não lê PDFs e não pode ser usado com --incremental ou --watch.")
+        exit(1)
+
+    # Valores fixos
+    VALOR_ENTREGA = float(config["Values"]["delivery_value"])
+    BONUS_DIARIO = float(config["Values"]["daily_bonus"])
+
+    # Leitura da planilha de tipos de veículos
+    try:
+        diarios_info = carregar_planilha_veiculos(PLANILHA_TIPO)
+    except FileNotFoundError:
+        logging.error(f"Erro: A planilha de tipos de veículos {PLANILHA_TIPO} não foi encontrada.")
+        exit(1)
+    except PlanilhaVeiculosInvalida as e:
+        logging.error(str(e))
+        exit(1)
+    except Exception as e:
+        logging.error(f"Erro ao ler a planilha de tipos de veículos: {e}")
+        exit(1)
+    indice_nomes = IndiceNomes(diarios_info)
+
+    return args
 
 def main():
+    import pandas as pd
+
+    # Tempos de cada etapa da execução e métricas por PDF para o relatório de execução
+    inicio_parede, inicio_cpu = time.perf_counter(), time.process_time()
+    tempos_execucao = TemposEtapas()
+    metricas_pdfs.clear()
+    estatisticas_extracao.clear()
+    # Avisos e erros vão para o relatório de erros assim que acontecem
+    relatorio_erros.abrir(ERROR_REPORT_FILE)
+
     # Dicionário para armazenar DataFrames por motorista
     fechamentos_consolidados = defaultdict(pd.DataFrame)
 
-    if not os.path.exists(PASTA_PDFS):
-        logging.error(f"Erro: A pasta de PDFs {PASTA_PDFS} não foi encontrada.")
-        exit(1)
+    # Base de registros (--store): recebe os registros extraídos e, com --from-store, é a origem do fechamento
+    base = None
+    if BASE_REGISTROS:
+        try:
+            base = BaseRegistros(BASE_REGISTROS)
+        except Exception as e:
+            logging.error(f"Erro: Não foi possível abrir a base de registros {BASE_REGISTROS}: {e}")
+            exit(1)
+
+    manifesto = None
+    grupos_reaproveitados = {}
+    if FECHAR_DA_BASE:
+        # Fechamento do período a partir da base, sem listar nem ler PDFs; cada grupo de PDFs vira uma aba
+        with tempos_execucao.medir("base"):
+            motoristas = None
+            if MOTORISTAS_BASE:
+                motoristas = base.motoristas(MOTORISTAS_BASE)
+                encontrados = {normalize(motorista).strip() for motorista in motoristas}
+                for nome in MOTORISTAS_BASE:
+                    if normalize(nome).strip() not in encontrados:
+                        logging.warning(f"Aviso: Motorista {nome} não encontrado na base de registros {BASE_REGISTROS}")
+            registros_base = base.consultar(PERIODO_INICIO, PERIODO_FIM, motoristas)
+        logging.info(f"Base de registros: {sum(len(registros) for registros in registros_base.values())} PDFs de "
+                     f"{len(registros_base)} motoristas no período")
+        pdf_files_grouped = {grupo: [] for grupo in registros_base}
+        grupos_calculados = []
+        for grupo, registros in registros_base.items():
+            motorista = RegistrosMotorista.consolidar(registros)
+            grupos_calculados.append((grupo, motorista.nome, motorista))
+    else:
+        if not os.path.exists(PASTA_PDFS):
+            logging.error(f"Erro: A pasta de PDFs {PASTA_PDFS} não foi encontrada.")
+            exit(1)
+
+        # Agrupar PDFs por nome base do motorista (ignorando sufixos numéricos)
+        # PASTA_PDFS pode ser uma pasta ou um pacote .zip/.tar, cujos PDFs são lidos sem extrair o pacote
+        pdf_files_grouped = defaultdict(list)
+        with tempos_execucao.medir("listagem"):
+            try:
+                pdfs_listados = listar_pdfs(PASTA_PDFS)
+            except OSError as e:
+                logging.error(f"Erro: Não foi possível ler os PDFs de {PASTA_PDFS}: {e}")
+                exit(1)
+            for nome_arquivo, caminho_pdf in pdfs_listados:
+                # Remove a extensão .pdf e qualquer sufixo numérico (ex: 2, 3) no final
+                nome_base = re.sub(r"\d*\.pdf$", "", nome_arquivo.lower())
+                nome_base = nome_base.replace(".pdf", "").strip()
+                pdf_files_grouped[nome_base].append(caminho_pdf)
+            # PDFs idênticos a outro (exportados de novo ou copiados duas vezes) não são lidos nem somados
+            pdf_files_grouped, _ = remover_pdfs_identicos(pdf_files_grouped)
+
+        # No modo incremental, os grupos sem mudança desde a última execução vêm do manifesto
+        if INCREMENTAL:
+            parametros = {
+                "pasta_pdfs": os.path.abspath(PASTA_PDFS),
+                "valor_entrega": VALOR_ENTREGA,
+                "bonus_diario": BONUS_DIARIO,
+                "extrator": EXTRATOR_VERSAO,
+                "backend": BACKEND_PDF,
+                "forcar_tabelas": FORCAR_TABELAS,
+            }
+            manifesto = ManifestoFechamento(caminho_manifesto(SAIDA_EXCEL), parametros)
+            with tempos_execucao.medir("manifesto"):
+                manifesto.carregar()
+                for nome_base_motorista, caminhos_pdfs in pdf_files_grouped.items():
+                    entrada = manifesto.reaproveitar(nome_base_motorista, caminhos_pdfs)
+                    if entrada:
+                        grupos_reaproveitados[nome_base_motorista] = entrada
+            logging.info(f"Modo incremental: {len(grupos_reaproveitados)} de {len(pdf_files_grouped)} motoristas sem alteração")
+
+        # Extrai todos os PDFs de uma vez (em paralelo com --workers) antes de consolidar por motorista
+        todos_caminhos = [caminho for nome_base, caminhos in pdf_files_grouped.items() if nome_base not in grupos_reaproveitados for caminho in caminhos]
+        if WORKERS > 1:
+            logging.info(f"Extraindo {len(todos_caminhos)} PDFs com {WORKERS} processos")
+        # No modo de validação (--full-tables) o resultado pode diferir do normal, então o cache não é usado
+        usar_cache = USAR_CACHE and not FORCAR_TABELAS
+        cache = CacheExtracao(PASTA_CACHE, CACHE_TAMANHO_MAXIMO, reconstruir=RECONSTRUIR_CACHE, backend=BACKEND_PDF) if usar_cache else None
+        with tempos_execucao.medir("repetidas"):
+            # As páginas que já apareceram antes, no mesmo PDF ou em outro PDF do motorista, não são somadas de novo
+            repetidas = {}
+            impressoes = {}
+            for nome_base, caminhos in pdf_files_grouped.items():
+                if nome_base not in grupos_reaproveitados:
+                    repetidas.update(paginas_repetidas(caminhos, impressoes, cache))
+        with tempos_execucao.medir("extracao"):
+            resultados = extrair_pdfs(todos_caminhos, WORKERS, cache, FORCAR_TABELAS, BACKEND_PDF, repetidas, criar_supervisor())
+        resultados_por_caminho = dict(zip(todos_caminhos, resultados))
+        if estatisticas_extracao["paginas"]:
+            logging.info(f"Páginas lidas: {estatisticas_extracao['paginas']}; detecção de tabelas ignorada em "
+                         f"{estatisticas_extracao['paginas_sem_tabelas']} páginas de listagem de entregas")
+        if estatisticas_extracao["pdfs_identicos"] or estatisticas_extracao["paginas_repetidas"]:
+            logging.info(f"Duplicados ignorados: {estatisticas_extracao['pdfs_identicos']} PDFs idênticos e "
+                         f"{estatisticas_extracao['paginas_repetidas']} páginas repetidas")
+
+        # Consolida os PDFs de cada motorista e calcula o fechamento de todos de uma vez
+        # PDFs sem nome de motorista (falha na extração) ficam de fora
+        grupos_calculados = []
+        pdfs_base = []
+        for nome_base_motorista, caminhos_pdfs in pdf_files_grouped.items():
+            if nome_base_motorista in grupos_reaproveitados:
+                continue
+            extraidos = [(caminho_pdf, RegistrosMotorista.da_extracao(*resultados_por_caminho[caminho_pdf]))
+                         for caminho_pdf in caminhos_pdfs if resultados_por_caminho[caminho_pdf][0]]
+            pdfs_base.extend((caminho_pdf, nome_base_motorista, registros) for caminho_pdf, registros in extraidos)
+            registros = [registros for _, registros in extraidos]
+            if registros:
+                motorista = RegistrosMotorista.consolidar(registros)
+                grupos_calculados.append((nome_base_motorista, motorista.nome, motorista))
+
+        # Guarda na base os registros dos PDFs extraídos nesta execução, com as impressões das páginas
+        # Dos PDFs com páginas repetidas a base recebe também a extração do PDF inteiro quando ela já está
+        # pronta (cache ou modo de vigia); o PDF não é extraído de novo só para a base
+        if base:
+            with tempos_execucao.medir("base"):
+                try:
+                    gravar = []
+                    for caminho_pdf, grupo, registros in pdfs_base:
+                        extracoes = {chave_repetidas(repetidas.get(caminho_pdf, ())): registros}
+                        inteiro = extracao_inteira_pronta(caminho_pdf, cache) if caminho_pdf in repetidas else None
+                        if inteiro and inteiro[0]:
+                            extracoes[""] = RegistrosMotorista.da_extracao(*inteiro)
+                        gravar.append((hash_arquivo(caminho_pdf), caminho_pdf, grupo, impressoes.get(caminho_pdf, []), extracoes))
+                    base.gravar(gravar)
+                    logging.info(f"Base de registros: {len(pdfs_base)} PDFs gravados em {BASE_REGISTROS}")
+                except Exception as e:
+                    logging.error(f"Erro ao gravar a base de registros {BASE_REGISTROS}: {e}")
+    if base:
+        base.fechar()
 
-    # Agrupar PDFs por nome base do motorista (ignorando sufixos numéricos)
-    pdf_files_grouped = defaultdict(list)
-    for nome_arquivo in os.listdir(PASTA_PDFS):
-        if nome_arquivo.lower().endswith(".pdf"):
-            # Remove a extensão .pdf e qualquer sufixo numérico (ex: 2, 3) no final
-            nome_base = re.sub(r"\d*\.pdf$", "", nome_arquivo.lower())
-            nome_base = nome_base.replace(".pdf", "").strip()
-            pdf_files_grouped[nome_base].append(os.path.join(PASTA_PDFS, nome_arquivo))
+    with tempos_execucao.medir("fechamento"):
+        calculados = calcular_fechamentos([(nome, registros) for _, nome, registros in grupos_calculados])
+    fechamentos_por_grupo = {nome_base: (nome_pdf, resultado) for (nome_base, nome_pdf, _), resultado in zip(grupos_calculados, calculados)}
 
+    # As abas seguem a ordem dos grupos; um motorista que aparece em mais de um grupo fica com o último
     for nome_base_motorista, caminhos_pdfs in pdf_files_grouped.items():
-        motorista_entregas_por_dia = defaultdict(lambda: {"entregues": 0, "insucessos": 0})
-        motorista_acres_por_data = defaultdict(float)
-        motorista_bonus_pago_dates = set()
-        motorista_nome_final = None
+        if nome_base_motorista in grupos_reaproveitados:
+            entrada = grupos_reaproveitados[nome_base_motorista]
+            fechamentos_consolidados[entrada["motorista"]] = pd.DataFrame(entrada["linhas"], columns=entrada["colunas"])
+            manifesto.reaproveitado(nome_base_motorista, entrada)
+            continue
+        if nome_base_motorista not in fechamentos_por_grupo:
+            continue
 
-        for caminho_pdf in caminhos_pdfs:
-            nome, entregas, acrescimos, bonus = extrair_dados_pdf(caminho_pdf)
-            if nome:
-                if not motorista_nome_final:
-                    motorista_nome_final = nome
-                
-                # Consolidar entregas
-                for data, info_entrega in entregas.items():
-                    motorista_entregas_por_dia[data]["entregues"] += info_entrega["entregues"]
-                    motorista_entregas_por_dia[data]["insucessos"] += info_entrega["insucessos"]
-                
-                # Consolidar acréscimos
-                for data, valor_acrescimo in acrescimos.items():
-                    motorista_acres_por_data[data] += valor_acrescimo
-                
-                # Consolidar bônus
-                motorista_bonus_pago_dates.update(bonus)
-
-        if motorista_nome_final:
-            nome_final_calculado, df_fechamento = calcular_fechamento(
-                motorista_nome_final, 
-                motorista_entregas_por_dia, 
-                motorista_acres_por_data, 
-                motorista_bonus_pago_dates
-            )
-            if not df_fechamento.empty:
-                fechamentos_consolidados[nome_final_calculado] = df_fechamento
+        motorista_nome_final, (nome_final_calculado, df_fechamento) = fechamentos_por_grupo[nome_base_motorista]
+        if not df_fechamento.empty:
+            fechamentos_consolidados[nome_final_calculado] = df_fechamento
+            if manifesto:
+                manifesto.registrar(nome_base_motorista, caminhos_pdfs, motorista_nome_final, nome_final_calculado, df_fechamento)
+
+    # Resumo da frota (por motorista e por dia), inclusive dos motoristas vindos do manifesto
+    with tempos_execucao.medir("fechamento"):
+        resumo_motoristas, resumo_dias = calcular_resumo(fechamentos_consolidados.items())
+    resumos = [(ABA_RESUMO, resumo_motoristas), (ABA_RESUMO_DIAS, resumo_dias)] if not resumo_motoristas.empty else []
 
     # Escrever no Excel
     try:
-        # Cria um novo workbook
-        book = Workbook()
-        # Remove a aba padrão 'Sheet' se ela existir
-        if 'Sheet' in book.sheetnames:
-            book.remove(book['Sheet'])
-
-        for motorista, df_novo in fechamentos_consolidados.items():
-            sheet_name = motorista[:31] # Limita o nome da aba para 31 caracteres
-            
-            # Adiciona a nova aba
-            ws = book.create_sheet(sheet_name)
-            
-            # Escreve o cabeçalho
-            ws.append(df_novo.columns.tolist())
-            
-            # Escreve os dados
-            for r_idx, row in df_novo.iterrows():
-                ws.append(row.tolist())
-
-            # Adicionar fórmulas Excel nas colunas calculadas
-            # Identifica as posições de todas as colunas necessárias
-            colunas = df_novo.columns.tolist()
-            col_valor_entregas = None
-            col_descontos = None
-            col_acrescimo_calculado = None
-            col_acrescimo_pago = None
-            col_recebido = None
-            col_total_dia = None
-            col_diferenca = None
-            
-            for idx, col_name in enumerate(colunas):
-                if col_name == "Valor Entregas":
-                    col_valor_entregas = idx + 1  # openpyxl usa índices baseados em 1
-                elif col_name == "Descontos":
-                    col_descontos = idx + 1
-                elif col_name == "Acréscimo Calculado":
-                    col_acrescimo_calculado = idx + 1
-                elif col_name == "Acréscimo Pago":
-                    col_acrescimo_pago = idx + 1
-                elif col_name == "Recebido":
-                    col_recebido = idx + 1
-                elif col_name == "Total Dia":
-                    col_total_dia = idx + 1
-                elif col_name == "Diferença":
-                    col_diferenca = idx + 1
-            
-            # Aplica fórmulas Excel para cada linha de dados (exceto cabeçalho)
-            if all([col_valor_entregas, col_descontos, col_acrescimo_calculado, col_acrescimo_pago, 
-                   col_recebido, col_total_dia, col_diferenca]):
-                
-                from openpyxl.utils import get_column_letter
-                
-                for row_num in range(2, ws.max_row + 1):  # Começa na linha 2 (pula o cabeçalho)
-                    # Converte números de coluna para letras (A, B, C, etc.)
-                    letra_valor_entregas = get_column_letter(col_valor_entregas)
-                    letra_descontos = get_column_letter(col_descontos)
-                    letra_acrescimo_calculado = get_column_letter(col_acrescimo_calculado)
-                    letra_acrescimo_pago = get_column_letter(col_acrescimo_pago)
-                    letra_recebido = get_column_letter(col_recebido)
-                    letra_total_dia = get_column_letter(col_total_dia)
-                    letra_diferenca = get_column_letter(col_diferenca)
-                    
-                    # FÓRMULA 1: Recebido = Valor Entregas + Acréscimo Calculado
-                    formula_recebido = f"={letra_valor_entregas}{row_num}+{letra_acrescimo_calculado}{row_num}"
-                    ws[f"{letra_recebido}{row_num}"] = formula_recebido
-                    
-                    # FÓRMULA 2: Total Dia = Valor Entregas + Acréscimo Pago - Descontos
-                    formula_total_dia = f"={letra_valor_entregas}{row_num}+{letra_acrescimo_pago}{row_num}"
-                    ws[f"{letra_total_dia}{row_num}"] = formula_total_dia
-                    
-                    # FÓRMULA 3: Diferença = Recebido - Total Dia
-                    formula_diferenca = f"={letra_recebido}{row_num}-{letra_total_dia}{row_num}"
-                    ws[f"{letra_diferenca}{row_num}"] = formula_diferenca
-                    
-                logging.info(f"    Fórmulas Excel aplicadas na aba {sheet_name}: Recebido, Total Dia e Diferença")
-            else:
-                logging.warning(f"    Não foi possível aplicar fórmulas na aba {sheet_name} - algumas colunas não encontradas")
-
-            # Formatação da aba
-            header_fill = PatternFill(start_color="ADD8E6", end_color="ADD8E6", fill_type="solid") # LightBlue
-            for cell in ws["1:1"]:
-                cell.fill = header_fill
-            
-            # Encontrar a linha "Total" e aplicar formatação
-            for row_idx in range(1, ws.max_row + 1):
-                if ws.cell(row=row_idx, column=1).value == "Total":
-                    for col_idx in range(1, ws.max_column + 1):
-                        ws.cell(row=row_idx, column=col_idx).fill = PatternFill(start_color="ADD8E6", end_color="ADD8E6", fill_type="solid") # LightBlue
-                    break
-        
-        book.save(SAIDA_EXCEL)
+        with tempos_execucao.medir("planilha"):
+            escrever_fechamento(SAIDA_EXCEL, fechamentos_consolidados.items(), resumos)
         logging.info(f"Fechamento gerado com sucesso em {SAIDA_EXCEL}")
+        # O manifesto só é atualizado depois que a planilha foi gravada
+        if manifesto:
+            manifesto.salvar()
     except Exception as e:
         logging.error(f"Erro ao escrever ou formatar a planilha de saída: {e}")
         exit(1)
 
-    # Gerar relatório de erros
-    if error_report_messages:
-        with open(ERROR_REPORT_FILE, "w") as f:
-            for msg in error_report_messages:
-                f.write(msg + "\n")
-        logging.warning(f"Relatório de erros gerado em {ERROR_REPORT_FILE}")
+    # Exportação colunar das linhas do fechamento (--export)
+    if EXPORTACAO:
+        caminho_exportado = ARQUIVO_EXPORTACAO or caminho_exportacao(SAIDA_EXCEL, EXPORTACAO)
+        try:
+            with tempos_execucao.medir("exportacao"):
+                linhas_exportadas = exportar_fechamento(caminho_exportado, fechamentos_consolidados.items(), EXPORTACAO, PARTICAO_EXPORTACAO)
+            logging.info(f"Exportação {EXPORTACAO}: {linhas_exportadas} linhas gravadas em {caminho_exportado}")
+        except Exception as e:
+            logging.error(f"Erro ao exportar o fechamento para {caminho_exportado}: {e}")
+            exit(1)
+
+    # Fechar o relatório de erros
+    if relatorio_erros.fechar():
+        logging.warning(f"Relatório de erros gerado em {ERROR_REPORT_FILE}", extra={"fora_do_relatorio": True})
+
+    relatorio = montar_relatorio_execucao(tempos_execucao, time.perf_counter() - inicio_parede, time.process_time() - inicio_cpu)
+    resumir_execucao(relatorio)
+    if RELATORIO_EXECUCAO:
+        try:
+            with open(RELATORIO_EXECUCAO, "w", encoding="utf-8") as f:
+                json.dump(relatorio, f, ensure_ascii=False, indent=2)
+            logging.info(f"Relatório de execução gravado em {RELATORIO_EXECUCAO}")
+        except OSError as e:
+            logging.warning(f"Não foi possível gravar o relatório de execução {RELATORIO_EXECUCAO}: {e}")
+
+# Assinatura (tamanho, mtime_ns) de cada PDF da pasta ou do pacote, pelo mesmo caminho que main() monta
+def assinaturas_pdfs(pasta):
+    assinaturas = {}
+    for _, caminho_pdf in listar_pdfs(pasta):
+        try:
+            assinaturas[caminho_pdf] = assinatura_pdf(caminho_pdf)
+        except OSError:
+            continue  # Removido entre a listagem e o stat
+    return assinaturas
+
+# Modo de vigia (--watch): verifica PASTA_PDFS a cada "intervalo" segundos e extrai cada PDF novo ou
+# alterado assim que ele termina de ser gravado (mesmo tamanho e data de modificação em duas verificações
+# seguidas). Os resultados ficam em extracoes_prontas e no cache em disco e as impressões das páginas,
+# lidas junto com a extração, ficam lembradas pelo SHA-256; quando nenhum arquivo está pendente depois de
+# uma mudança, main() gera a planilha de novo com eles, sem abrir os PDFs já lidos. Só um PDF cujas
+# páginas repetidas mudaram (outro PDF do motorista chegou antes na ordem) é extraído de novo, uma vez
+# ciclos limita o número de verificações (None: até Ctrl+C)
+def vigiar_pasta(intervalo=5.0, ciclos=None):
+    usar_cache = USAR_CACHE and not FORCAR_TABELAS
+    cache = CacheExtracao(PASTA_CACHE, CACHE_TAMANHO_MAXIMO, reconstruir=RECONSTRUIR_CACHE, backend=BACKEND_PDF) if usar_cache else None
+    candidatos = {}
+    gerar_planilha = True
+    ciclo = 0
+    logging.info(f"Modo de vigia: acompanhando {PASTA_PDFS} a cada {intervalo:g} s (Ctrl+C para encerrar)")
+    try:
+        while ciclos is None or ciclo < ciclos:
+            if ciclo:
+                time.sleep(intervalo)
+            ciclo += 1
+            try:
+                atuais = assinaturas_pdfs(PASTA_PDFS)
+            except OSError as e:
+                logging.warning(f"Modo de vigia: não foi possível listar {PASTA_PDFS}: {e}")
+                continue
+
+            removidos = [caminho_pdf for caminho_pdf in extracoes_prontas if caminho_pdf not in atuais]
+            for caminho_pdf in removidos:
+                del extracoes_prontas[caminho_pdf]
+                esquecer_hash(caminho_pdf)
+            gerar_planilha = gerar_planilha or bool(removidos)
+
+            # Um arquivo alterado só é lido quando a assinatura se repete na verificação seguinte
+            alterados = {caminho_pdf: assinatura for caminho_pdf, assinatura in atuais.items()
+                         if extracoes_prontas.get(caminho_pdf, (None, None))[:2] != assinatura}
+            prontos = [caminho_pdf for caminho_pdf, assinatura in alterados.items() if candidatos.get(caminho_pdf) == assinatura]
+            candidatos = alterados
+            if prontos:
+                for caminho_pdf, resultado in zip(prontos, extrair_pdfs(prontos, WORKERS, cache, FORCAR_TABELAS, BACKEND_PDF,
+                                                                        supervisor=criar_supervisor())):
+                    extracoes_prontas[caminho_pdf] = (*candidatos.pop(caminho_pdf), {frozenset(): resultado})
+                    try:
+                        impressoes_pdf(caminho_pdf, cache)
+                    except Exception:
+                        pass  # PDF ilegível: a extração já registrou o erro
+                logging.info(f"Modo de vigia: {len(prontos)} PDF(s) novo(s) ou alterado(s) extraído(s)")
+                gerar_planilha = True
+
+            if gerar_planilha and not candidatos and atuais:
+                gerar_planilha = False
+                try:
+                    main()
+                except SystemExit:
+                    logging.error("Modo de vigia: a planilha não foi gerada; nova tentativa na próxima mudança da pasta")
+    except KeyboardInterrupt:
+        logging.info("Modo de vigia encerrado")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    args = configurar()
+    if args.watch:
+        vigiar_pasta(max(0.1, args.watch_interval))
+    else:
+        main()
\ No newline at end of file
@@ -0,0 +1,456 @@
+# Serviço HTTP do fechamento (WSGI, só com a biblioteca padrão), para vários operadores ao mesmo tempo
+# Produção: gunicorn servico_fechamento:app --workers 1 --threads 8
+# Local:    python servico_fechamento.py [--porta 8000]
+#
+# POST /fechamentos                 PDFs (campo "pdfs", vários arquivos) e, opcionalmente, a planilha de
+#                                   veículos (campo "planilha"); coloca o fechamento na fila e devolve o id
+# GET  /fechamentos/<id>            situação do fechamento (na_fila, processando, concluido, erro)
+# GET  /fechamentos/<id>/planilha   planilha gerada
+# GET  /saude                       situação do serviço e tamanho da fila
+#
+# Os fechamentos rodam em um pool fixo de processos. Cada processo lê o config.ini e a planilha de veículos
+# padrão uma única vez e os reaproveita em todos os fechamentos que executar; o cache de extração em disco
+# é o mesmo para todos. A fila é limitada: com ela cheia o pedido é recusado (503) em vez de acumular
+# trabalho. A situação dos fechamentos fica na memória do processo do servidor, por isso o gunicorn deve
+# usar um único worker (com várias threads)
+import argparse
+import email.parser
+import email.policy
+import html
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import script_fechamento
+
+# Configuração por variáveis de ambiente (o gunicorn não repassa argumentos ao módulo)
+PASTA_SERVICO = os.environ.get("FECHAMENTO_PASTA", ".servico_fechamento")
+PROCESSOS = int(os.environ.get("FECHAMENTO_PROCESSOS", "2"))
+FILA_MAXIMA = int(os.environ.get("FECHAMENTO_FILA", "20"))
+UPLOAD_MAXIMO = int(float(os.environ.get("FECHAMENTO_UPLOAD_MB", "200")) * 1024 * 1024)
+RETENCAO = float(os.environ.get("FECHAMENTO_RETENCAO_HORAS", "24")) * 3600
+
+ARQUIVO_PLANILHA = "Fechamento_Motoristas.xlsx"
+ARQUIVO_ERROS = "error_report.log"
+ARQUIVO_EXECUCAO = "execucao.json"
+ARQUIVO_VEICULOS = "tipo de veiculos.xlsx"
+ERROS_NA_SITUACAO = 50
+PLANILHAS_ENVIADAS_EM_MEMORIA = 8
+# Leitura dos envios: tamanho dos blocos, limite dos cabeçalhos de cada parte e quanto de cada arquivo
+# enviado fica na memória antes de ir para um arquivo temporário em disco
+BLOCO_ENVIO = 64 * 1024
+CABECALHOS_MAXIMO = 16 * 1024
+ARQUIVO_EM_MEMORIA = 1024 * 1024
+
+class FilaCheia(Exception):
+    pass
+
+class PedidoInvalido(ValueError):
+    pass
+
+# ---------------------------------------------------------------------------
+# Processos do pool
+
+# Planilha de veículos padrão (diarios_info, indice_nomes) do processo e as últimas planilhas
+# enviadas, indexadas pelo SHA-256 do arquivo
+_planilha_padrao = None
+_planilhas_enviadas = OrderedDict()
+
+# Inicialização de cada processo do pool: logging, config.ini e planilha de veículos padrão, uma vez só
+# Sem a planilha padrão o processo continua; os pedidos então precisam enviar a sua
+def _iniciar_processo(argumentos):
+    global _planilha_padrao
+    try:
+        script_fechamento.configurar(list(argumentos))
+    except SystemExit:
+        logging.warning("Serviço: planilha de veículos padrão indisponível; os pedidos precisam enviar a planilha")
+        return
+    _planilha_padrao = (script_fechamento.diarios_info, script_fechamento.indice_nomes)
+
+def _carregar_planilha_enviada(caminho):
+    sha = script_fechamento.hash_arquivo(caminho)
+    if sha in _planilhas_enviadas:
+        _planilhas_enviadas.move_to_end(sha)
+        return _planilhas_enviadas[sha]
+    diarios = script_fechamento.carregar_planilha_veiculos(caminho)
+    _planilhas_enviadas[sha] = (diarios, script_fechamento.IndiceNomes(diarios))
+    if len(_planilhas_enviadas) > PLANILHAS_ENVIADAS_EM_MEMORIA:
+        _planilhas_enviadas.popitem(last=False)
+    return _planilhas_enviadas[sha]
+
+def _linhas_de_erro(caminho):
+    try:
+        with open(caminho, "r") as f:
+            return [linha.rstrip("\n") for linha in f][:ERROS_NA_SITUACAO]
+    except OSError:
+        return []
+
+# Executa um fechamento no processo do pool, com a configuração do processo apontada para a pasta do pedido
+def _executar_fechamento(pasta_trabalho, com_planilha):
+    inicio = time.perf_counter()
+    caminho_erros = os.path.join(pasta_trabalho, ARQUIVO_ERROS)
+    try:
+        if com_planilha:
+            diarios, indice = _carregar_planilha_enviada(os.path.join(pasta_trabalho, ARQUIVO_VEICULOS))
+        elif _planilha_padrao:
+            diarios, indice = _planilha_padrao
+        else:
+            return {"situacao": "erro", "mensagem": "Nenhuma planilha de veículos foi enviada e o serviço não tem uma planilha padrão"}
+    except script_fechamento.PlanilhaVeiculosInvalida as e:
+        return {"situacao": "erro", "mensagem": str(e)}
+    except Exception as e:
+        return {"situacao": "erro", "mensagem": f"Erro ao ler a planilha de veículos: {e}"}
+
+    script_fechamento.diarios_info, script_fechamento.indice_nomes = diarios, indice
+    script_fechamento.PASTA_PDFS = os.path.join(pasta_trabalho, "pdfs")
+    script_fechamento.SAIDA_EXCEL = os.path.join(pasta_trabalho, ARQUIVO_PLANILHA)
+    script_fechamento.ERROR_REPORT_FILE = caminho_erros
+    script_fechamento.RELATORIO_EXECUCAO = os.path.join(pasta_trabalho, ARQUIVO_EXECUCAO)
+    # O paralelismo é entre pedidos; cada fechamento extrai os seus PDFs em sequência
+    script_fechamento.WORKERS = 1
+    script_fechamento.INCREMENTAL = False
+    script_fechamento.EXPORTACAO = None
+    try:
+        script_fechamento.main()
+        situacao, mensagem = "concluido", "Fechamento gerado"
+    except SystemExit:
+        situacao, mensagem = "erro", "O fechamento não pôde ser gerado; veja os erros"
+    except Exception as e:
+        logging.exception("Serviço: erro inesperado no fechamento")
+        situacao, mensagem = "erro", f"Erro inesperado: {e}"
+    finally:
+        # main() não fecha o relatório de erros quando termina com exit()
+        script_fechamento.relatorio_erros.fechar()
+    return {"situacao": situacao, "mensagem": mensagem, "erros": _linhas_de_erro(caminho_erros),
+            "tempo_s": round(time.perf_counter() - inicio, 3)}
+
+# ---------------------------------------------------------------------------
+# Fila de fechamentos (processo do servidor)
+
+class ServicoFechamento:
+    def __init__(self, pasta, processos=PROCESSOS, fila_maxima=FILA_MAXIMA, retencao=RETENCAO, argumentos=()):
+        self.pasta = pasta
+        self.processos = max(1, processos)
+        self.fila_maxima = max(1, fila_maxima)
+        self.retencao = retencao
+        self.argumentos = list(argumentos)
+        self.trabalhos = {}
+        self.trava = threading.Lock()
+        self.executor = None
+
+    # O pool é criado no primeiro pedido, então importar o módulo não inicia processos
+    # Com "spawn" os processos não herdam as threads do servidor
+    def _executor(self):
+        if self.executor is None:
+            import multiprocessing
+
+            self.executor = ProcessPoolExecutor(max_workers=self.processos, mp_context=multiprocessing.get_context("spawn"),
+                                                initializer=_iniciar_processo, initargs=(self.argumentos,))
+        return self.executor
+
+    def pendentes(self):
+        with self.trava:
+            return self._pendentes()
+
+    # Fechamentos na fila ou em execução, inclusive os reservados que ainda estão gravando os arquivos
+    def _pendentes(self):
+        return sum(1 for trabalho in self.trabalhos.values() if trabalho["futuro"] is None or not trabalho["futuro"].done())
+
+    # pdfs: [(nome do arquivo, arquivo aberto para leitura)]; planilha: arquivo da planilha de veículos ou None
+    # Sob a trava só a fila é conferida e a vaga reservada; os arquivos (até UPLOAD_MAXIMO) são gravados fora
+    # dela, para que os outros pedidos e as consultas de situação não esperem a gravação
+    def enviar(self, pdfs, planilha=None):
+        nomes = [_nome_pdf(nome) for nome, _ in pdfs]
+        if not nomes:
+            raise PedidoInvalido("Envie ao menos um PDF no campo \"pdfs\"")
+        if len(set(nome.lower() for nome in nomes)) != len(nomes):
+            raise PedidoInvalido("Há PDFs com o mesmo nome de arquivo")
+
+        self.limpar_antigos()
+        identificador = uuid.uuid4().hex
+        pasta_trabalho = os.path.join(self.pasta, identificador)
+        trabalho = {"id": identificador, "pasta": pasta_trabalho, "pdfs": nomes, "criado_em": time.time(),
+                    "concluido_em": None, "resultado": None, "futuro": None}
+        with self.trava:
+            if self._pendentes() >= self.fila_maxima:
+                raise FilaCheia(f"Fila cheia ({self.fila_maxima} fechamentos pendentes); tente de novo em instantes")
+            self.trabalhos[identificador] = trabalho
+
+        try:
+            os.makedirs(os.path.join(pasta_trabalho, "pdfs"))
+            for nome, (_, arquivo) in zip(nomes, pdfs):
+                with open(os.path.join(pasta_trabalho, "pdfs", nome), "wb") as f:
+                    shutil.copyfileobj(arquivo, f, BLOCO_ENVIO)
+            if planilha:
+                with open(os.path.join(pasta_trabalho, ARQUIVO_VEICULOS), "wb") as f:
+                    shutil.copyfileobj(planilha, f, BLOCO_ENVIO)
+            with self.trava:
+                trabalho["futuro"] = self._executor().submit(_executar_fechamento, pasta_trabalho, bool(planilha))
+        except BaseException:
+            # A vaga reservada é liberada se os arquivos não puderam ser gravados ou o pool recusou o fechamento
+            with self.trava:
+                del self.trabalhos[identificador]
+            shutil.rmtree(pasta_trabalho, ignore_errors=True)
+            raise
+        trabalho["futuro"].add_done_callback(lambda futuro: self._concluir(trabalho, futuro))
+        logging.info(f"Serviço: fechamento {identificador} na fila com {len(nomes)} PDFs")
+        return identificador
+
+    def _concluir(self, trabalho, futuro):
+        try:
+            resultado = futuro.result()
+        except Exception as e:
+            resultado = {"situacao": "erro", "mensagem": f"O processo do fechamento falhou: {e}"}
+        with self.trava:
+            trabalho["resultado"] = resultado
+            trabalho["concluido_em"] = time.time()
+        logging.info(f"Serviço: fechamento {trabalho['id']} {resultado['situacao']}")
+
+    def situacao(self, identificador):
+        with self.trava:
+            trabalho = self.trabalhos.get(identificador)
+            if trabalho is None:
+                return None
+            resultado = trabalho["resultado"] or {}
+            if resultado:
+                situacao = resultado["situacao"]
+            elif trabalho["futuro"] is not None and trabalho["futuro"].running():
+                situacao = "processando"
+            else:
+                situacao = "na_fila"
+            return {
+                "id": identificador,
+                "situacao": situacao,
+                "pdfs": trabalho["pdfs"],
+                "criado_em": trabalho["criado_em"],
+                "concluido_em": trabalho["concluido_em"],
+                "mensagem": resultado.get("mensagem"),
+                "erros": resultado.get("erros", []),
+                "tempo_s": resultado.get("tempo_s"),
+                "planilha": f"/fechamentos/{identificador}/planilha" if situacao == "concluido" else None,
+            }
+
+    def caminho_planilha(self, identificador):
+        with self.trava:
+            trabalho = self.trabalhos.get(identificador)
+            if trabalho is None or (trabalho["resultado"] or {}).get("situacao") != "concluido":
+                return None
+            caminho = os.path.join(trabalho["pasta"], ARQUIVO_PLANILHA)
+        return caminho if os.path.exists(caminho) else None
+
+    # Remove os fechamentos concluídos há mais tempo que a retenção, com as suas pastas
+    def limpar_antigos(self):
+        limite = time.time() - self.retencao
+        with self.trava:
+            antigos = [trabalho for trabalho in self.trabalhos.values() if trabalho["concluido_em"] and trabalho["concluido_em"] < limite]
+            for trabalho in antigos:
+                del self.trabalhos[trabalho["id"]]
+        for trabalho in antigos:
+            shutil.rmtree(trabalho["pasta"], ignore_errors=True)
+
+    def encerrar(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+            self.executor = None
+
+# Nome do PDF enviado, só o nome do arquivo (sem pastas); o nome define a aba do motorista
+def _nome_pdf(nome):
+    nome = os.path.basename((nome or "").replace("\\", "/")).strip()
+    if not nome.lower().endswith(".pdf") or nome.startswith("."):
+        raise PedidoInvalido(f"Arquivo sem extensão .pdf: {nome or '(sem nome)'}")
+    return nome
+
+# ---------------------------------------------------------------------------
+# Aplicação WSGI
+
+# Copia o corpo para destino (None: descarta) até o delimitador, lendo mais blocos com ler() quando preciso
+# Devolve o que veio depois do delimitador; só os últimos bytes, que podem ser o começo dele, ficam no buffer
+def _copiar_ate(delimitador, buffer, ler, destino):
+    while True:
+        posicao = buffer.find(delimitador)
+        if posicao >= 0:
+            if destino is not None:
+                destino.write(buffer[:posicao])
+            return buffer[posicao + len(delimitador):]
+        manter = len(delimitador) - 1
+        if len(buffer) > manter:
+            if destino is not None:
+                destino.write(buffer[:-manter])
+            buffer = buffer[-manter:]
+        bloco = ler()
+        if not bloco:
+            raise PedidoInvalido("Corpo multipart/form-data inválido")
+        buffer += bloco
+
+# Lê um corpo multipart/form-data em blocos de BLOCO_ENVIO, sem guardar o corpo inteiro na memória: cada arquivo
+# vai para um arquivo temporário (na memória até ARQUIVO_EM_MEMORIA bytes, depois em disco)
+# Devolve {campo: [(nome do arquivo, arquivo temporário no início)]}; quem chama fecha os arquivos (fechar_formulario)
+def ler_formulario(environ):
+    tipo = environ.get("CONTENT_TYPE", "")
+    if not tipo.startswith("multipart/form-data"):
+        raise PedidoInvalido("Envie os arquivos como multipart/form-data")
+    try:
+        restante = int(environ.get("CONTENT_LENGTH") or 0)
+    except ValueError:
+        raise PedidoInvalido("Content-Length inválido")
+    fronteira = email.parser.BytesHeaderParser(policy=email.policy.HTTP).parsebytes(
+        b"Content-Type: " + tipo.encode("latin-1") + b"\r\n\r\n").get_boundary()
+    if not fronteira:
+        raise PedidoInvalido("Corpo multipart/form-data inválido")
+    entrada = environ["wsgi.input"]
+
+    def ler():
+        nonlocal restante
+        bloco = entrada.read(min(BLOCO_ENVIO, restante)) if restante > 0 else b""
+        restante -= len(bloco)
+        return bloco
+
+    # O primeiro delimitador não tem a quebra de linha antes; o que vem antes dele (preâmbulo) é ignorado
+    delimitador = b"\r\n--" + fronteira.encode("latin-1")
+    campos = {}
+    try:
+        buffer = _copiar_ate(delimitador, b"\r\n", ler, None)
+        while True:
+            while len(buffer) < 2 and (bloco := ler()):
+                buffer += bloco
+            if buffer.startswith(b"--"):
+                return campos
+            while (fim := buffer.find(b"\r\n\r\n")) < 0:
+                bloco = ler()
+                if not bloco or len(buffer) > CABECALHOS_MAXIMO:
+                    raise PedidoInvalido("Corpo multipart/form-data inválido")
+                buffer += bloco
+            parte = email.parser.BytesHeaderParser(policy=email.policy.HTTP).parsebytes(
+                buffer[:fim].lstrip(b" \t").removeprefix(b"\r\n") + b"\r\n\r\n")
+            arquivo = tempfile.SpooledTemporaryFile(max_size=ARQUIVO_EM_MEMORIA)
+            campos.setdefault(parte.get_param("name", header="content-disposition"), []).append((parte.get_filename(), arquivo))
+            buffer = _copiar_ate(delimitador, buffer[fim + 4:], ler, arquivo)
+            arquivo.seek(0)
+    except BaseException:
+        fechar_formulario(campos)
+        raise
+
+def fechar_formulario(campos):
+    for arquivos in campos.values():
+        for _, arquivo in arquivos:
+            arquivo.close()
+
+# Tamanho de um arquivo do formulário, que continua no início
+def _tamanho(arquivo):
+    tamanho = arquivo.seek(0, os.SEEK_END)
+    arquivo.seek(0)
+    return tamanho
+
+FORMULARIO = """<!DOCTYPE html>
+<html lang="pt-BR"><head><meta charset="utf-8"><title>Fechamento de Motoristas</title></head>
+<body>
+<h1>Fechamento de Motoristas</h1>
+<form method="post" action="/fechamentos" enctype="multipart/form-data">
+<p><label>PDFs dos motoristas: <input type="file" name="pdfs" accept=".pdf" multiple required></label></p>
+<p><label>Planilha de veículos (opcional): <input type="file" name="planilha" accept=".xlsx,.xls"></label></p>
+<p><button type="submit">Gerar fechamento</button></p>
+</form>
+<p>{fila}</p>
+</body></html>
+"""
+
+def _responder(start_response, status, corpo, tipo="application/json; charset=utf-8", cabecalhos=()):
+    if not isinstance(corpo, bytes):
+        corpo = json.dumps(corpo, ensure_ascii=False).encode("utf-8") if tipo.startswith("application/json") else corpo.encode("utf-8")
+    start_response(status, [("Content-Type", tipo), ("Content-Length", str(len(corpo))), *cabecalhos])
+    return [corpo]
+
+# Corpo da resposta lido em blocos; o servidor WSGI chama close() no gerador, o que fecha o arquivo
+# mesmo se o cliente desconectar no meio do download
+def _ler_arquivo(caminho, tamanho_bloco=64 * 1024):
+    with open(caminho, "rb") as arquivo:
+        while True:
+            bloco = arquivo.read(tamanho_bloco)
+            if not bloco:
+                return
+            yield bloco
+
+ROTA_FECHAMENTO = re.compile(r"^/fechamentos/([0-9a-f]{32})(/planilha)?$")
+
+def criar_app(servico):
+    def app(environ, start_response):
+        metodo = environ.get("REQUEST_METHOD", "GET")
+        caminho = environ.get("PATH_INFO", "/") or "/"
+
+        if caminho == "/" and metodo == "GET":
+            fila = html.escape(f"{servico.pendentes()} fechamento(s) pendente(s) de no máximo {servico.fila_maxima}")
+            return _responder(start_response, "200 OK", FORMULARIO.format(fila=fila), "text/html; charset=utf-8")
+
+        if caminho == "/saude" and metodo == "GET":
+            return _responder(start_response, "200 OK", {"situacao": "ok", "pendentes": servico.pendentes(), "fila_maxima": servico.fila_maxima})
+
+        if caminho == "/fechamentos" and metodo == "POST":
+            try:
+                if int(environ.get("CONTENT_LENGTH") or 0) > UPLOAD_MAXIMO:
+                    return _responder(start_response, "413 Payload Too Large", {"erro": f"Envio maior que {UPLOAD_MAXIMO // 2**20} MB"})
+                campos = ler_formulario(environ)
+                try:
+                    planilhas = [arquivo for _, arquivo in campos.get("planilha", []) if _tamanho(arquivo)]
+                    identificador = servico.enviar([(nome, arquivo) for nome, arquivo in campos.get("pdfs", []) if _tamanho(arquivo)],
+                                                   planilhas[0] if planilhas else None)
+                finally:
+                    fechar_formulario(campos)
+            except (PedidoInvalido, ValueError) as e:
+                return _responder(start_response, "400 Bad Request", {"erro": str(e)})
+            except FilaCheia as e:
+                return _responder(start_response, "503 Service Unavailable", {"erro": str(e)}, cabecalhos=[("Retry-After", "30")])
+            return _responder(start_response, "202 Accepted", servico.situacao(identificador),
+                              cabecalhos=[("Location", f"/fechamentos/{identificador}")])
+
+        rota = ROTA_FECHAMENTO.match(caminho)
+        if rota and metodo == "GET":
+            identificador, planilha = rota.groups()
+            situacao = servico.situacao(identificador)
+            if situacao is None:
+                return _responder(start_response, "404 Not Found", {"erro": "Fechamento não encontrado"})
+            if not planilha:
+                return _responder(start_response, "200 OK", situacao)
+            caminho_planilha = servico.caminho_planilha(identificador)
+            if caminho_planilha is None:
+                return _responder(start_response, "409 Conflict", {"erro": "A planilha ainda não está disponível", "situacao": situacao["situacao"]})
+            start_response("200 OK", [
+                ("Content-Type", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+                ("Content-Length", str(os.path.getsize(caminho_planilha))),
+                ("Content-Disposition", f"attachment; filename=\"{ARQUIVO_PLANILHA}\""),
+            ])
+            if "wsgi.file_wrapper" in environ:
+                return environ["wsgi.file_wrapper"](open(caminho_planilha, "rb"), 64 * 1024)
+            return _ler_arquivo(caminho_planilha)
+
+        return _responder(start_response, "404 Not Found", {"erro": "Rota não encontrada"})
+    return app
+
+servico = ServicoFechamento(PASTA_SERVICO)
+app = criar_app(servico)
+
+if __name__ == "__main__":
+    from socketserver import ThreadingMixIn
+    from wsgiref.simple_server import WSGIServer, make_server
+
+    class ServidorComThreads(ThreadingMixIn, WSGIServer):
+        daemon_threads = True
+
+    parser = argparse.ArgumentParser(description="Serviço HTTP do fechamento de motoristas.")
+    parser.add_argument("--host", default="127.0.0.1", help="Endereço de escuta (padrão: 127.0.0.1).")
+    parser.add_argument("--porta", type=int, default=8000, help="Porta de escuta (padrão: 8000).")
+    args = parser.parse_args()
+    script_fechamento.configurar_logging()
+    with make_server(args.host, args.porta, app, server_class=ServidorComThreads) as servidor:
+        logging.info(f"Serviço de fechamento em http://{args.host}:{args.porta}/")
+        try:
+            servidor.serve_forever()
+        finally:
+            servico.encerrar()
@@ -1,10 +1,16 @@
 import unittest
 import os
+import sys
+import subprocess
+import tempfile
+import shutil
+import difflib
 import pandas as pd
 from unittest.mock import patch, MagicMock
 from collections import defaultdict
 from datetime import datetime
-from script_fechamento import normalize, encontrar_nome_aproximado, extrair_dados_pdf, calcular_fechamento, diarios_info, VALOR_ENTREGA, BONUS_DIARIO, main
+from corpus_sintetico import gerar_fatura
+from script_fechamento import normalize, classificar_linha, encontrar_nome_aproximado, IndiceNomes, montar_diarios_info, carregar_planilha_veiculos, PlanilhaVeiculosInvalida, extrair_dados_pdf, extrair_pdfs, CacheExtracao, RelatorioErros, AgregadorAvisos, RegistrosMotorista, calcular_fechamento, calcular_fechamentos, calcular_resumo, escrever_fechamento, exportar_fechamento, diarios_info, VALOR_ENTREGA, BONUS_DIARIO, main
 
 class TestFechamentoMotoristas(unittest.TestCase):
 
@@ -22,18 +28,102 @@ class TestFechamentoMotoristas(unittest.TestCase):
         global diarios_info
         diarios_info = cls.mock_diarios_info
 
+    def test_importacao_leve_e_sem_efeitos_colaterais(self):
+        # Importar o módulo não pode ler argumentos, config.ini ou a planilha, nem carregar as bibliotecas pesadas
+        # Roda em uma pasta vazia e com um argumento inválido, que o argparse rejeitaria
+        with tempfile.TemporaryDirectory() as pasta:
+            ambiente = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.abspath(__file__)))
+            resultado = subprocess.run(
+                [sys.executable, "-X", "importtime", "-c", "import script_fechamento", "--argumento-invalido"],
+                cwd=pasta, env=ambiente, capture_output=True, text=True,
+            )
+        self.assertEqual(resultado.returncode, 0, resultado.stderr[-2000:])
+
+        # Linhas do -X importtime: "import time: <self us> | <cumulativo us> | <módulo>"
+        cumulativo = {}
+        for linha in resultado.stderr.splitlines():
+            if linha.startswith("import time:") and "|" in linha:
+                _, tempo_total, modulo = linha.split("|")
+                if tempo_total.strip().isdigit():
+                    cumulativo[modulo.strip()] = int(tempo_total)
+        for modulo in ["pandas", "numpy", "pdfplumber", "pypdfium2", "openpyxl", "multiprocessing"]:
+            self.assertNotIn(modulo, cumulativo)
+        # Hoje em torno de 40 ms; antes eram ~600 ms com a leitura da planilha
+        self.assertLess(cumulativo["script_fechamento"], 500_000)
+
     def test_normalize(self):
         self.assertEqual(normalize("Olá Mundo!"), "ola mundo!")
         self.assertEqual(normalize("Árvore Cão"), "arvore cao")
         self.assertEqual(normalize("TESTE COM ACENTOS"), "teste com acentos")
         self.assertEqual(normalize("123 Teste"), "123 teste")
 
+    def test_classificar_linha(self):
+        self.assertIsNone(classificar_linha("   "))
+
+        linha = classificar_linha("01/07/2025 Pedido 123 Entregue Sim")
+        self.assertEqual((linha.status, linha.data, linha.valor), ("Sim", "01/07/2025", None))
+        self.assertIsNone(linha.secao)
+
+        linha = classificar_linha("Remunerações Diárias")
+        self.assertEqual(linha.secao, "remuneracoes")
+        linha = classificar_linha("Remuneração Adicional")
+        self.assertEqual(linha.secao, "acrescimos")
+
+        linha = classificar_linha("02/07/2025 Acréscimo R$ 1.234,56")
+        self.assertEqual((linha.secao, linha.data, linha.valor), ("acrescimos", "02/07/2025", "1.234,56"))
+
+        linha = classificar_linha("03/07/2025 Diária R$ 30,00")
+        self.assertTrue(linha.bonus)
+
+        # Marcadores colados ao anterior também são reconhecidos
+        linha = classificar_linha("Coletas/EntregasSim")
+        self.assertTrue(linha.fim_remuneracoes)
+        self.assertTrue(linha.fim_acrescimos)
+        self.assertEqual(linha.status, "Sim")
+        self.assertTrue(classificar_linha("Resumotorista: X").motorista)
+
     def test_encontrar_nome_aproximado(self):
         # Teste com cutoff 0.95 para corresponder ao script principal
         self.assertEqual(encontrar_nome_aproximado("MOTORISTA A"), "MOTORISTA A")
         self.assertIsNone(encontrar_nome_aproximado("MOTORISTA Z"))
         self.assertIsNone(encontrar_nome_aproximado("MOTORISTA AAAA"))
 
+    def test_indice_nomes_igual_a_busca_completa(self):
+        nomes = ["JOÃO SILVA", "JOAO SILVA SANTOS", "MARIA SANTOS", "MARIA DOS SANTOS", "PEDRO OLIVEIRA", "ANA LIMA SILVA", "ANA SILVA LIMA"]
+        indice = IndiceNomes(nomes)
+        normalizados = {normalize(nome): nome for nome in nomes}
+        for nome_pdf in ["JOAO SILVA", "joão silva", "MARIA SANTOS", "MARIA D SANTOS", "PEDR OLIVERA", "ANA SILVA", "SILVA", "XYZ", "ZÉ"]:
+            matches = difflib.get_close_matches(normalize(nome_pdf), list(normalizados), n=1, cutoff=0.5)
+            esperado = normalizados[matches[0]] if matches else None
+            self.assertEqual(indice.buscar(nome_pdf), esperado, nome_pdf)
+
+        # Resultado memorizado por nome
+        self.assertIn("PEDR OLIVERA", indice.resultados)
+
+    def test_montar_diarios_info(self):
+        df = pd.DataFrame({
+            " Nome do Motorista ": ["ana silva", "  ", None, "bruno lima", "Ana Silva", "carla dias"],
+            "Diária Combinada": [100.0, 120.0, 130.0, -5.0, 150.0, None],
+            "Tipo de Veículo": ["MOTO", "CARRO", "CARRO", "  ", "VAN", "PASSEIO"],
+        })
+        with self.assertLogs(level="WARNING") as logs:
+            info = montar_diarios_info(df, "veiculos.xlsx")
+
+        self.assertEqual(info, {
+            "ANA SILVA": {"diaria": 150.0, "tipo": "VAN"},
+            "BRUNO LIMA": {"diaria": 0.0, "tipo": "N/A"},
+            "CARLA DIAS": {"diaria": 0.0, "tipo": "PASSEIO"},
+        })
+        # Um aviso por tipo de problema, com as linhas do Excel como exemplo
+        self.assertEqual(len(logs.output), 3)
+        self.assertIn("em 2 linha(s) da planilha veiculos.xlsx: 3, 4", logs.output[0])
+        self.assertIn("5 (BRUNO LIMA: -5.0)", logs.output[1])
+
+    def test_montar_diarios_info_sem_coluna_de_diaria(self):
+        df = pd.DataFrame({"Motorista": ["ANA"], "Valor": [100.0]})
+        with self.assertRaises(PlanilhaVeiculosInvalida):
+            montar_diarios_info(df, "veiculos.xlsx")
+
     @patch("pdfplumber.open")
     def test_extrair_dados_pdf_cenario1(self, mock_pdfplumber_open):
         # Mock do PDF para o Cenário 1
@@ -97,6 +187,137 @@ class TestFechamentoMotoristas(unittest.TestCase):
         self.assertAlmostEqual(acrescimos[datetime(2023, 1, 4).date()], 25.00)
         self.assertAlmostEqual(acrescimos[datetime(2023, 1, 5).date()], 10.00)
 
+    @patch("pdfplumber.open")
+    def test_extrair_dados_pdf_secoes_entre_paginas(self, mock_pdfplumber_open):
+        # A seção de remunerações começa em uma página e continua na seguinte,
+        # e a última linha da primeira página continua no início da segunda
+        mock_pdf = MagicMock()
+        pagina1 = MagicMock()
+        pagina2 = MagicMock()
+        mock_pdf.pages = [pagina1, pagina2]
+        mock_pdfplumber_open.return_value.__enter__.return_value = mock_pdf
+
+        pagina1.extract_text.return_value = (
+            "Motorista: MOTORISTA A\n" +
+            "01/01/2023 - Entrega - Sim\n" +
+            "02/01/2023 - Entr"
+        )
+        pagina1.extract_tables.return_value = []
+        pagina2.extract_text.return_value = (
+            "ega - Não\n" +
+            "Remunerações Diárias\n" +
+            "01/01/2023 R$ 30,00\n"
+        )
+        pagina2.extract_tables.return_value = []
+        nome, entregas, acrescimos, bonus = extrair_dados_pdf("dummy4.pdf")
+
+        self.assertEqual(nome, "MOTORISTA A")
+        self.assertEqual(entregas[datetime(2023, 1, 2).date()]["insucessos"], 1)
+        self.assertEqual(bonus, {datetime(2023, 1, 1).date()})
+        # O cache de cada página é liberado depois do uso
+        pagina1.close.assert_called_once()
+        pagina2.close.assert_called_once()
+
+    @patch("pdfplumber.open")
+    def test_extrair_dados_pdf_ignora_tabelas_em_listagem_de_entregas(self, mock_pdfplumber_open):
+        mock_pdf = MagicMock()
+        listagem = MagicMock()
+        acrescimos = MagicMock()
+        mock_pdf.pages = [listagem, acrescimos]
+        mock_pdfplumber_open.return_value.__enter__.return_value = mock_pdf
+
+        listagem.extract_text.return_value = (
+            "Motorista: MOTORISTA C\n" +
+            "328111841 Entrega Expressa 01/01/2023 Sim R$ 3,80\n" +
+            "328111842 Entrega Expressa 01/01/2023 Não R$ 0,00\n"
+        )
+        acrescimos.extract_text.return_value = (
+            "ACRÉSCIMOS\n" +
+            "04/01/2023 R$ 25,00\n"
+        )
+        acrescimos.extract_tables.return_value = [[["Data", "Valor"], ["04/01/2023", "R$ 25,00"]]]
+
+        nome, entregas, acres, bonus = extrair_dados_pdf("dummy5.pdf")
+        listagem.extract_tables.assert_not_called()
+        acrescimos.extract_tables.assert_called_once()
+        self.assertEqual(entregas[datetime(2023, 1, 1).date()], {"entregues": 1, "insucessos": 1})
+        self.assertAlmostEqual(acres[datetime(2023, 1, 4).date()], 25.00)
+
+        # --full-tables força a detecção de tabelas em todas as páginas
+        extrair_dados_pdf("dummy5.pdf", forcar_tabelas=True)
+        listagem.extract_tables.assert_called_once()
+
+    def test_extrair_pdfs_paralelo_igual_sequencial(self):
+        # Os PDFs de exemplo devem gerar exatamente os mesmos dados com e sem processos paralelos
+        caminhos = [
+            os.path.join("pdfs", "MAURICIO DE JESUS DO ESPIRITO SANTOS CRISPIM 2.pdf"),
+            os.path.join("pdfs", "ELISIANE LUDMYLLA FERREIRA SANTOS.pdf"),
+        ]
+        sequencial = extrair_pdfs(caminhos, workers=1)
+        paralelo = extrair_pdfs(caminhos, workers=2)
+
+        self.assertEqual(len(paralelo), len(caminhos))
+        for (nome_s, entregas_s, acres_s, bonus_s), (nome_p, entregas_p, acres_p, bonus_p) in zip(sequencial, paralelo):
+            self.assertEqual(nome_s, nome_p)
+            self.assertEqual(dict(entregas_s), entregas_p)
+            self.assertEqual(dict(acres_s), acres_p)
+            self.assertEqual(bonus_s, bonus_p)
+
+    @patch("script_fechamento.extrair_dados_pdf")
+    def test_extrair_pdfs_reaproveita_cache(self, mock_extrair_dados_pdf):
+        resultado = (
+            "MOTORISTA A",
+            {datetime(2023, 1, 1).date(): {"entregues": 3, "insucessos": 1}},
+            {datetime(2023, 1, 1).date(): 15.5},
+            {datetime(2023, 1, 1).date()},
+        )
+        mock_extrair_dados_pdf.return_value = resultado
+        with tempfile.TemporaryDirectory() as pasta:
+            caminho_pdf = os.path.join(pasta, "motorista.pdf")
+            with open(caminho_pdf, "wb") as f:
+                f.write(b"%PDF-1.4 conteudo de teste")
+            cache = CacheExtracao(os.path.join(pasta, "cache"), 1024 * 1024)
+
+            self.assertEqual(extrair_pdfs([caminho_pdf], cache=cache), [resultado])
+            self.assertEqual(extrair_pdfs([caminho_pdf], cache=cache), [resultado])
+            self.assertEqual(mock_extrair_dados_pdf.call_count, 1)
+
+            # --rebuild-cache ignora a entrada existente
+            cache_reconstruido = CacheExtracao(os.path.join(pasta, "cache"), 1024 * 1024, reconstruir=True)
+            extrair_pdfs([caminho_pdf], cache=cache_reconstruido)
+            self.assertEqual(mock_extrair_dados_pdf.call_count, 2)
+
+            # Conteúdo alterado gera outra chave
+            with open(caminho_pdf, "ab") as f:
+                f.write(b" corrigido")
+            extrair_pdfs([caminho_pdf], cache=cache)
+            self.assertEqual(mock_extrair_dados_pdf.call_count, 3)
+
+    def test_cache_extracao_remove_entradas_menos_usadas(self):
+        resultado = ("MOTORISTA A", {}, {datetime(2023, 1, 1).date(): 1.0}, set())
+        with tempfile.TemporaryDirectory() as pasta:
+            cache = CacheExtracao(pasta, 0)
+            cache.gravar("antigo", resultado)
+            os.utime(os.path.join(pasta, os.listdir(pasta)[0]), (1, 1))
+            cache.gravar("recente", resultado)
+            cache.tamanho_maximo = os.path.getsize(os.path.join(pasta, os.listdir(pasta)[0]))
+            cache.aplicar_limite()
+            self.assertIsNone(cache.obter("antigo"))
+            self.assertEqual(cache.obter("recente"), resultado)
+
+    def test_backend_auto_igual_pdfplumber_nos_pdfs_de_exemplo(self):
+        # Paridade: texto pelo pdfium e tabelas pelo pdfplumber devem gerar os mesmos dados
+        for nome_arquivo in sorted(os.listdir("pdfs")):
+            with self.subTest(pdf=nome_arquivo):
+                caminho = os.path.join("pdfs", nome_arquivo)
+                nome_p, entregas_p, acres_p, bonus_p = extrair_dados_pdf(caminho, backend="pdfplumber")
+                nome_a, entregas_a, acres_a, bonus_a = extrair_dados_pdf(caminho, backend="auto")
+                self.assertIsNotNone(nome_p)
+                self.assertEqual(nome_a, nome_p)
+                self.assertEqual(dict(entregas_a), dict(entregas_p))
+                self.assertEqual(dict(acres_a), dict(acres_p))
+                self.assertEqual(bonus_a, bonus_p)
+
     def test_calcular_fechamento(self):
         # Dados de teste
         nome_motorista = "MOTORISTA A"
@@ -121,6 +342,815 @@ class TestFechamentoMotoristas(unittest.TestCase):
         self.assertAlmostEqual(total_row["Acréscimo Pago"], 10.0)
         self.assertAlmostEqual(total_row["Bônus"], BONUS_DIARIO)
 
+    def test_registros_motorista_consolidar(self):
+        import pickle
+
+        d1, d2, d3 = datetime(2025, 7, 1).date(), datetime(2025, 7, 2).date(), datetime(2025, 7, 3).date()
+        primeiro = RegistrosMotorista.da_extracao("ANA", {d1: {"entregues": 3, "insucessos": 1}}, {d1: 0.1}, {d3})
+        segundo = RegistrosMotorista.da_extracao("ANA", {d1: {"entregues": 2, "insucessos": 0}, d2: {"entregues": 5, "insucessos": 0}}, {d1: 0.2}, set())
+        consolidado = pickle.loads(pickle.dumps(RegistrosMotorista.consolidar([primeiro, segundo])))
+
+        self.assertEqual(consolidado.nome, "ANA")
+        self.assertEqual(consolidado.dias.tolist(), [d1.toordinal(), d2.toordinal(), d3.toordinal()])
+        self.assertEqual(consolidado.entregues.tolist(), [5, 5, 0])
+        self.assertEqual(consolidado.insucessos.tolist(), [1, 0, 0])
+        # Dinheiro em centavos: 0,10 + 0,20 é exatamente 30 centavos
+        self.assertEqual(consolidado.acrescimos.tolist(), [30, 0, 0])
+        self.assertEqual(consolidado.bonus.tolist(), [False, False, True])
+        # O dia só com bônus não vira linha do fechamento
+        self.assertEqual(consolidado.movimento.tolist(), [True, True, False])
+
+    def test_base_registros_grava_e_consulta_periodo(self):
+        from script_fechamento import BaseRegistros
+
+        d1, d2, d3 = datetime(2025, 7, 1).date(), datetime(2025, 7, 2).date(), datetime(2025, 8, 1).date()
+        primeiro = RegistrosMotorista.da_extracao("ANA LIMA", {d1: {"entregues": 3, "insucessos": 1}, d3: {"entregues": 9, "insucessos": 2}}, {d1: 0.1}, {d2})
+        segundo = RegistrosMotorista.da_extracao("ANA LIMA", {d1: {"entregues": 2, "insucessos": 0}, d2: {"entregues": 5, "insucessos": 3}}, {d1: 0.2}, set())
+        outro = RegistrosMotorista.da_extracao("Bruno Dias", {d2: {"entregues": 7, "insucessos": 0}}, {}, set())
+
+        def colunas(registros):
+            return [registros.nome] + [getattr(registros, campo).tolist() for campo in RegistrosMotorista.__slots__[1:]]
+
+        with tempfile.TemporaryDirectory() as pasta:
+            caminho = os.path.join(pasta, "registros.db")
+            base = BaseRegistros(caminho)
+            base.gravar([("a1", "pdfs/ana.pdf", "ana", ["p1"], {"": primeiro}), ("a2", "pdfs/ana 2.pdf", "ana", ["p2"], {"": segundo}),
+                         ("b1", "pdfs/bruno.pdf", "bruno", ["p3"], {"": outro})])
+            # Gravar de novo o mesmo PDF (mesmo SHA-256) substitui os registros dele
+            base.gravar([("a1", "pdfs/ana.pdf", "ana", ["p1"], {"": primeiro})])
+            base.fechar()
+
+            base = BaseRegistros(caminho)
+            try:
+                tudo = base.consultar()
+                self.assertEqual(list(tudo), ["ana", "bruno"])
+                # Os PDFs de cada grupo vêm na ordem dos nomes de arquivo
+                self.assertEqual([colunas(registros) for registros in tudo["ana"]], [colunas(segundo), colunas(primeiro)])
+
+                # Período de julho, só a Ana: o dia de agosto fica de fora e o resultado é o dos PDFs consolidados
+                self.assertEqual(base.motoristas(["ana lima", "Fulano"]), ["ANA LIMA"])
+                julho = base.consultar(d1, datetime(2025, 7, 31).date(), ["ANA LIMA"])
+                self.assertEqual(list(julho), ["ana"])
+                consolidado = RegistrosMotorista.consolidar(julho["ana"])
+                self.assertEqual(consolidado.dias.tolist(), [d1.toordinal(), d2.toordinal()])
+                self.assertEqual(consolidado.entregues.tolist(), [5, 5])
+                self.assertEqual(consolidado.insucessos.tolist(), [1, 3])
+                self.assertEqual(consolidado.acrescimos.tolist(), [30, 0])
+                self.assertEqual(consolidado.bonus.tolist(), [False, True])
+                # Consulta histórica direto no SQLite
+                insucessos = base.conexao.execute(
+                    "SELECT SUM(insucessos) FROM registros WHERE motorista = ? AND data >= ?", ("ANA LIMA", "2025-07-01")).fetchone()[0]
+                self.assertEqual(insucessos, 6)
+            finally:
+                base.fechar()
+
+            # PDFs sobrepostos: a página p2 do "ana 2.pdf" repete o "ana.pdf". A extração de cada PDF fica guardada
+            # com as páginas repetidas na chave, e vale a que corresponde a todos os PDFs do motorista na base
+            caminho = os.path.join(pasta, "sobrepostos.db")
+            sem_repetida = RegistrosMotorista.da_extracao("ANA LIMA", {d2: {"entregues": 5, "insucessos": 3}}, {}, set())
+            base = BaseRegistros(caminho)
+            try:
+                base.gravar([("a1", "pdfs/ana.pdf", "ana", ["p1", "p2"], {"": primeiro})])
+                # Gravado sozinho, o PDF sobreposto só tem a extração inteira: continua somado, com um aviso
+                with self.assertLogs(level="WARNING") as logs:
+                    base.gravar([("a2", "pdfs/ana 2.pdf", "ana", ["p2", "p3"], {"": segundo})])
+                self.assertIn("1 páginas do PDF ana 2.pdf repetem páginas de outro PDF", logs.output[0])
+                self.assertEqual([colunas(registros) for registros in base.consultar()["ana"]], [colunas(segundo), colunas(primeiro)])
+
+                # Gravados juntos, a extração sem a página repetida passa a valer
+                base.gravar([("a1", "pdfs/ana.pdf", "ana", ["p1", "p2"], {"": primeiro}),
+                             ("a2", "pdfs/ana 2.pdf", "ana", ["p2", "p3"], {"0": sem_repetida, "": segundo})])
+                esperado = [colunas(sem_repetida), colunas(primeiro)]
+                self.assertEqual([colunas(registros) for registros in base.consultar()["ana"]], esperado)
+                # Gravar o PDF de novo sem o outro não troca o que ele soma na base
+                base.gravar([("a2", "pdfs/ana 2.pdf", "ana", ["p2", "p3"], {"": segundo})])
+                self.assertEqual([colunas(registros) for registros in base.consultar()["ana"]], esperado)
+                self.assertEqual(base.conexao.execute("SELECT SUM(entregues) FROM registros").fetchone()[0], 3 + 9 + 5)
+            finally:
+                base.fechar()
+
+            # Só a extração que desconta páginas a mais (PDF gravado antes com outro PDF que não está na base):
+            # vale assim mesmo, com um aviso, em vez de o PDF sumir da base
+            base = BaseRegistros(os.path.join(pasta, "sem_inteira.db"))
+            try:
+                with self.assertLogs(level="WARNING") as logs:
+                    base.gravar([("a2", "pdfs/ana 2.pdf", "ana", ["p2", "p3"], {"0": sem_repetida})])
+                self.assertIn("1 páginas do PDF ana 2.pdf não repetem nenhum outro PDF", logs.output[0])
+                self.assertEqual([colunas(registros) for registros in base.consultar()["ana"]], [colunas(sem_repetida)])
+            finally:
+                base.fechar()
+
+            # main() com --store: cada PDF é extraído uma vez só; a extração do PDF inteiro de um PDF com páginas
+            # repetidas só entra na base quando já está pronta (cache ou modo de vigia)
+            import script_fechamento
+            pasta_pdfs = os.path.join(pasta, "pdfs")
+            os.makedirs(pasta_pdfs)
+            gerar_fatura(os.path.join(pasta_pdfs, "ana.pdf"), "ANA PAULA SILVA LIMA", entregas=120, semente=7)
+            gerar_fatura(os.path.join(pasta_pdfs, "ana 2.pdf"), "ANA PAULA SILVA LIMA", entregas=120, semente=7, impressao="11:02", paginas=[0])
+            caminho = os.path.join(pasta, "main.db")
+            with patch.multiple(script_fechamento, PASTA_PDFS=pasta_pdfs, SAIDA_EXCEL=os.path.join(pasta, "fechamento.xlsx"),
+                                ERROR_REPORT_FILE=os.path.join(pasta, "erros.log"), USAR_CACHE=False, BACKEND_PDF="auto",
+                                BASE_REGISTROS=caminho, diarios_info={"ANA PAULA SILVA LIMA": {"diaria": 100.0, "tipo": "CARRO"}}), \
+                    patch("script_fechamento.extrair_dados_pdf", wraps=extrair_dados_pdf) as mock_extrair:
+                main()
+            self.assertEqual(mock_extrair.call_count, 2)
+            base = BaseRegistros(caminho)
+            try:
+                self.assertEqual(sorted(base.conexao.execute("SELECT p.arquivo, e.repetidas FROM extracoes e JOIN pdfs p USING (sha256)")),
+                                 [("ana 2.pdf", "0"), ("ana.pdf", "")])
+                sozinho = RegistrosMotorista.da_extracao(*extrair_dados_pdf(os.path.join(pasta_pdfs, "ana.pdf"), backend="auto"))
+                self.assertEqual(colunas(RegistrosMotorista.consolidar(base.consultar()["ana"])), colunas(sozinho))
+            finally:
+                base.fechar()
+
+    def test_calcular_fechamentos_varios_motoristas(self):
+        import script_fechamento
+
+        d1, d2 = datetime(2025, 7, 1).date(), datetime(2025, 7, 2).date()
+        planilha = {"ANA LIMA": {"diaria": 100.0, "tipo": "MOTO"}, "BRUNO DIAS": {"diaria": 10.0, "tipo": "VAN"}}
+        motoristas = [
+            ("ANA LIMA", RegistrosMotorista.da_extracao("ANA LIMA", {d1: {"entregues": 10, "insucessos": 2}, d2: {"entregues": 30, "insucessos": 0}}, {d2: 15.5}, {d1, d2})),
+            ("DESCONHECIDO XYZ", RegistrosMotorista.da_extracao("DESCONHECIDO XYZ", {d1: {"entregues": 1, "insucessos": 0}}, {}, set())),
+            ("BRUNO DIAS", RegistrosMotorista.da_extracao("BRUNO DIAS", {}, {}, {d1})),
+        ]
+        with patch.multiple(script_fechamento, diarios_info=planilha, indice_nomes=None, VALOR_ENTREGA=3.8, BONUS_DIARIO=30.0):
+            with self.assertLogs(level="WARNING"):
+                resultados = calcular_fechamentos(motoristas)
+
+        self.assertEqual([nome for nome, _ in resultados], ["ANA LIMA", None, "BRUNO DIAS"])
+        self.assertTrue(resultados[1][1].empty)
+
+        ana = resultados[0][1]
+        self.assertEqual(ana["Data"].tolist(), ["01/07/2025", "02/07/2025", "Total"])
+        self.assertEqual(ana["Entregues"].tolist(), [10, 30, 40])
+        self.assertEqual(ana["Valor Entregas"].tolist(), [38.0, 114.0, 152.0])
+        self.assertEqual(ana["Descontos"].tolist(), [7.6, 0.0, 7.6])
+        self.assertEqual(ana["Acréscimo Calculado"].tolist(), [54.4, 0.0, 0.0])
+        self.assertEqual(ana["Acréscimo Pago"].tolist(), [0.0, 15.5, 15.5])
+        self.assertEqual(ana["Bônus"].tolist(), [30.0, 30.0, 60.0])
+        self.assertEqual(ana["Tipo de Veículo"].tolist(), ["MOTO"] * 3)
+        self.assertTrue(ana["Recebido"].isna().all())
+
+        # Só bônus, sem entregas nem acréscimos: apenas a linha de total, zerada
+        bruno = resultados[2][1]
+        self.assertEqual(bruno["Data"].tolist(), ["Total"])
+        self.assertEqual(bruno["Bônus"].tolist(), [0.0])
+
+    def test_extrair_pdf_em_trechos_igual_ao_sequencial(self):
+        import script_fechamento
+        from script_fechamento import extrair_trecho_pdf, juntar_trechos, contar_paginas
+
+        def comparavel(resultado):
+            nome, entregas, acrescimos, bonus = resultado
+            return nome, {data: dict(info) for data, info in entregas.items()}, dict(acrescimos), set(bonus)
+
+        caminho_grande = os.path.join("pdfs", "MAURICIO DE JESUS DO ESPIRITO SANTOS CRISPIM.pdf")
+        caminho_pequeno = os.path.join("pdfs", "Camila Victoria Tomaz Duarte.pdf")
+        sequencial = comparavel(extrair_dados_pdf(caminho_grande, backend="auto"))
+        paginas = contar_paginas(caminho_grande)
+        self.assertEqual(paginas, 22)
+
+        # Trechos de 1 e de 3 páginas: as seções e as linhas que atravessam páginas ficam divididas entre trechos
+        for tamanho in (1, 3):
+            with self.subTest(tamanho=tamanho):
+                trechos = [extrair_trecho_pdf(caminho_grande, inicio, min(inicio + tamanho, paginas), backend="auto")
+                           for inicio in range(0, paginas, tamanho)]
+                self.assertEqual(comparavel(juntar_trechos(trechos)), sequencial)
+
+        # Com vários processos o PDF grande é dividido em trechos e o resultado é o mesmo
+        with patch.object(script_fechamento, "PAGINAS_POR_TRECHO", 5):
+            self.assertEqual(script_fechamento.dividir_em_trechos(paginas, 2), [(0, 11), (11, 22)])
+            self.assertIsNone(script_fechamento.dividir_em_trechos(4, 2))
+            script_fechamento.metricas_pdfs.clear()
+            resultados = extrair_pdfs([caminho_pequeno, caminho_grande], workers=2, backend="auto")
+        self.assertEqual(comparavel(resultados[1]), sequencial)
+        self.assertEqual(comparavel(resultados[0]), comparavel(extrair_dados_pdf(caminho_pequeno, backend="auto")))
+        self.assertEqual(script_fechamento.metricas_pdfs[caminho_grande]["trechos"], 2)
+        self.assertEqual(script_fechamento.metricas_pdfs[caminho_grande]["paginas"], 22)
+
+    def test_pdfs_e_paginas_duplicados_nao_sao_somados(self):
+        import pypdfium2 as pdfium
+        from script_fechamento import remover_pdfs_identicos, paginas_repetidas
+
+        with tempfile.TemporaryDirectory() as pasta:
+            original = os.path.join(pasta, "ana.pdf")
+            esperado = gerar_fatura(original, "ANA PAULA SILVA LIMA", entregas=120, semente=7)
+            copia = os.path.join(pasta, "ana 2.pdf")
+            shutil.copy(original, copia)
+            # Reexportação de parte do relatório: bytes diferentes, páginas com o mesmo texto
+            sobreposto = os.path.join(pasta, "ana 3.pdf")
+            documento = pdfium.PdfDocument(original)
+            paginas = len(documento)
+            novo = pdfium.PdfDocument.new()
+            novo.import_pages(documento, [paginas - 1, 0])
+            novo.save(sobreposto)
+            novo.close()
+            documento.close()
+
+            grupos, ignorados = remover_pdfs_identicos({"ana": [original, copia, sobreposto]})
+            self.assertEqual(grupos, {"ana": [original, sobreposto]})
+            self.assertEqual(ignorados, [(copia, original)])
+
+            repetidas = paginas_repetidas(grupos["ana"])
+            self.assertEqual(repetidas, {sobreposto: frozenset([0, 1])})
+            for backend in ("pdfplumber", "auto"):
+                with self.subTest(backend=backend):
+                    # As páginas repetidas ainda dão o nome do motorista, mas não somam nada
+                    nome, entregas, acrescimos, bonus = extrair_pdfs([sobreposto], backend=backend, repetidas=repetidas)[0]
+                    self.assertEqual((nome, dict(entregas), dict(acrescimos), set(bonus)), (esperado[0], {}, {}, set()))
+                    registros = [RegistrosMotorista.da_extracao(*resultado)
+                                 for resultado in extrair_pdfs(grupos["ana"], backend=backend, repetidas=repetidas)]
+                    consolidado = RegistrosMotorista.consolidar(registros)
+                    sozinho = RegistrosMotorista.da_extracao(*extrair_dados_pdf(original, backend=backend))
+                    for campo in RegistrosMotorista.__slots__[1:]:
+                        self.assertEqual(getattr(consolidado, campo).tolist(), getattr(sozinho, campo).tolist(), campo)
+                    self.assertEqual(consolidado.nome, sozinho.nome)
+
+            # Página repetida dentro de um único PDF: também somada uma vez só, inclusive no main()
+            import script_fechamento
+            from openpyxl import load_workbook
+            interno = os.path.join(pasta, "interno", "ana.pdf")
+            os.makedirs(os.path.dirname(interno))
+            documento = pdfium.PdfDocument(original)
+            novo = pdfium.PdfDocument.new()
+            novo.import_pages(documento, list(range(paginas)) + [0])
+            novo.save(interno)
+            novo.close()
+            documento.close()
+            self.assertEqual(paginas_repetidas([interno]), {interno: frozenset([paginas])})
+            planilhas = []
+            for pasta_pdfs in (os.path.dirname(interno), os.path.join(pasta, "original")):
+                os.makedirs(pasta_pdfs, exist_ok=True)
+                if not os.listdir(pasta_pdfs):
+                    shutil.copy(original, pasta_pdfs)
+                saida = os.path.join(pasta_pdfs, "fechamento.xlsx")
+                with patch.multiple(script_fechamento, PASTA_PDFS=pasta_pdfs, SAIDA_EXCEL=saida, USAR_CACHE=False, BACKEND_PDF="auto",
+                                    ERROR_REPORT_FILE=os.path.join(pasta, "erros.log"),
+                                    diarios_info={"ANA PAULA SILVA LIMA": {"diaria": 100.0, "tipo": "CARRO"}}):
+                    main()
+                planilhas.append({ws.title: [[c.value for c in row] for row in ws.iter_rows()] for ws in load_workbook(saida).worksheets})
+            self.assertEqual(planilhas[0], planilhas[1])
+
+            # Mesma fatura impressa de novo em outra hora e só em parte: hora, endereço e contador "N/M" mudam
+            reimpresso = os.path.join(pasta, "reimpressao", "ana 2.pdf")
+            os.makedirs(os.path.dirname(reimpresso))
+            gerar_fatura(reimpresso, "ANA PAULA SILVA LIMA", entregas=120, semente=7, impressao="11:02", paginas=[0, paginas - 1])
+            self.assertEqual(paginas_repetidas([reimpresso, original]), {reimpresso: frozenset([0, 1])})
+            registros = [RegistrosMotorista.da_extracao(*resultado) for resultado in
+                         extrair_pdfs([original, reimpresso], backend="auto", repetidas={reimpresso: frozenset([0, 1])})]
+            consolidado = RegistrosMotorista.consolidar(registros)
+            sozinho = RegistrosMotorista.da_extracao(*extrair_dados_pdf(original, backend="auto"))
+            for campo in RegistrosMotorista.__slots__[1:]:
+                self.assertEqual(getattr(consolidado, campo).tolist(), getattr(sozinho, campo).tolist(), campo)
+
+            # Impressões lembradas pelo SHA-256 (na memória e no cache): um PDF já visto não é aberto de novo
+            cache = script_fechamento.CacheExtracao(os.path.join(pasta, "cache"), 10 ** 9)
+            with patch.object(script_fechamento, "_impressoes_arquivos", script_fechamento.OrderedDict()), \
+                    patch.object(script_fechamento, "impressoes_paginas", wraps=script_fechamento.impressoes_paginas) as lidas:
+                self.assertEqual(paginas_repetidas([original, reimpresso], cache=cache), {reimpresso: frozenset([0, 1])})
+                self.assertEqual(lidas.call_count, 2)
+                self.assertEqual(paginas_repetidas([reimpresso, original]), {reimpresso: frozenset([0, 1])})
+                script_fechamento._impressoes_arquivos.clear()
+                self.assertEqual(paginas_repetidas([original, reimpresso], cache=cache), {reimpresso: frozenset([0, 1])})
+                self.assertEqual(lidas.call_count, 2)
+
+            # Hashes lembrados: uma entrada por caminho, no máximo HASHES_MAXIMO
+            with patch.multiple(script_fechamento, HASHES_MAXIMO=2, _hashes_arquivos=script_fechamento.OrderedDict()):
+                hashes = [script_fechamento.hash_arquivo(caminho) for caminho in (original, copia, sobreposto)]
+                self.assertEqual(hashes[0], hashes[1])
+                self.assertEqual(list(script_fechamento._hashes_arquivos), [os.path.abspath(copia), os.path.abspath(sobreposto)])
+                with open(copia, "ab") as f:
+                    f.write(b"\n% alterado\n")
+                self.assertNotEqual(script_fechamento.hash_arquivo(copia), hashes[0])
+                self.assertEqual(len(script_fechamento._hashes_arquivos), 2)
+                script_fechamento.esquecer_hash(copia)
+                self.assertEqual(list(script_fechamento._hashes_arquivos), [os.path.abspath(sobreposto)])
+
+    def test_pdfs_dentro_de_pacotes_zip_e_tar(self):
+        import tarfile
+        import zipfile
+        from script_fechamento import listar_pdfs, hash_arquivo
+
+        with tempfile.TemporaryDirectory() as pasta:
+            pasta_pdfs = os.path.join(pasta, "pdfs")
+            os.makedirs(pasta_pdfs)
+            esperados = {}
+            for nome_arquivo, motorista, semente in [("ana.pdf", "ANA PAULA SILVA LIMA", 7), ("ana 2.pdf", "ANA PAULA SILVA LIMA", 8),
+                                                      ("bruno.pdf", "BRUNO COSTA", 9)]:
+                esperados[nome_arquivo] = gerar_fatura(os.path.join(pasta_pdfs, nome_arquivo), motorista, entregas=40, semente=semente)
+            with zipfile.ZipFile(os.path.join(pasta, "semana.zip"), "w") as pacote:
+                for nome_arquivo in esperados:
+                    pacote.write(os.path.join(pasta_pdfs, nome_arquivo), f"relatorios/{nome_arquivo}")
+                pacote.writestr("leia-me.txt", "não é PDF")
+            with tarfile.open(os.path.join(pasta, "semana.tar.gz"), "w:gz") as pacote:
+                for nome_arquivo in esperados:
+                    pacote.add(os.path.join(pasta_pdfs, nome_arquivo), nome_arquivo)
+
+            for nome_pacote in ("semana.zip", "semana.tar.gz"):
+                with self.subTest(pacote=nome_pacote):
+                    caminho_pacote = os.path.join(pasta, nome_pacote)
+                    listados = listar_pdfs(caminho_pacote)
+                    # Mesmos nomes de arquivo da pasta (usados no agrupamento), lidos sem extrair o pacote
+                    self.assertEqual([nome_arquivo for nome_arquivo, _ in listados], list(esperados))
+                    caminhos = [caminho for _, caminho in listados]
+                    self.assertTrue(all(caminho.startswith(caminho_pacote + os.sep) for caminho in caminhos))
+                    self.assertEqual([hash_arquivo(caminho) for caminho in caminhos],
+                                     [hash_arquivo(os.path.join(pasta_pdfs, nome_arquivo)) for nome_arquivo in esperados])
+                    for workers in (1, 2):
+                        resultados = extrair_pdfs(caminhos, workers=workers, backend="auto")
+                        for nome_arquivo, (nome, entregas, acrescimos, bonus) in zip(esperados, resultados):
+                            self.assertEqual((nome, {data: dict(valor) for data, valor in entregas.items()}, dict(acrescimos), set(bonus)),
+                                             esperados[nome_arquivo])
+            # Nada foi extraído para o disco
+            self.assertEqual(sorted(os.listdir(pasta)), ["pdfs", "semana.tar.gz", "semana.zip"])
+
+    def test_supervisor_extracao_tempo_limite_e_processo_perdido(self):
+        import time
+        from collections import Counter
+        from script_fechamento import SupervisorExtracao, estatisticas_extracao
+
+        antes = Counter(estatisticas_extracao)
+        supervisor = SupervisorExtracao(2, tempo_limite=2, tarefas_por_processo=2)
+        with self.assertLogs(level="ERROR") as logs:
+            inicio = time.monotonic()
+            resultados = supervisor.executar([
+                ("o PDF lento.pdf", time.sleep, (60,)),
+                ("o PDF quebrado.pdf", os._exit, (3,)),
+                ("o PDF a.pdf", abs, (-5,)),
+                ("o PDF b.pdf", int, ("x",)),
+                ("o PDF c.pdf", abs, (-7,)),
+                ("o PDF d.pdf", abs, (-9,)),
+            ])
+        # A tarefa travada não segura a execução: o processo é encerrado no tempo limite e as outras seguem
+        self.assertLess(time.monotonic() - inicio, 30)
+        self.assertEqual(resultados, [None, None, 5, None, 7, 9])
+        mensagens = "\n".join(logs.output)
+        self.assertIn("Tempo limite de 2 s excedido ao ler o PDF lento.pdf", mensagens)
+        self.assertIn("O processo que lia o PDF quebrado.pdf terminou inesperadamente (código 3)", mensagens)
+        self.assertIn("Erro ao extrair o PDF b.pdf: ValueError", mensagens)
+        diferenca = Counter(estatisticas_extracao)
+        diferenca.subtract(antes)
+        self.assertEqual(diferenca["tarefas_tempo_esgotado"], 1)
+        self.assertEqual(diferenca["processos_perdidos"], 1)
+        # 2 iniciais + 1 substituto do processo perdido + 1 troca depois de 2 tarefas concluídas
+        self.assertEqual(diferenca["processos_iniciados"], 4)
+
+        # Extração real sob supervisão (troca de processo a cada PDF): mesmo resultado da leitura direta
+        with tempfile.TemporaryDirectory() as pasta:
+            caminhos, esperados = [], []
+            for indice, motorista in enumerate(["ANA PAULA SILVA LIMA", "BRUNO COSTA"]):
+                caminho = os.path.join(pasta, f"{indice}.pdf")
+                esperados.append(gerar_fatura(caminho, motorista, entregas=40, semente=indice))
+                caminhos.append(caminho)
+            resultados = extrair_pdfs(caminhos, workers=1, backend="auto",
+                                      supervisor=SupervisorExtracao(1, tempo_limite=120, tarefas_por_processo=1))
+            self.assertEqual([(nome, {data: dict(valor) for data, valor in entregas.items()}, dict(acrescimos), set(bonus))
+                              for nome, entregas, acrescimos, bonus in resultados], esperados)
+
+    def test_extrair_dados_pdf_fatura_sintetica(self):
+        # PDF real (sem mock) gerado no layout da Magalu: a extração deve devolver exatamente o que o gerador escreveu
+        with tempfile.TemporaryDirectory() as pasta:
+            caminho = os.path.join(pasta, "fatura.pdf")
+            esperado = gerar_fatura(caminho, "ANA PAULA SILVA LIMA", entregas=120, semente=7)
+            for backend in ("pdfplumber", "auto", "pdfium"):
+                with self.subTest(backend=backend):
+                    nome, entregas, acrescimos, bonus = extrair_dados_pdf(caminho, backend=backend)
+                    self.assertEqual((nome, {data: dict(valor) for data, valor in entregas.items()}, dict(acrescimos), set(bonus)), esperado)
+            self.assertTrue(esperado[2])
+            self.assertTrue(esperado[3])
+
+    def test_relatorio_erros_gravado_a_medida_que_chega(self):
+        import logging
+
+        relatorio = RelatorioErros()
+        logger = logging.getLogger("teste.relatorio_erros")
+        logger.addHandler(relatorio)
+        logger.propagate = False
+        try:
+            with tempfile.TemporaryDirectory() as pasta:
+                caminho = os.path.join(pasta, "erros.log")
+                # Antes de abrir(), as mensagens ficam pendentes e o arquivo não é criado
+                logger.warning("aviso antes da execução")
+                logger.info("informação não vai para o relatório")
+                self.assertFalse(os.path.exists(caminho))
+
+                relatorio.abrir(caminho)
+                logger.error("erro durante a execução")
+                # Já está no disco antes de fechar
+                with open(caminho) as f:
+                    linhas = f.read().splitlines()
+                self.assertEqual(len(linhas), 2)
+                self.assertTrue(linhas[0].endswith("WARNING - aviso antes da execução"))
+                self.assertTrue(linhas[1].endswith("ERROR - erro durante a execução"))
+
+                relatorio.escrever(["linha de um processo filho"])
+                logger.warning("só no console", extra={"fora_do_relatorio": True})
+                self.assertEqual(relatorio.fechar(), 3)
+                with open(caminho) as f:
+                    self.assertEqual(f.read().splitlines()[2], "linha de um processo filho")
+                self.assertEqual(relatorio.pendentes, [])
+        finally:
+            logger.removeHandler(relatorio)
+
+    def test_avisos_de_terceiros_agregados(self):
+        import logging
+
+        agregador = AgregadorAvisos()
+        logger = logging.getLogger("teste.pdfminer.pdfpage")
+        logger.addHandler(agregador)
+        logger.propagate = False
+        try:
+            for _ in range(40):
+                logger.warning("CropBox missing from /Page, defaulting to MediaBox")
+            logger.warning("outro aviso")
+            logger.info("informação ignorada")
+            with self.assertLogs(level="WARNING") as logs:
+                agregador.descarregar("fatura.pdf")
+        finally:
+            logger.removeHandler(agregador)
+
+        self.assertEqual(len(logs.output), 2)
+        self.assertIn("teste.pdfminer.pdfpage em fatura.pdf (40 vez(es)): CropBox missing", logs.output[0])
+        self.assertIn("(1 vez(es)): outro aviso", logs.output[1])
+        self.assertEqual(agregador.contagem, {})
+
+    def test_escrever_fechamento(self):
+        from openpyxl import load_workbook
+
+        df = pd.DataFrame({
+            "Data": ["01/07/2025", "Total"],
+            "Motorista": ["MOTORISTA A", "MOTORISTA A"],
+            "Valor Entregas": [38.0, 38.0],
+            "Descontos": [3.8, 3.8],
+            "Acréscimo Calculado": [62.0, 0.0],
+            "Acréscimo Pago": [30.0, 30.0],
+            "Recebido": [None, None],
+            "Total Dia": [None, None],
+            "Bônus": [0, 0],
+            "Diferença": [None, None],
+        })
+        with tempfile.TemporaryDirectory() as pasta:
+            caminho = os.path.join(pasta, "fechamento.xlsx")
+            escrever_fechamento(caminho, [("MOTORISTA A COM UM NOME MUITO COMPRIDO", df)])
+            ws = load_workbook(caminho)["MOTORISTA A COM UM NOME MUITO C"]
+
+            self.assertEqual([c.value for c in ws[1]], df.columns.tolist())
+            self.assertEqual([c.value for c in ws[2]], ["01/07/2025", "MOTORISTA A", 38, 3.8, 62, 30, "=C2+E2", "=C2+F2", 0, "=G2-H2"])
+            self.assertEqual(ws["J3"].value, "=G3-H3")
+            # Cabeçalho e linha "Total" em azul claro; demais linhas sem preenchimento
+            self.assertEqual(ws["A1"].fill.start_color.rgb, "00ADD8E6")
+            self.assertEqual(ws["J3"].fill.start_color.rgb, "00ADD8E6")
+            self.assertIsNone(ws["A2"].fill.fill_type)
+
+            with self.assertRaises(ValueError):
+                escrever_fechamento(os.path.join(pasta, "vazio.xlsx"), [])
+
+    def test_calcular_resumo_e_abas_de_resumo(self):
+        from openpyxl import load_workbook
+
+        colunas = ["Data", "Motorista", "Tipo de Veículo", "Entregues", "Insucessos", "Valor Entregas", "Descontos",
+                   "Acréscimo Calculado", "Acréscimo Pago", "Recebido", "Total Dia", "Bônus", "Diferença"]
+        ana = pd.DataFrame([
+            ["02/07/2025", "ANA", "MOTO", 10, 1, 38.0, 3.8, 62.0, 0.1, None, None, 30.0, None],
+            ["01/07/2025", "ANA", "MOTO", 20, 0, 76.0, 0.0, 24.0, 0.2, None, None, 0.0, None],
+            ["Total", "ANA", "MOTO", 30, 1, 114.0, 3.8, 0.0, 0.3, None, None, 30.0, None],
+        ], columns=colunas)
+        bruno = pd.DataFrame([
+            ["02/07/2025", "BRUNO", "VAN", 5, 0, 19.0, 0.0, 131.0, 150.0, None, None, 30.0, None],
+            ["Total", "BRUNO", "VAN", 5, 0, 19.0, 0.0, 0.0, 150.0, None, None, 30.0, None],
+        ], columns=colunas)
+        por_motorista, por_dia = calcular_resumo([("ANA", ana), ("BRUNO", bruno), ("VAZIO", pd.DataFrame())])
+
+        self.assertEqual(por_motorista["Motorista"].tolist(), ["ANA", "BRUNO", "Total"])
+        self.assertEqual(por_motorista["Dias"].tolist(), [2, 1, 3])
+        self.assertEqual(por_motorista["Entregues"].tolist(), [30, 5, 35])
+        # Acréscimo Calculado e Recebido somam os dias, não a linha "Total" das abas
+        self.assertEqual(por_motorista["Acréscimo Calculado"].tolist(), [86.0, 131.0, 217.0])
+        self.assertEqual(por_motorista["Recebido"].tolist(), [200.0, 150.0, 350.0])
+        self.assertEqual(por_motorista["Total Dia"].tolist(), [114.3, 169.0, 283.3])
+        self.assertEqual(por_motorista["Diferença"].tolist(), [85.7, -19.0, 66.7])
+
+        self.assertEqual(por_dia["Data"].tolist(), ["01/07/2025", "02/07/2025", "Total"])
+        self.assertEqual(por_dia["Motoristas"].tolist(), [1, 2, 2])
+        self.assertEqual(por_dia["Bônus"].tolist(), [0.0, 60.0, 60.0])
+        self.assertEqual(por_dia["Acréscimo Pago"].tolist(), [0.2, 150.1, 150.3])
+
+        with tempfile.TemporaryDirectory() as pasta:
+            caminho = os.path.join(pasta, "fechamento.xlsx")
+            escrever_fechamento(caminho, [("ANA", ana), ("BRUNO", bruno)], [("Resumo", por_motorista), ("Resumo por Dia", por_dia)])
+            book = load_workbook(caminho)
+            self.assertEqual(book.sheetnames, ["Resumo", "Resumo por Dia", "ANA", "BRUNO"])
+            # Resumo só com valores, sem fórmulas; linha "Total" destacada
+            self.assertEqual([c.value for c in book["Resumo"][4]], ["Total", None, 3, 35, 1, 133, 3.8, 217, 150.3, 350, 283.3, 60, 66.7])
+            self.assertEqual(book["Resumo"]["A4"].fill.start_color.rgb, "00ADD8E6")
+            self.assertIsNone(book["Resumo"]["A2"].fill.fill_type)
+
+    def test_exportar_fechamento_csv_e_parquet(self):
+        import importlib.util
+
+        colunas = ["Data", "Motorista", "Tipo de Veículo", "Entregues", "Insucessos", "Valor Entregas", "Descontos",
+                   "Acréscimo Calculado", "Acréscimo Pago", "Recebido", "Total Dia", "Bônus", "Diferença"]
+        fechamentos = [
+            ("BRUNO", pd.DataFrame([
+                ["02/07/2025", "BRUNO", "VAN", 5, 0, 19.0, 0.0, 131.0, 150.0, None, None, 30.0, None],
+                ["Total", "BRUNO", "VAN", 5, 0, 19.0, 0.0, 0.0, 150.0, None, None, 30.0, None],
+            ], columns=colunas)),
+            ("ANA", pd.DataFrame([
+                ["02/07/2025", "ANA", "MOTO", 10, 1, 38.0, 3.8, 62.0, 0.1, None, None, 30.0, None],
+                ["01/07/2025", "ANA", "MOTO", 20, 0, 76.0, 0.0, 24.0, 0.2, None, None, 0.0, None],
+                ["Total", "ANA", "MOTO", 30, 1, 114.0, 3.8, 0.0, 0.3, None, None, 30.0, None],
+            ], columns=colunas)),
+        ]
+        with tempfile.TemporaryDirectory() as pasta:
+            caminho = os.path.join(pasta, "fechamento.csv")
+            self.assertEqual(exportar_fechamento(caminho, fechamentos, "csv", "motorista"), 3)
+            exportado = pd.read_csv(caminho)
+            self.assertEqual(exportado.columns.tolist(), colunas)
+            # Motoristas na ordem das abas e, dentro de cada um, os dias em ordem; sem linhas "Total"
+            self.assertEqual(list(zip(exportado["Motorista"], exportado["Data"])),
+                             [("BRUNO", "2025-07-02"), ("ANA", "2025-07-01"), ("ANA", "2025-07-02")])
+            # As colunas de fórmula das abas vêm calculadas
+            self.assertEqual(exportado["Recebido"].tolist(), [150.0, 100.0, 100.0])
+            self.assertEqual(exportado["Total Dia"].tolist(), [169.0, 76.2, 38.1])
+            self.assertEqual(exportado["Diferença"].tolist(), [-19.0, 23.8, 61.9])
+
+            exportar_fechamento(caminho, fechamentos, "csv", "data")
+            exportado = pd.read_csv(caminho)
+            self.assertEqual(list(zip(exportado["Data"], exportado["Motorista"])),
+                             [("2025-07-01", "ANA"), ("2025-07-02", "BRUNO"), ("2025-07-02", "ANA")])
+            self.assertEqual(os.listdir(pasta), ["fechamento.csv"])
+
+            if importlib.util.find_spec("pyarrow"):
+                import pyarrow.parquet as pq
+
+                caminho = os.path.join(pasta, "fechamento.parquet")
+                exportar_fechamento(caminho, fechamentos, "parquet", "motorista")
+                # Um grupo de linhas por motorista
+                self.assertEqual(pq.ParquetFile(caminho).metadata.num_row_groups, 2)
+                self.assertEqual(pd.read_parquet(caminho)["Recebido"].tolist(), [150.0, 100.0, 100.0])
+
+    def test_main_incremental_reprocessa_so_motoristas_alterados(self):
+        import script_fechamento
+        from openpyxl import load_workbook
+
+        def ler_planilha(caminho):
+            book = load_workbook(caminho)
+            return {ws.title: [[c.value for c in row] for row in ws.iter_rows()] for ws in book.worksheets}
+
+        with tempfile.TemporaryDirectory() as pasta:
+            pasta_pdfs = os.path.join(pasta, "pdfs")
+            os.makedirs(pasta_pdfs)
+            pdf_camila = shutil.copy(os.path.join("pdfs", "Camila Victoria Tomaz Duarte.pdf"), pasta_pdfs)
+            pdf_elisiane = shutil.copy(os.path.join("pdfs", "ELISIANE LUDMYLLA FERREIRA SANTOS.pdf"), pasta_pdfs)
+            saida = os.path.join(pasta, "fechamento.xlsx")
+            diarios = carregar_planilha_veiculos("Tipo de Veiculos.xlsx")
+
+            configuracao = dict(PASTA_PDFS=pasta_pdfs, SAIDA_EXCEL=saida, ERROR_REPORT_FILE=os.path.join(pasta, "erros.log"),
+                                INCREMENTAL=True, USAR_CACHE=False, BACKEND_PDF="auto", diarios_info=diarios)
+            with patch.multiple(script_fechamento, **configuracao):
+                main()
+                self.assertTrue(os.path.exists(script_fechamento.caminho_manifesto(saida)))
+
+                with patch("script_fechamento.extrair_pdfs", wraps=extrair_pdfs) as mock_extrair_pdfs:
+                    # Nada mudou: nenhum PDF é lido
+                    main()
+                    self.assertEqual(mock_extrair_pdfs.call_args[0][0], [])
+
+                    # PDF alterado: só o grupo dele é extraído de novo
+                    with open(pdf_camila, "ab") as f:
+                        f.write(b"\n% correcao\n")
+                    main()
+                    self.assertEqual(mock_extrair_pdfs.call_args[0][0], [pdf_camila])
+
+                    # Linha da planilha de veículos alterada: só esse motorista é recalculado
+                    diarios["ELISIANE LUDMYLLA FERREIRA SANTOS"] = {"diaria": 999, "tipo": "MOTO"}
+                    main()
+                    self.assertEqual(mock_extrair_pdfs.call_args[0][0], [pdf_elisiane])
+                incremental = ler_planilha(saida)
+
+            # O resultado é o mesmo de um fechamento completo
+            configuracao.update(SAIDA_EXCEL=os.path.join(pasta, "completo.xlsx"), INCREMENTAL=False)
+            with patch.multiple(script_fechamento, **configuracao):
+                main()
+            self.assertEqual(incremental, ler_planilha(os.path.join(pasta, "completo.xlsx")))
+            self.assertIn("MOTO", incremental["ELISIANE LUDMYLLA FERREIRA SANT"][1])
+
+            # Manifesto que não pode ser gravado em JSON: só um aviso, sem deixar o arquivo temporário
+            antes = sorted(os.listdir(pasta))
+            manifesto = script_fechamento.ManifestoFechamento(os.path.join(pasta, "outro.manifesto.json"), {"valor": object()})
+            with self.assertLogs(level="WARNING"):
+                manifesto.salvar()
+            self.assertEqual(sorted(os.listdir(pasta)), antes)
+
+    def test_vigiar_pasta_extrai_pdfs_novos(self):
+        import script_fechamento
+        import pypdfium2 as pdfium
+        from openpyxl import load_workbook
+
+        with tempfile.TemporaryDirectory() as pasta:
+            pasta_pdfs = os.path.join(pasta, "pdfs")
+            os.makedirs(pasta_pdfs)
+            saida = os.path.join(pasta, "fechamento.xlsx")
+            shutil.copy(os.path.join("pdfs", "Camila Victoria Tomaz Duarte.pdf"), pasta_pdfs)
+
+            configuracao = dict(PASTA_PDFS=pasta_pdfs, SAIDA_EXCEL=saida, ERROR_REPORT_FILE=os.path.join(pasta, "erros.log"),
+                                USAR_CACHE=False, BACKEND_PDF="auto", diarios_info=carregar_planilha_veiculos("Tipo de Veiculos.xlsx"))
+            with patch.multiple(script_fechamento, **configuracao), patch.dict(script_fechamento.extracoes_prontas, clear=True), \
+                    patch.object(script_fechamento, "_impressoes_arquivos", script_fechamento.OrderedDict()):
+                with patch("script_fechamento.extrair_dados_pdf", wraps=extrair_dados_pdf) as mock_extrair, \
+                        patch("script_fechamento.impressoes_paginas", wraps=script_fechamento.impressoes_paginas) as mock_impressoes:
+                    # Na primeira verificação o arquivo ainda pode estar sendo gravado: nada é lido
+                    script_fechamento.vigiar_pasta(intervalo=0, ciclos=1)
+                    mock_extrair.assert_not_called()
+                    self.assertFalse(os.path.exists(saida))
+
+                    # As impressões das páginas são lidas junto com a extração; a planilha não abre o PDF de novo
+                    script_fechamento.vigiar_pasta(intervalo=0, ciclos=2)
+                    self.assertEqual(mock_extrair.call_count, 1)
+                    self.assertEqual(mock_impressoes.call_count, 1)
+                    self.assertEqual(load_workbook(saida, read_only=True).sheetnames, ["Resumo", "Resumo por Dia", "CAMILA VICTORIA TOMAZ DUARTE"])
+
+                    # Só o PDF novo é lido; o já extraído vem da memória, sem ler o arquivo
+                    pdf_elisiane = shutil.copy(os.path.join("pdfs", "ELISIANE LUDMYLLA FERREIRA SANTOS.pdf"), pasta_pdfs)
+                    script_fechamento.vigiar_pasta(intervalo=0, ciclos=2)
+                    self.assertEqual(mock_extrair.call_count, 2)
+                    self.assertEqual(mock_extrair.call_args[0][0], pdf_elisiane)
+                    self.assertEqual(mock_impressoes.call_args_list[-1][0][0], pdf_elisiane)
+                    self.assertEqual(mock_impressoes.call_count, 2)
+                    self.assertEqual(len(load_workbook(saida, read_only=True).sheetnames), 4)
+
+                    # main() usa os resultados prontos e as impressões lembradas, sem abrir nenhum PDF
+                    with patch("script_fechamento._abrir_pdfium") as mock_abrir:
+                        main()
+                    mock_abrir.assert_not_called()
+                    self.assertEqual(mock_extrair.call_count, 2)
+                    self.assertEqual(mock_impressoes.call_count, 2)
+
+                    # Reexportação de parte do PDF da Camila: as páginas repetidas não são somadas e a extração
+                    # sem elas também fica pronta, então as próximas planilhas não leem nenhum PDF
+                    aba_camila = [[c.value for c in row] for row in load_workbook(saida)["CAMILA VICTORIA TOMAZ DUARTE"].iter_rows()]
+                    documento = pdfium.PdfDocument(os.path.join("pdfs", "Camila Victoria Tomaz Duarte.pdf"))
+                    novo = pdfium.PdfDocument.new()
+                    novo.import_pages(documento, [len(documento) - 1, 0])
+                    novo.save(os.path.join(pasta_pdfs, "Camila Victoria Tomaz Duarte 2.pdf"))
+                    novo.close()
+                    documento.close()
+                    script_fechamento.vigiar_pasta(intervalo=0, ciclos=2)
+                    self.assertEqual(mock_extrair.call_count, 4)
+                    self.assertEqual(mock_impressoes.call_count, 3)
+                    with patch("script_fechamento._abrir_pdfium") as mock_abrir:
+                        main()
+                    mock_abrir.assert_not_called()
+                    self.assertEqual(mock_extrair.call_count, 4)
+                    self.assertEqual(mock_impressoes.call_count, 3)
+                    self.assertEqual([[c.value for c in row] for row in load_workbook(saida)["CAMILA VICTORIA TOMAZ DUARTE"].iter_rows()], aba_camila)
+
+    def test_main_grava_relatorio_de_execucao(self):
+        import json
+        import script_fechamento
+
+        with tempfile.TemporaryDirectory() as pasta:
+            pasta_pdfs = os.path.join(pasta, "pdfs")
+            os.makedirs(pasta_pdfs)
+            pdf_camila = shutil.copy(os.path.join("pdfs", "Camila Victoria Tomaz Duarte.pdf"), pasta_pdfs)
+            relatorio_json = os.path.join(pasta, "execucao.json")
+
+            configuracao = dict(PASTA_PDFS=pasta_pdfs, SAIDA_EXCEL=os.path.join(pasta, "fechamento.xlsx"),
+                                ERROR_REPORT_FILE=os.path.join(pasta, "erros.log"), USAR_CACHE=False, BACKEND_PDF="auto",
+                                RELATORIO_EXECUCAO=relatorio_json, diarios_info=carregar_planilha_veiculos("Tipo de Veiculos.xlsx"))
+            with patch.multiple(script_fechamento, **configuracao):
+                main()
+
+            with open(relatorio_json, encoding="utf-8") as f:
+                relatorio = json.load(f)
+            self.assertEqual(set(relatorio["etapas"]), {"listagem", "repetidas", "extracao", "fechamento", "planilha"})
+            self.assertEqual(len(relatorio["pdfs"]), 1)
+            metricas = relatorio["pdfs"][0]
+            self.assertEqual(metricas["arquivo"], "Camila Victoria Tomaz Duarte.pdf")
+            self.assertEqual(metricas["bytes"], os.path.getsize(pdf_camila))
+            self.assertGreater(metricas["paginas"], 0)
+            self.assertGreater(metricas["linhas"], 0)
+            self.assertFalse(metricas["erro"])
+            self.assertTrue({"abrir", "texto", "analise"} <= set(metricas["etapas"]))
+            self.assertEqual(relatorio["resumo"]["paginas"], metricas["paginas"])
+            self.assertGreaterEqual(relatorio["total"]["parede_s"], relatorio["etapas"]["extracao"]["parede_s"])
+
+    def test_servico_fila_de_fechamentos(self):
+        import io
+        import json
+        import time
+        import uuid
+        from openpyxl import load_workbook
+        from servico_fechamento import ServicoFechamento, PedidoInvalido, criar_app, ler_formulario, fechar_formulario
+
+        def multipart(fronteira, arquivos):
+            return b"".join(
+                f"--{fronteira}\r\nContent-Disposition: form-data; name=\"{campo}\"; filename=\"{nome}\"\r\n"
+                f"Content-Type: application/octet-stream\r\n\r\n".encode("utf-8") + conteudo + b"\r\n"
+                for campo, nome, conteudo in arquivos
+            ) + f"--{fronteira}--\r\n".encode()
+
+        def pedir(app, metodo, caminho, arquivos=()):
+            fronteira = uuid.uuid4().hex
+            corpo = multipart(fronteira, arquivos) if arquivos else b""
+            environ = {"REQUEST_METHOD": metodo, "PATH_INFO": caminho, "CONTENT_TYPE": f"multipart/form-data; boundary={fronteira}",
+                       "CONTENT_LENGTH": str(len(corpo)), "wsgi.input": io.BytesIO(corpo)}
+            resposta = {}
+            corpo_resposta = b"".join(app(environ, lambda status, cabecalhos: resposta.update(status=status)))
+            return resposta["status"], corpo_resposta
+
+        with open(os.path.join("pdfs", "Camila Victoria Tomaz Duarte.pdf"), "rb") as f:
+            pdf = f.read()
+        with open("Tipo de Veiculos.xlsx", "rb") as f:
+            planilha = f.read()
+
+        # O corpo é lido em blocos, sem ficar inteiro na memória; com blocos pequenos o delimitador fica
+        # dividido entre blocos e um arquivo pode conter um começo de delimitador
+        fronteira = uuid.uuid4().hex
+        armadilha = b"\r\n--" + fronteira[:10].encode() + b"\r\n\r\n" + bytes(range(256)) * 20
+        corpo = multipart(fronteira, [("pdfs", "a.pdf", pdf), ("pdfs", "b.pdf", armadilha), ("planilha", "veiculos.xlsx", b"")])
+        leituras = []
+        class Entrada(io.BytesIO):
+            def read(self, tamanho=-1):
+                leituras.append(tamanho)
+                return super().read(tamanho)
+        environ = {"CONTENT_TYPE": f"multipart/form-data; boundary={fronteira}", "CONTENT_LENGTH": str(len(corpo))}
+        with patch("servico_fechamento.BLOCO_ENVIO", 7):
+            campos = ler_formulario({**environ, "wsgi.input": Entrada(corpo)})
+            try:
+                self.assertEqual({campo: [(nome, arquivo.read()) for nome, arquivo in arquivos] for campo, arquivos in campos.items()},
+                                 {"pdfs": [("a.pdf", pdf), ("b.pdf", armadilha)], "planilha": [("veiculos.xlsx", b"")]})
+                self.assertEqual(max(leituras), 7)
+            finally:
+                fechar_formulario(campos)
+            with self.assertRaises(PedidoInvalido):
+                ler_formulario({**environ, "wsgi.input": io.BytesIO(corpo[:len(corpo) // 2])})
+
+        with tempfile.TemporaryDirectory() as pasta:
+            servico = ServicoFechamento(pasta, processos=1, fila_maxima=1)
+            app = criar_app(servico)
+            try:
+                # Os arquivos são gravados fora da trava, com a vaga na fila já reservada
+                gravacoes = []
+                abrir = open
+                def abrir_sem_trava(*args, **kwargs):
+                    travada = servico.trava.locked()
+                    gravacoes.append((travada, None if travada else servico.pendentes()))
+                    return abrir(*args, **kwargs)
+                with patch("servico_fechamento.open", abrir_sem_trava, create=True):
+                    status, corpo = pedir(app, "POST", "/fechamentos", [("pdfs", "Camila Victoria Tomaz Duarte.pdf", pdf), ("planilha", "veiculos.xlsx", planilha)])
+                self.assertEqual(status, "202 Accepted")
+                self.assertEqual(gravacoes, [(False, 1), (False, 1)])
+                identificador = json.loads(corpo)["id"]
+                # O PDF chega intacto na pasta do fechamento
+                with open(os.path.join(pasta, identificador, "pdfs", "Camila Victoria Tomaz Duarte.pdf"), "rb") as f:
+                    self.assertEqual(f.read(), pdf)
+
+                # Fila limitada: com um fechamento pendente e limite 1, o próximo pedido é recusado
+                self.assertEqual(pedir(app, "POST", "/fechamentos", [("pdfs", "outro.pdf", pdf)])[0], "503 Service Unavailable")
+                self.assertEqual(pedir(app, "POST", "/fechamentos", [("pdfs", "planilha.xlsx", pdf)])[0], "400 Bad Request")
+                self.assertEqual(pedir(app, "GET", f"/fechamentos/{'0' * 32}")[0], "404 Not Found")
+
+                limite = time.monotonic() + 120
+                while servico.situacao(identificador)["situacao"] in ("na_fila", "processando") and time.monotonic() < limite:
+                    time.sleep(0.2)
+                status, corpo = pedir(app, "GET", f"/fechamentos/{identificador}")
+                situacao = json.loads(corpo)
+                self.assertEqual(situacao["situacao"], "concluido", situacao)
+                self.assertEqual(situacao["planilha"], f"/fechamentos/{identificador}/planilha")
+
+                status, corpo = pedir(app, "GET", situacao["planilha"])
+                self.assertEqual(status, "200 OK")
+                book = load_workbook(io.BytesIO(corpo))
+                self.assertEqual(book.sheetnames, ["Resumo", "Resumo por Dia", "CAMILA VICTORIA TOMAZ DUARTE"])
+
+                # Download interrompido: o close() do servidor no corpo da resposta fecha o arquivo
+                corpo_parcial = app({"REQUEST_METHOD": "GET", "PATH_INFO": situacao["planilha"]}, lambda status, cabecalhos: None)
+                next(corpo_parcial)
+                corpo_parcial.close()
+                self.assertIsNone(corpo_parcial.gi_frame)
+
+                # Fechamento removido pela retenção: a planilha deixa de existir, sem erro
+                servico.retencao = 0
+                servico.limpar_antigos()
+                self.assertIsNone(servico.caminho_planilha(identificador))
+                self.assertEqual(pedir(app, "GET", situacao["planilha"])[0], "404 Not Found")
+            finally:
+                servico.encerrar()
+
+    def test_launcher_agrupa_logs_por_nivel(self):
+        from launcher_gui import agrupar_mensagens, classificar_nivel
+
+        self.assertEqual(classificar_nivel("2025-07-01 10:00:00 - ERROR - falhou"), "ERROR")
+        self.assertEqual(classificar_nivel("Aviso: Manifesto ilegível"), "WARNING")
+        self.assertEqual(classificar_nivel("Fechamento gerado com sucesso"), "SUCCESS")
+        self.assertEqual(classificar_nivel("Páginas lidas: 10"), "INFO")
+
+        mensagens = [("a\n", "INFO"), ("b\n", "INFO"), ("c\n", "ERROR"), ("d\n", "INFO"), ("e\n", "INFO")]
+        # Um único insert com um trecho por sequência de mensagens do mesmo nível
+        self.assertEqual(agrupar_mensagens(mensagens), ["a\nb\n", "INFO", "c\n", "ERROR", "d\ne\n", "INFO"])
+        self.assertEqual(agrupar_mensagens([]), [])
+
     @patch("os.listdir")
     @patch("os.path.exists")
     @patch("script_fechamento.extrair_dados_pdf")